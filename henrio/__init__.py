@@ -11,10 +11,26 @@ from .queue import Queue, HeapQueue, QueueWouldBlock
 from .workers import threadworker, async_threadworker, processworker, async_processworker, AsyncFuture
 from .yields import (sleep, get_loop, unwrap_file, spawn, wrap_file, wrap_socket, current_task, sleepinf,
                      unwrap_socket, postpone, spawn_after, wait_readable, wait_writable, call_after,
-                     schedule_after, TaskGroup, get_time)
+                     schedule_after, TaskGroup, get_time, wait_any, wait_any_readable, wait_any_writable)
 from .selector import SelectorLoop
 from .io import async_connect, threaded_bind, threaded_connect, getaddrinfo, create_socketpair, AsyncSocket, \
-    open_connection, aopen, AsyncFile, ssl_do_handshake, ssl_wrap_socket
+    open_connection, aopen, AsyncFile, MappedFile, BufferedFile, ssl_do_handshake, ssl_wrap_socket, \
+    open_unix_connection
+from .resolver import Resolver, resolve
+from .io import TLSSocket, SessionCache
+from .server import Server, start_server, start_unix_server
+from .relay import relay
+from .loopback import LoopbackSocket, loopback_pair
+from .replay import Trace, Recorder, ReplaySocket, replay
+from .inotify import WatchEvent, Watcher, watch
+from .framing import FrameError, LengthPrefixed, Delimited, Netstring, Framed, framed
+from .http import HTTPError, Headers, HTTPRequest, HTTPResponse, HTTPConnection, start_http_server, \
+    open_http_connection
+from .rpc import RPCError, JSONSerializer, PickleSerializer, RPCConnection, serve_rpc, connect_rpc
+from .transport import Protocol, Transport, create_connection, create_server
+from .datagram import DatagramEndpoint, open_datagram_endpoint
+from .prefork import PreforkServer, run_prefork
+from .pool import ConnectionPool
 from .timeout import timeout
 from . import universals
 from . import dns
@@ -0,0 +1,166 @@
+import socket
+import typing
+from collections import deque
+
+from .io import AsyncSocket, WantRead, WantWrite
+from .yields import get_loop, wait_readable, wait_writable, unwrap_socket
+
+__all__ = ["DatagramEndpoint", "open_datagram_endpoint"]
+
+
+class DatagramEndpoint:
+    def __init__(self, sock: AsyncSocket, max_batch: int = 64, datagram_size: int = 2048, buffers: int = 2,
+                 max_queue: int = 1024):
+        """Batched datagram I/O over a wrapped UDP socket.
+        Every time the socket is readable all pending datagrams (up to `max_batch`) are read with
+        `recvfrom_into` into one of `buffers` preallocated buffers and handed back together. Datagrams longer than
+        `datagram_size` are truncated. Outgoing datagrams are queued and sent in bursts at the end of the tick,
+        senders wait once more than `max_queue` datagrams are queued."""
+        self.socket = sock
+        self.max_batch = max_batch
+        self.datagram_size = datagram_size
+        self.max_queue = max_queue
+        self.received = 0
+        self.batches = 0
+        self.sent = 0
+        self.errors = 0
+        self._buffers = [bytearray(max_batch * datagram_size) for _ in range(max(1, buffers))]
+        self._current = 0
+        self._outgoing = deque()
+        self._sender = None
+        self._loop = None
+        self.closed = False
+
+    def __repr__(self):
+        return "<{0} sockname={1} received={2} sent={3}>".format(self.__class__.__name__,
+                                                                self.sockname if not self.closed else None,
+                                                                self.received, self.sent)
+
+    @property
+    def sockname(self):
+        return self.socket.file.getsockname()
+
+    def stats(self) -> dict:
+        """Get a snapshot of the endpoint's counters"""
+        return {
+            "received": self.received,
+            "batches": self.batches,
+            "average_batch": self.received / self.batches if self.batches else 0.0,
+            "sent": self.sent,
+            "queued": len(self._outgoing),
+            "errors": self.errors,
+        }
+
+    async def recv_batch(self) -> typing.List[typing.Tuple[memoryview, typing.Any]]:
+        """Wait for datagrams and return every one that is ready as a list of (data, address).
+        The data is a memoryview into a reused buffer, it stays valid until `buffers` more batches are received.
+        Copy it (i.e. `bytes(data)`) to keep it longer."""
+        sock = self.socket.file
+        buffer = memoryview(self._buffers[self._current])
+        self._current = (self._current + 1) % len(self._buffers)
+        batch = []
+        while not batch:
+            await wait_readable(sock)
+            offset = 0
+            while len(batch) < self.max_batch:
+                try:
+                    nbytes, address = sock.recvfrom_into(buffer[offset:offset + self.datagram_size])
+                except WantRead:
+                    break
+                except ConnectionRefusedError:  # An ICMP error for something we sent earlier
+                    self.errors += 1
+                    continue
+                batch.append((buffer[offset:offset + nbytes], address))
+                offset += nbytes
+        self.received += len(batch)
+        self.batches += 1
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        return await self.recv_batch()
+
+    async def sendto(self, data: bytes, address: tuple = None):
+        """Queue a datagram to be sent at the end of the tick. Leave out the address on a connected endpoint."""
+        if self.closed:
+            raise RuntimeError("Endpoint is closed!")
+        self._outgoing.append((data, address))
+        if self._sender is None:
+            if self._loop is None:
+                self._loop = await get_loop()
+            self._sender = self._loop.create_task(self._send_queued())
+        if len(self._outgoing) > self.max_queue:
+            await self.flush()
+
+    send = sendto
+
+    async def _send_queued(self):
+        """Send everything queued in one burst, only going back to the loop when the socket is full"""
+        sock = self.socket.file
+        outgoing = self._outgoing
+        try:
+            while outgoing:
+                data, address = outgoing[0]
+                try:
+                    if address is None:
+                        sock.send(data)
+                    else:
+                        sock.sendto(data, address)
+                except WantWrite:
+                    await wait_writable(sock)
+                    continue
+                except OSError:  # Datagrams are fire and forget, drop it and carry on
+                    self.errors += 1
+                else:
+                    self.sent += 1
+                outgoing.popleft()
+        finally:
+            self._sender = None
+
+    async def flush(self):
+        """Wait until every queued datagram has been sent"""
+        while self._sender is not None:
+            await self._sender.wait()
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._sender is not None:
+            self._sender.cancel()
+        await unwrap_socket(self.socket.file)
+        self.socket.file.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
+
+
+async def open_datagram_endpoint(local_addr: tuple = None, remote_addr: tuple = None, *,
+                                 family: int = socket.AF_INET,
+                                 reuse_port: bool = False,
+                                 **kwargs) -> DatagramEndpoint:
+    """Create a UDP socket, bound to `local_addr` and/or connected to `remote_addr`, and return a
+    `henrio.DatagramEndpoint` for it. Extra keyword arguments are passed to the endpoint."""
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        sock.setblocking(False)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if local_addr:
+            sock.bind(local_addr)
+        if remote_addr:
+            sock.connect(remote_addr)
+    except:
+        sock.close()
+        raise
+    loop = await get_loop()
+    return DatagramEndpoint(loop.wrap_socket(sock), **kwargs)
@@ -0,0 +1,266 @@
+import struct
+import typing
+from collections import deque
+
+from .bases import BaseSocket
+
+__all__ = ["FrameError", "Codec", "LengthPrefixed", "Delimited", "Netstring", "Framed", "framed"]
+
+Buffer = typing.Union[bytes, bytearray]
+
+
+class FrameError(ValueError):
+    """The stream isn't validly framed (or a frame is over the size limit)"""
+
+
+class Codec:
+    def __init__(self, max_frame_size: int = 1 << 24):
+        """Base class for incremental framing codecs. `feed` bytes as they arrive and get back every frame
+        they complete. Frames are parsed straight out of the bytes that were fed and returned as memoryviews,
+        only the incomplete tail is kept between calls, so it doesn't matter how the stream was split up."""
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def __repr__(self):
+        return "<{0} buffered={1}>".format(self.__class__.__name__, len(self._buffer))
+
+    @property
+    def buffered(self) -> int:
+        """Bytes of incomplete frames being held"""
+        return len(self._buffer)
+
+    def _parse(self, data: Buffer, offset: int) -> typing.Optional[typing.Tuple[int, int, int]]:
+        """Find the frame starting at offset. Returns (frame start, frame end, next offset) or None if it's incomplete"""
+        raise NotImplementedError
+
+    def _ready(self) -> bool:
+        """Whether the held bytes complete a frame"""
+        return self._parse(self._buffer, 0) is not None
+
+    def feed(self, data: Buffer) -> typing.List[memoryview]:
+        """Add received bytes, returns the frames they complete"""
+        if self._buffer:
+            self._buffer += data
+            if not self._ready():
+                if len(self._buffer) > self.max_frame_size + 16:
+                    raise FrameError("Frame is larger than {0} bytes".format(self.max_frame_size))
+                return []
+            data = bytes(self._buffer)
+            self._buffer.clear()
+
+        view = memoryview(data)
+        frames = []
+        offset = 0
+        while offset < len(data):
+            found = self._parse(data, offset)
+            if found is None:
+                break
+            start, end, offset = found
+            frames.append(view[start:end])
+        if offset < len(data):
+            self._buffer += view[offset:]
+            self._rest()
+        return frames
+
+    def _rest(self):
+        """Called when an incomplete frame has been put aside"""
+        pass
+
+    def encode(self, frame: Buffer) -> bytes:
+        """Frame a single message"""
+        return b"".join(self._encode(frame))
+
+    def encode_many(self, frames: typing.Iterable[Buffer]) -> bytes:
+        """Frame many messages into one buffer, to be sent at once"""
+        parts = []
+        for frame in frames:
+            parts.extend(self._encode(frame))
+        return b"".join(parts)
+
+    def _encode(self, frame: Buffer) -> typing.Iterable[Buffer]:
+        raise NotImplementedError
+
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class LengthPrefixed(Codec):
+    def __init__(self, prefix: str = "!I", max_frame_size: int = 1 << 24):
+        """Frames preceded by their length, either as a fixed size `struct` format (default 4 byte big-endian)
+        or `prefix="varint"` for a protobuf style variable length integer"""
+        super().__init__(max_frame_size)
+        self.prefix = prefix
+        self._struct = None if prefix == "varint" else struct.Struct(prefix)
+
+    def _header(self, data, offset):
+        """Get (length, header size) or None if the header is incomplete"""
+        if self._struct is not None:
+            if len(data) - offset < self._struct.size:
+                return None
+            return self._struct.unpack_from(data, offset)[0], self._struct.size
+        value = shift = 0
+        for index in range(offset, min(len(data), offset + 10)):
+            byte = data[index]
+            value |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return value, index + 1 - offset
+            shift += 7
+        if len(data) - offset >= 10:
+            raise FrameError("Varint length prefix is too long")
+        return None
+
+    def _parse(self, data, offset):
+        header = self._header(data, offset)
+        if header is None:
+            return None
+        length, size = header
+        if length < 0:  # Only possible with a signed prefix format
+            raise FrameError("Negative frame length {0}".format(length))
+        if length > self.max_frame_size:
+            raise FrameError("Frame is larger than {0} bytes".format(self.max_frame_size))
+        start = offset + size
+        end = start + length
+        if end > len(data):
+            return None
+        return start, end, end
+
+    def _encode(self, frame):
+        if self._struct is not None:
+            return self._struct.pack(len(frame)), frame
+        return _encode_varint(len(frame)), frame
+
+
+class Delimited(Codec):
+    def __init__(self, delimiter: bytes = b"\n", max_frame_size: int = 1 << 16):
+        """Frames ending in a delimiter (newline by default), which isn't included in the frame"""
+        super().__init__(max_frame_size)
+        if not delimiter:
+            raise ValueError("Delimiter can't be empty!")
+        self.delimiter = delimiter
+        self._scanned = 0  # How far the held bytes have been searched already
+
+    def _parse(self, data, offset, search_from=0):
+        index = data.find(self.delimiter, max(offset, search_from))
+        if index == -1:
+            if len(data) - offset > self.max_frame_size:
+                raise FrameError("Frame is larger than {0} bytes".format(self.max_frame_size))
+            return None
+        if index - offset > self.max_frame_size:
+            raise FrameError("Frame is larger than {0} bytes".format(self.max_frame_size))
+        return offset, index, index + len(self.delimiter)
+
+    def _ready(self):
+        if self._parse(self._buffer, 0, self._scanned) is not None:
+            self._scanned = 0
+            return True
+        self._rest()
+        return False
+
+    def _rest(self):
+        self._scanned = max(0, len(self._buffer) - len(self.delimiter) + 1)  # Only search new bytes next time
+
+    def _encode(self, frame):
+        return frame, self.delimiter
+
+
+class Netstring(Codec):
+    def __init__(self, max_frame_size: int = 1 << 24):
+        """Netstrings, `<length>:<data>,`"""
+        super().__init__(max_frame_size)
+        self._digits = len(str(max_frame_size))
+
+    def _parse(self, data, offset):
+        colon = data.find(b":", offset, offset + self._digits + 1)
+        if colon == -1:
+            if len(data) - offset > self._digits:
+                raise FrameError("Netstring length is missing or too long")
+            return None
+        digits = data[offset:colon]
+        if not digits.isdigit():
+            raise FrameError("Invalid netstring length {0!r}".format(bytes(digits)))
+        length = int(digits)
+        if length > self.max_frame_size:
+            raise FrameError("Frame is larger than {0} bytes".format(self.max_frame_size))
+        start = colon + 1
+        end = start + length
+        if end >= len(data):
+            return None
+        if data[end] != 0x2c:  # ","
+            raise FrameError("Netstring isn't terminated by a comma")
+        return start, end, end + 1
+
+    def _encode(self, frame):
+        return str(len(frame)).encode(), b":", frame, b","
+
+
+class Framed:
+    def __init__(self, sock: BaseSocket, codec: Codec = None, read_size: int = 1 << 16):
+        """Read and write frames on a socket. Iterate with `async for frame in framed`, it stops when the peer
+        closes the connection. `write` queues frames, which `flush` sends together in a single `sendall`."""
+        self.socket = sock
+        self.codec = codec if codec is not None else LengthPrefixed()
+        self.read_size = read_size
+        self.frames_received = 0
+        self.frames_sent = 0
+        self._frames = deque()
+        self._outgoing = []
+        self._eof = False
+
+    def __repr__(self):
+        return "<{0} socket={1} codec={2}>".format(self.__class__.__name__, self.socket, self.codec)
+
+    async def recv_frame(self) -> typing.Optional[memoryview]:
+        """Get the next frame, or None once the peer has closed the connection"""
+        while not self._frames:
+            if self._eof:
+                return None
+            data = await self.socket.recv(self.read_size)
+            if not data:
+                self._eof = True
+                if self.codec.buffered:
+                    raise FrameError("Connection closed in the middle of a frame")
+                return None
+            self._frames.extend(self.codec.feed(data))
+        self.frames_received += 1
+        return self._frames.popleft()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> memoryview:
+        frame = await self.recv_frame()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    def write(self, frame: Buffer):
+        """Queue a frame to be sent by the next `flush`"""
+        self._outgoing.append(frame)
+
+    async def flush(self):
+        """Send every queued frame in one go"""
+        if self._outgoing:
+            frames, self._outgoing = self._outgoing, []
+            await self.socket.sendall(self.codec.encode_many(frames))
+            self.frames_sent += len(frames)
+
+    async def send(self, frame: Buffer):
+        """Send a frame (along with any queued ones)"""
+        self.write(frame)
+        await self.flush()
+
+    async def send_many(self, frames: typing.Iterable[Buffer]):
+        for frame in frames:
+            self._outgoing.append(frame)
+        await self.flush()
+
+
+def framed(sock: BaseSocket, codec: Codec = None, **kwargs) -> Framed:
+    """Wrap a socket to read and write frames, length prefixed unless another `codec` is given"""
+    return Framed(sock, codec, **kwargs)
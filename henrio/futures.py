@@ -116,6 +116,9 @@ class Task:
         self._callback = None
         self._joiners = list()
         self._throw_later = None
+        self._ready_at = None  # Loop time the task last became ready to run, when the loop tracks delays
+        self.queue_delay = 0.0
+        self.total_queue_delay = 0.0
         super().__init__()
         if hasattr(task, "__await__"):
             self._task = task.__await__()
@@ -204,6 +207,8 @@ class Task:
 
     async def wait(self):
         """Wait on this future to finish (different than awaiting, which should not be done except for the original caller)"""
+        if self.complete or self.cancelled or self._error:
+            return
         fut = Future()
         self._joiners.append(fut)
         await fut
@@ -0,0 +1,514 @@
+import typing
+from inspect import isawaitable
+from traceback import print_exc
+
+from .bases import BaseSocket
+from .io import open_connection
+from .server import Server, start_server
+
+__all__ = ["HTTPError", "Headers", "HTTPRequest", "HTTPResponse", "HTTPConnection", "start_http_server",
+           "open_http_connection"]
+
+_REASONS = {100: "Continue", 200: "OK", 201: "Created", 204: "No Content", 301: "Moved Permanently", 302: "Found",
+            304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+            500: "Internal Server Error", 501: "Not Implemented", 503: "Service Unavailable"}
+_NO_BODY = {"GET", "HEAD", "DELETE", "OPTIONS"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        """A malformed message. `status` is what a server should answer with."""
+        super().__init__(message)
+        self.status = status
+
+
+class Headers:
+    def __init__(self, data: bytes, fields: typing.List[typing.Tuple[int, int, int, int]]):
+        """Header fields of a received message. Nothing is copied or decoded when the message is parsed, only
+        offsets into the received bytes are kept. `view` gets a value as a memoryview of them."""
+        self._data = data
+        self._fields = fields  # (name start, name end, value start, value end)
+
+    def __repr__(self):
+        return "<{0} {1}>".format(self.__class__.__name__, self.items())
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __contains__(self, name: str):
+        return self._find_first(name) is not None
+
+    def _find(self, name):
+        name = name.lower().encode("latin-1")
+        data = self._data
+        for field in self._fields:
+            if field[1] - field[0] == len(name) and data[field[0]:field[1]].lower() == name:
+                yield field
+
+    def _find_first(self, name):
+        for field in self._find(name):
+            return field
+        return None
+
+    def view(self, name: str) -> typing.Optional[memoryview]:
+        """Get the first value for a header as a memoryview, without copying"""
+        field = self._find_first(name)
+        return memoryview(self._data)[field[2]:field[3]] if field is not None else None
+
+    def get(self, name: str, default: str = None) -> typing.Optional[str]:
+        """Get the first value for a header (case insensitive)"""
+        field = self._find_first(name)
+        return self._data[field[2]:field[3]].decode("latin-1") if field is not None else default
+
+    __getitem__ = get
+
+    def getall(self, name: str) -> typing.List[str]:
+        return [self._data[field[2]:field[3]].decode("latin-1") for field in self._find(name)]
+
+    def items(self) -> typing.List[typing.Tuple[str, str]]:
+        data = self._data
+        return [(data[ns:ne].decode("latin-1"), data[vs:ve].decode("latin-1")) for ns, ne, vs, ve in self._fields]
+
+    def _has_token(self, name, token):
+        """Whether a comma separated header (i.e. Connection) includes the token"""
+        token = token.encode("latin-1")
+        for field in self._find(name):
+            if token in self._data[field[2]:field[3]].lower().replace(b" ", b"").split(b","):
+                return True
+        return False
+
+
+def _parse_head(data: bytes, start: int, end: int):
+    """Split a message head into its start line and `henrio.Headers`, keeping offsets only"""
+    line_end = data.find(b"\r\n", start, end)
+    if line_end == -1:
+        line_end = end
+    fields = []
+    pos = line_end + 2
+    while pos < end:
+        eol = data.find(b"\r\n", pos, end)
+        if eol == -1:
+            eol = end
+        colon = data.find(b":", pos, eol)
+        if colon <= pos or data[colon - 1] in b" \t":
+            raise HTTPError(400, "Malformed header line")
+        vs, ve = colon + 1, eol
+        while vs < ve and data[vs] in b" \t":
+            vs += 1
+        while ve > vs and data[ve - 1] in b" \t":
+            ve -= 1
+        fields.append((pos, colon, vs, ve))
+        pos = eol + 2
+    return data[start:line_end].decode("latin-1"), Headers(data, fields)
+
+
+class _Reader:
+    def __init__(self, sock: BaseSocket, read_size: int = 1 << 16):
+        """Buffered reads off a socket. Data is kept as an immutable bytes object so parsed heads can point into it,
+        only unread leftovers are copied when more arrives."""
+        self.socket = sock
+        self.read_size = read_size
+        self.data = b""
+        self.pos = 0
+        self._scanned = 0
+        self.eof = False
+
+    async def _fill(self):
+        chunk = await self.socket.recv(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos < len(self.data):
+            self.data = self.data[self.pos:] + chunk
+        else:
+            self.data = chunk
+        self._scanned -= self.pos
+        self.pos = 0
+        return True
+
+    def _find_head(self) -> int:
+        """Index of the end of the next head in the buffer or -1"""
+        index = self.data.find(b"\r\n\r\n", max(self.pos, self._scanned))
+        if index == -1:
+            self._scanned = max(self.pos, len(self.data) - 3)
+        return index
+
+    def head_buffered(self) -> bool:
+        return self._find_head() != -1
+
+    async def read_head(self, max_size: int):
+        """Read the next message head, returns (data, start, end) or None on a clean EOF"""
+        while self.pos < len(self.data) and self.data[self.pos:self.pos + 2] == b"\r\n":
+            self.pos += 2  # Allowed stray CRLFs between messages
+        while True:
+            index = self._find_head()
+            if index != -1:
+                start, self.pos = self.pos, index + 4
+                self._scanned = self.pos
+                return self.data, start, index
+            if len(self.data) - self.pos > max_size:
+                raise HTTPError(431, "Message head is too large")
+            if not await self._fill():
+                if self.pos < len(self.data):
+                    raise HTTPError(400, "Connection closed in the middle of a message head")
+                return None
+
+    async def read_exact(self, nbytes: int) -> bytes:
+        if len(self.data) - self.pos < nbytes:  # Collect the parts instead of growing the buffer for big bodies
+            parts = [self.data[self.pos:]]
+            have = len(parts[0])
+            while have < nbytes:
+                chunk = await self.socket.recv(max(self.read_size, nbytes - have))
+                if not chunk:
+                    self.eof = True
+                    raise HTTPError(400, "Connection closed in the middle of a message body")
+                parts.append(chunk)
+                have += len(chunk)
+            self.data = b"".join(parts)
+            self._scanned = self.pos = 0
+        data = self.data[self.pos:self.pos + nbytes]
+        self.pos += nbytes
+        return data
+
+    async def read_line(self, max_size: int = 4096) -> bytes:
+        while True:
+            index = self.data.find(b"\r\n", self.pos)
+            if index != -1:
+                line = self.data[self.pos:index]
+                self.pos = index + 2
+                return line
+            if len(self.data) - self.pos > max_size:
+                raise HTTPError(400, "Line is too long")
+            if not await self._fill():
+                raise HTTPError(400, "Connection closed in the middle of a message body")
+
+    async def read_chunked(self, max_size: int) -> bytes:
+        parts = []
+        total = 0
+        while True:
+            line = await self.read_line()
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HTTPError(400, "Invalid chunk size") from None
+            if not size:
+                while await self.read_line():  # Trailers, which we skip
+                    pass
+                return b"".join(parts)
+            total += size
+            if total > max_size:
+                raise HTTPError(413, "Message body is too large")
+            parts.append(await self.read_exact(size))
+            if await self.read_exact(2) != b"\r\n":
+                raise HTTPError(400, "Chunk isn't followed by CRLF")
+
+    async def read_to_eof(self) -> bytes:
+        while await self._fill():
+            pass
+        data = self.data[self.pos:]
+        self.pos = len(self.data)
+        return data
+
+    async def read_body(self, headers: Headers, max_size: int) -> typing.Optional[bytes]:
+        """Read a body framed by the headers. Returns None if it has neither a length nor chunked encoding."""
+        if headers._has_token("transfer-encoding", "chunked"):
+            return await self.read_chunked(max_size)
+        length = headers.get("content-length")
+        if length is None:
+            return None
+        try:
+            length = int(length)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > max_size:
+            raise HTTPError(413, "Message body is too large")
+        return await self.read_exact(length)
+
+
+class HTTPRequest:
+    def __init__(self, method: str, target: str, headers=None, body=b"", version: str = "HTTP/1.1", addr=None):
+        """An HTTP request. Received requests have `henrio.Headers`, outgoing ones can use a dict or list of pairs.
+        An outgoing body can be an iterable of chunks to send it with chunked encoding."""
+        self.method = method
+        self.target = target
+        self.headers = headers if headers is not None else []
+        self.body = body
+        self.version = version
+        self.addr = addr
+
+    def __repr__(self):
+        return "<{0} {1} {2}>".format(self.__class__.__name__, self.method, self.target)
+
+    @property
+    def path(self) -> str:
+        return self.target.split("?", 1)[0]
+
+    @property
+    def query(self) -> str:
+        return self.target.split("?", 1)[1] if "?" in self.target else ""
+
+    @property
+    def keep_alive(self) -> bool:
+        return _keep_alive(self.version, self.headers)
+
+
+class HTTPResponse:
+    def __init__(self, status: int = 200, body=b"", headers=None, reason: str = None, version: str = "HTTP/1.1"):
+        """An HTTP response. Received responses have `henrio.Headers`, outgoing ones can use a dict or list of pairs.
+        An outgoing body can be an iterable of chunks to send it with chunked encoding."""
+        self.status = status
+        self.body = body
+        self.headers = headers if headers is not None else []
+        self.reason = reason if reason is not None else _REASONS.get(status, "")
+        self.version = version
+
+    def __repr__(self):
+        return "<{0} {1} {2}>".format(self.__class__.__name__, self.status, self.reason)
+
+    @property
+    def keep_alive(self) -> bool:
+        return _keep_alive(self.version, self.headers)
+
+
+def _keep_alive(version, headers):
+    if isinstance(headers, Headers):
+        if headers._has_token("connection", "close"):
+            return False
+        return version == "HTTP/1.1" or headers._has_token("connection", "keep-alive")
+    return version == "HTTP/1.1"
+
+
+def _header_items(headers):
+    if isinstance(headers, Headers):
+        return headers.items()
+    if isinstance(headers, dict):
+        return headers.items()
+    return headers
+
+
+def _has_framing(headers) -> bool:
+    """Whether the headers already say how the body is delimited"""
+    if isinstance(headers, Headers):
+        return "content-length" in headers or "transfer-encoding" in headers
+    return any(name.lower() in ("content-length", "transfer-encoding") for name, _ in _header_items(headers))
+
+
+def _encode_head(start_line: str, headers, body, extra) -> typing.Tuple[bytes, bool]:
+    """Serialize a message head, returns it and whether the body is sent chunked.
+    Raises ValueError if the start line or a header contains CR or LF, which would let it inject headers."""
+    lines = [start_line]
+    for name, value in _header_items(headers):
+        lines.append("{0}: {1}".format(name, value))
+    for line in lines:
+        if "\r" in line or "\n" in line:
+            raise ValueError("CR or LF in an HTTP message head: {0!r}".format(line))
+    lines.extend(extra)
+    chunked = body is not None and not isinstance(body, (bytes, bytearray, memoryview))
+    if chunked:
+        lines.append("Transfer-Encoding: chunked")
+    elif body is not None:
+        lines.append("Content-Length: {0}".format(len(body)))
+    lines.append("\r\n")
+    return "\r\n".join(lines).encode("latin-1"), chunked
+
+
+def _encode_chunk(chunk) -> bytes:
+    return b"%x\r\n%s\r\n" % (len(chunk), chunk) if chunk else b""
+
+
+async def _send_chunked(sock, body):
+    if hasattr(body, "__aiter__"):
+        async for chunk in body:
+            if chunk:
+                await sock.sendall(_encode_chunk(chunk))
+    else:
+        for chunk in body:
+            if chunk:
+                await sock.sendall(_encode_chunk(chunk))
+    await sock.sendall(b"0\r\n\r\n")
+
+
+async def _serve_http(handler, sock: BaseSocket, addr, max_head_size: int, max_body_size: int):
+    """Answer requests on a connection in order until either side closes it. Responses to pipelined requests
+    are written together, once no further request is waiting in the buffer."""
+    reader = _Reader(sock)
+    pending = []
+    try:
+        while True:
+            if pending and not reader.head_buffered():
+                await sock.sendall(b"".join(pending))
+                pending.clear()
+            try:
+                head = await reader.read_head(max_head_size)
+                if head is None:
+                    return
+                start_line, headers = _parse_head(*head)
+                try:
+                    method, target, version = start_line.split(" ")
+                except ValueError:
+                    raise HTTPError(400, "Malformed request line") from None
+                if not version.startswith("HTTP/1."):
+                    raise HTTPError(400, "Unsupported HTTP version")
+                body = await reader.read_body(headers, max_body_size)
+            except HTTPError as err:
+                pending.append(_encode_head("HTTP/1.1 {0} {1}".format(err.status, _REASONS.get(err.status, "")),
+                                            (), b"", ["Connection: close"])[0])
+                return
+
+            request = HTTPRequest(method, target, headers, body or b"", version, addr)
+            keep_alive = request.keep_alive
+            try:
+                response = handler(request)
+                if isawaitable(response):
+                    response = await response
+                if not isinstance(response, HTTPResponse):
+                    response = HTTPResponse(200, response)
+                body = response.body
+                if body is None and not _has_framing(response.headers):
+                    body = b""  # Unframed, the client would wait on a kept-alive connection for a body forever
+                keep_alive = keep_alive and response.status != 500
+                head, chunked = _encode_head("HTTP/1.1 {0} {1}".format(response.status, response.reason),
+                                             response.headers, body, [] if keep_alive else ["Connection: close"])
+            except Exception:
+                print_exc()
+                body = b""
+                keep_alive = False  # Close the connection after the error
+                head, chunked = _encode_head("HTTP/1.1 500 {0}".format(_REASONS[500]), (), body,
+                                             ["Connection: close"])
+
+            head_only = method == "HEAD"
+            pending.append(head)
+            if chunked and not head_only:
+                await sock.sendall(b"".join(pending))
+                pending.clear()
+                await _send_chunked(sock, body)
+            elif not head_only and body:
+                pending.append(body)
+            if len(pending) > 64:
+                await sock.sendall(b"".join(pending))
+                pending.clear()
+            if not keep_alive:
+                return
+    finally:
+        if pending:
+            try:
+                await sock.sendall(b"".join(pending))
+            except OSError:
+                pass
+
+
+async def start_http_server(handler: typing.Callable[[HTTPRequest], typing.Any], host: str = None, port: int = 0, *,
+                            max_head_size: int = 1 << 16,
+                            max_body_size: int = 1 << 24,
+                            **kwargs) -> Server:
+    """Serve HTTP/1.1 with keep-alive and pipelining. `handler(request)` is called (or awaited) for every
+    `henrio.HTTPRequest` and returns an `henrio.HTTPResponse` or just the body. Extra keyword arguments are passed
+    to `henrio.start_server`."""
+    async def serve(sock, addr):
+        await _serve_http(handler, sock, addr, max_head_size, max_body_size)
+
+    return await start_server(serve, host, port, **kwargs)
+
+
+class HTTPConnection:
+    def __init__(self, sock: BaseSocket, host: str, max_body_size: int = 1 << 24):
+        """A persistent HTTP/1.1 client connection. `pipeline` sends many requests in one write
+        before reading any of the responses."""
+        self.socket = sock
+        self.host = host
+        self.max_body_size = max_body_size
+        self.closed = False
+        self._reader = _Reader(sock)
+
+    def __repr__(self):
+        return "<{0} host={1} closed={2}>".format(self.__class__.__name__, self.host, self.closed)
+
+    def _encode(self, request: HTTPRequest) -> typing.Tuple[bytes, bool]:
+        extra = []
+        names = {name.lower() for name, _ in _header_items(request.headers)}
+        if "host" not in names:
+            extra.append("Host: {0}".format(self.host))
+        body = request.body
+        if isinstance(body, (bytes, bytearray, memoryview)) and not body and request.method in _NO_BODY:
+            body = None  # No Content-Length
+        return _encode_head("{0} {1} {2}".format(request.method, request.target, request.version),
+                            request.headers, body, extra)
+
+    async def _send(self, requests: typing.List[HTTPRequest]):
+        if self.closed:
+            raise RuntimeError("Connection is closed!")
+        batch = []
+        for request in requests:
+            head, chunked = self._encode(request)
+            batch.append(head)
+            if chunked:
+                await self.socket.sendall(b"".join(batch))
+                batch.clear()
+                await _send_chunked(self.socket, request.body)
+            elif request.body:
+                batch.append(request.body)
+        if batch:
+            await self.socket.sendall(b"".join(batch))
+
+    async def _read_response(self, method: str) -> HTTPResponse:
+        while True:
+            head = await self._reader.read_head(1 << 16)
+            if head is None:
+                self.closed = True
+                raise ConnectionResetError("Connection closed before the response")
+            start_line, headers = _parse_head(*head)
+            try:
+                version, status, *reason = start_line.split(" ", 2)
+                status = int(status)
+            except ValueError:
+                raise HTTPError(502, "Malformed status line") from None
+            if 100 <= status < 200:
+                continue  # Interim responses
+            break
+        response = HTTPResponse(status, b"", headers, reason[0] if reason else "", version)
+        if method == "HEAD" or status in (204, 304):
+            return response
+        body = await self._reader.read_body(headers, self.max_body_size)
+        if body is None:
+            body = await self._reader.read_to_eof()
+            self.closed = True
+        response.body = body
+        if not response.keep_alive:
+            self.closed = True
+        return response
+
+    async def request(self, method: str, target: str, headers=None, body=b"") -> HTTPResponse:
+        """Send a request and read its response"""
+        request = HTTPRequest(method, target, headers, body)
+        await self._send([request])
+        return await self._read_response(method)
+
+    async def pipeline(self, requests: typing.Iterable[typing.Union[HTTPRequest, typing.Tuple[str, str]]]) \
+            -> typing.List[HTTPResponse]:
+        """Send every request at once, then read the responses in order. Requests can be (method, target) pairs."""
+        requests = [request if isinstance(request, HTTPRequest) else HTTPRequest(*request) for request in requests]
+        await self._send(requests)
+        return [await self._read_response(request.method) for request in requests]
+
+    async def close(self):
+        self.closed = True
+        await self.socket.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
+
+
+async def open_http_connection(hostpair: tuple, **kwargs) -> HTTPConnection:
+    """Connect to an HTTP server, extra keyword arguments are passed to `henrio.open_connection`"""
+    sock = await open_connection(hostpair, **kwargs)
+    host, port = hostpair
+    default = 443 if kwargs.get("ssl") else 80
+    return HTTPConnection(sock, host if port == default else "{0}:{1}".format(host, port))
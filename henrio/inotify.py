@@ -0,0 +1,181 @@
+import errno
+import os
+import struct
+import typing
+from collections import deque, namedtuple
+
+from .yields import wait_readable, unwrap_file
+
+__all__ = ["WatchEvent", "Watcher", "watch"]
+
+try:
+    import ctypes
+
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _inotify_init1 = _libc.inotify_init1
+    _inotify_init1.argtypes = [ctypes.c_int]
+    _inotify_add_watch = _libc.inotify_add_watch
+    _inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    _inotify_rm_watch = _libc.inotify_rm_watch
+    _inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+except (ImportError, OSError, AttributeError):  # Not Linux
+    _libc = None
+
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_CLOSE_NOWRITE = 0x00000010
+IN_OPEN = 0x00000020
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+IN_CHANGES = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+             IN_DELETE_SELF | IN_MOVE_SELF
+
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+_EVENT = struct.Struct("iIII")  # Watch descriptor, mask, cookie, name length
+
+WatchEvent = namedtuple("WatchEvent", "path mask cookie")
+WatchEvent.__doc__ = """Something happened to `path`. `mask` is every `IN_*` flag seen for it in the batch.
+An IN_Q_OVERFLOW event (path None) means the kernel dropped events, rescan whatever you're watching."""
+
+
+def _check(result):
+    if result == -1:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return result
+
+
+class Watcher:
+    def __init__(self, events: int = IN_CHANGES, read_size: int = 1 << 16):
+        """Watch files and directories for changes through a single inotify descriptor. The descriptor is waited on
+        by the loop's selector like a socket, so any number of watches cost nothing until something changes.
+        Everything that can be read at once is decoded as a batch and events for the same path are merged."""
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify isn't available on this platform")
+        self.events = events
+        self.read_size = read_size
+        self._fd = _check(_inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC))
+        self._paths = dict()  # Watch descriptor -> path
+        self._watches = dict()  # Path -> watch descriptor
+        self._pending = deque()
+
+    def __repr__(self):
+        return "<{0} watches={1}>".format(self.__class__.__name__, len(self._paths))
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def add(self, path: typing.Union[str, bytes], events: int = None) -> int:
+        """Start watching a path (a directory watches its entries), returns the watch descriptor"""
+        wd = _check(_inotify_add_watch(self._fd, os.fsencode(path), self.events if events is None else events))
+        self._paths[wd] = path
+        self._watches[path] = wd
+        return wd
+
+    def remove(self, path: typing.Union[str, bytes]):
+        wd = self._watches.pop(path)
+        self._paths.pop(wd, None)
+        try:
+            _check(_inotify_rm_watch(self._fd, wd))
+        except OSError as err:
+            if err.errno != errno.EINVAL:  # The kernel already dropped it
+                raise
+
+    def _drain(self) -> typing.List[WatchEvent]:
+        """Read and decode everything queued on the descriptor, merging events on the same path"""
+        merged = dict()  # Path -> [mask, cookie], in the order they first showed up
+        while True:
+            try:
+                data = os.read(self._fd, self.read_size)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    path = None
+                elif wd in self._paths:
+                    path = self._paths[wd]
+                    if name:
+                        path = os.path.join(path, os.fsdecode(name) if isinstance(path, str) else name)
+                    if mask & IN_IGNORED:  # The watch is gone (i.e. its file was deleted)
+                        self._watches.pop(self._paths.pop(wd), None)
+                        mask &= ~IN_IGNORED
+                        if not mask:
+                            continue
+                else:
+                    continue  # Removed while its events were queued
+                if path in merged:
+                    merged[path][0] |= mask
+                    merged[path][1] = merged[path][1] or cookie
+                else:
+                    merged[path] = [mask, cookie]
+            if len(data) < self.read_size - _EVENT.size - 256:
+                break  # Couldn't have been cut short, no need to try another read
+        return [WatchEvent(path, mask, cookie) for path, (mask, cookie) in merged.items()]
+
+    async def read(self) -> typing.List[WatchEvent]:
+        """Wait for the next batch of changes"""
+        while True:
+            if self._pending:
+                events = list(self._pending)
+                self._pending.clear()
+                return events
+            await wait_readable(self)
+            events = self._drain()
+            if events:
+                return events
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> WatchEvent:
+        """Get the next change, stops once every watched path is gone"""
+        while not self._pending:
+            if not self._paths:
+                raise StopAsyncIteration
+            await wait_readable(self)
+            self._pending.extend(self._drain())
+        return self._pending.popleft()
+
+    async def close(self):
+        if self._fd != -1:
+            await unwrap_file(self)
+            os.close(self._fd)
+            self._fd = -1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
+
+
+def watch(path: typing.Union[str, bytes, typing.Iterable[typing.Union[str, bytes]]],
+          events: int = IN_CHANGES) -> Watcher:
+    """Watch one or many paths for `events` (IN_* flags from `henrio.inotify`, any change by default).
+    Use as `async for event in henrio.watch(path)` or call `read()` for whole batches of `henrio.WatchEvent`."""
+    watcher = Watcher(events)
+    try:
+        for item in ([path] if isinstance(path, (str, bytes, os.PathLike)) else path):
+            watcher.add(os.fspath(item))
+    except BaseException:
+        os.close(watcher._fd)
+        raise
+    return watcher
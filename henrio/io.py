@@ -2,29 +2,41 @@ import typing
 import socket
 import errno
 import io
+import mmap
 import os
+import threading
+from array import array
+from collections import deque
 from concurrent.futures import CancelledError
 from types import coroutine
 from functools import wraps
 
-from .workers import threadworker
-from .yields import wrap_socket, unwrap_socket, wait_readable, wait_writable
-from .bases import BaseSocket
+from .workers import threadworker, get_pool, _settle
+from .futures import Future
+from .resolver import get_resolver
+from .yields import wrap_socket, unwrap_socket, wait_readable, wait_writable, get_loop, call_after, sleep
+from .bases import BaseSocket, BaseFile
 from .timeout import timeout as _timeout
 
 try:
     import ssl as _ssl
     from ssl import SSLWantReadError, SSLWantWriteError
 
+    from .tls import TLSSocket, SessionCache, get_session_cache
+
     WantRead = (BlockingIOError, InterruptedError, SSLWantReadError)
     WantWrite = (BlockingIOError, InterruptedError, SSLWantWriteError)
 except ImportError:  # Borrowed from curio https://github.com/dabeaz/curio/blob/master/curio/io.py
     _ssl = None
+    TLSSocket = None
+    SessionCache = None
+    get_session_cache = None
     WantRead = (BlockingIOError, InterruptedError)
     WantWrite = (BlockingIOError, InterruptedError)
 
 __all__ = ["threaded_connect", "threaded_bind", "getaddrinfo", "create_socketpair", "async_connect",
-           "ssl_do_handshake", "AsyncSocket", "aopen", "AsyncFile", "open_connection", "ssl_wrap_socket"]
+           "ssl_do_handshake", "AsyncSocket", "aopen", "AsyncFile", "MappedFile", "BufferedFile", "open_connection",
+           "ssl_wrap_socket", "open_unix_connection"]
 
 
 async def threaded_connect(socket: socket.socket, hostpair: typing.Tuple[str, int]):
@@ -72,7 +84,7 @@ def _async_connect(sock, host):
             err = sock.connect_ex((addr, port))
             if err in yerrors:
                 yield
-            elif err in (getattr(errno, "EISCONN", None), getattr(errno, "WSAEISCONN", None)):
+            elif err in (0, getattr(errno, "EISCONN", None), getattr(errno, "WSAEISCONN", None)):
                 break
             else:
                 raise OSError(err, os.strerror(err))
@@ -92,7 +104,7 @@ async def async_connect(sock, host, timeout=None):
 @wraps(socket.getaddrinfo)
 async def getaddrinfo(*args, **kwargs):
     """Run `getaddrinfo` in a thread. Same arguments."""
-    return await threadworker(socket.getaddrinfo, args=args, kwargs=kwargs)  # But hey it's async right?
+    return await threadworker(socket.getaddrinfo, *args, **kwargs)  # But hey it's async right?
 
 
 @wraps(socket.socketpair)
@@ -115,20 +127,58 @@ if _ssl:
                 yield
 
 
-    @wraps(_ssl.wrap_socket)
-    async def ssl_wrap_socket(socket, ssl_context=None, server_hostname=None, alpn_protocols=None):
-        """Wraps a socket twofold, first into a new socket with ssl.wrap_socket, then returns a new `henrio.AsyncSocket`"""
-        if ssl_context is None:
-            ssl_context = _ssl.create_default_context()
+    _default_contexts = dict()
+
+
+    def _default_context(server_hostname, alpn_protocols):
+        """Default contexts are shared so their sessions can be resumed by later connections"""
+        key = (bool(server_hostname), tuple(alpn_protocols or ()))
+        context = _default_contexts.get(key)
+        if context is None:
+            context = _default_contexts[key] = _ssl.create_default_context()
 
             if not server_hostname:
-                ssl_context.check_hostname = False
+                context.check_hostname = False
 
             if alpn_protocols:
-                ssl_context.set_alpn_protocols(alpn_protocols)
+                context.set_alpn_protocols(alpn_protocols)
+        return context
+
+
+    @wraps(_ssl.wrap_socket)
+    async def ssl_wrap_socket(socket, ssl_context=None, server_hostname=None, alpn_protocols=None, memory_bio=False,
+                              session_cache=None, server_side=False, suppress_ragged_eofs=False):
+        """Wraps a socket twofold, first into a new socket with ssl.wrap_socket, then returns a new `henrio.AsyncSocket`
+        Pass `memory_bio` to get a `henrio.TLSSocket` over the plain socket instead, call its `do_handshake` first.
+        Sessions of connected sockets are resumed from the loop's `henrio.SessionCache` (or `session_cache`)
+        and saved back on close, pass `session_cache=False` to always do a full handshake.
+        `server_side` sockets need an `ssl_context` with a certificate loaded and don't use the session cache.
+        `suppress_ragged_eofs` is passed on to `henrio.TLSSocket`."""
+        if ssl_context is None:
+            if server_side:
+                raise ValueError("Server side TLS needs an ssl_context with a certificate loaded")
+            ssl_context = _default_context(server_hostname, alpn_protocols)
+
+        cache = key = session = None
+        if session_cache is not False and not server_side:
+            try:
+                peer, port = socket.getpeername()[:2]
+            except (OSError, ValueError):  # Not connected (or not TCP), nothing to key on
+                pass
+            else:
+                cache = session_cache if session_cache is not None else get_session_cache(await get_loop())
+                key = (server_hostname or peer, port, ssl_context)
+                session = cache.get(key)
 
-        newsocket = ssl_context.wrap_socket(socket, server_hostname=server_hostname, do_handshake_on_connect=False)
-        return await wrap_socket(newsocket)
+        if memory_bio:
+            newsocket = TLSSocket(await wrap_socket(socket), ssl_context, server_side, server_hostname=server_hostname,
+                                  session=session, suppress_ragged_eofs=suppress_ragged_eofs)
+        else:
+            newsocket = await wrap_socket(ssl_context.wrap_socket(socket, server_side, server_hostname=server_hostname,
+                                                                  do_handshake_on_connect=False, session=session))
+        if cache is not None:
+            newsocket._session_cache = (cache, key)
+        return newsocket
 
 
 else:
@@ -136,57 +186,315 @@ else:
     ssl_wrap_socket = None
 
 
+def _interleave(infos, first_family_count=1):
+    """Order addresses for Happy Eyeballs (RFC 8305), starting with `first_family_count` addresses
+    of the preferred (first) family, then alternating between families."""
+    families = {}
+    for info in infos:
+        families.setdefault(info[0], []).append(info)
+    queues = list(families.values())
+    ordered = []
+    if first_family_count > 1 and queues:
+        ordered.extend(queues[0][:first_family_count - 1])
+        del queues[0][:first_family_count - 1]
+    while any(queues):
+        for queue in queues:
+            if queue:
+                ordered.append(queue.pop(0))
+    return ordered
+
+
+async def _connect_addr(loop, info, source_addr=None):
+    """Connect a new non-blocking socket to one getaddrinfo result, waiting on writability instead of spinning.
+    Returns the socket, or the error on failure. Cleans up after itself if cancelled."""
+    family, type, proto, _, address = info
+    sock = socket.socket(family, type, proto)
+    try:
+        sock.setblocking(False)
+        if source_addr:
+            sock.bind(source_addr)
+        err = sock.connect_ex(address)
+        if err in yerrors:
+            await wait_writable(sock)
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err not in (0, getattr(errno, "EISCONN", None)):
+            raise OSError(err, "Connect call failed {0}: {1}".format(address, os.strerror(err)))
+        return sock
+    except BaseException as err:
+        loop.unwrap_socket(sock)
+        sock.close()
+        if isinstance(err, CancelledError) or not isinstance(err, Exception):
+            raise
+        return err
+
+
+class _Staggered:
+    def __init__(self, loop, infos, delay, source_addr):
+        """Runs staggered connection attempts, a new one every `delay` seconds or as soon as one fails"""
+        self.loop = loop
+        self.infos = infos
+        self.delay = delay
+        self.source_addr = source_addr
+        self.attempts = []
+        self.changed = None
+
+    def notify(self):
+        if self.changed is not None and not self.changed.complete:
+            self.changed.set_result(None)
+
+    async def attempt(self, info):
+        try:
+            return await _connect_addr(self.loop, info, self.source_addr)
+        finally:
+            self.notify()
+
+    def winner(self):
+        for task in self.attempts:
+            if task.complete and isinstance(task._result, socket.socket):
+                return task
+        return None
+
+    async def wait(self, timeout=None):
+        """Wait for an attempt to finish, or the timeout to run out"""
+        self.changed = Future()
+        timer = None
+        if timeout is not None:
+            timer = self.loop.create_task(call_after(self.notify, timeout))
+        try:
+            await self.changed
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    async def run(self):
+        try:
+            for info in self.infos:
+                task = self.loop.create_task(self.attempt(info))
+                self.attempts.append(task)
+                if not task.complete:  # Start the next one when any fails or we get tired of waiting
+                    await self.wait(self.delay)
+                if self.winner():
+                    break
+
+            while not self.winner() and not all(task.complete for task in self.attempts):
+                await self.wait()
+
+            winner = self.winner()
+        finally:
+            for task in self.attempts:
+                if not task.complete:
+                    task.cancel()
+
+        for task in self.attempts:  # Close anything that finished connecting in the same tick as the winner
+            if task is not winner and task.complete and isinstance(task._result, socket.socket):
+                task._result.close()
+
+        if winner is None:
+            errors = [task._result for task in self.attempts if isinstance(task._result, Exception)]
+            if len(errors) == 1:
+                raise errors[0]
+            raise OSError("Multiple exceptions: {0}".format(", ".join(str(err) for err in errors)))
+        return winner._result
+
+
 @wraps(socket.create_connection)
 async def open_connection(hostpair: tuple, timeout=None, *,
                           ssl=False,
                           source_addr=None,
                           server_hostname=None,
-                          alpn_protocols=None):
-    """Open a new asynchronous connection (like `socket.create_connection`) and returns a new `henrio.AsyncSocket` instance"""
+                          alpn_protocols=None,
+                          happy_eyeballs_delay=None,
+                          interleave=1,
+                          resolver=None,
+                          memory_bio=False,
+                          session_cache=None):
+    """Open a new asynchronous connection (like `socket.create_connection`) and returns a new `henrio.AsyncSocket` instance
+    Every resolved address is tried in turn. Pass `happy_eyeballs_delay` (0.25 is recommended) to race them instead,
+    starting a new attempt every `happy_eyeballs_delay` seconds with IPv6 and IPv4 addresses interleaved
+    (RFC 8305). `interleave` is how many addresses of the first family to try before switching.
+    Names are resolved through the loop's `henrio.Resolver` cache unless another `resolver` is given,
+    pass `resolver=False` to skip caching. With `ssl` and `memory_bio` a `henrio.TLSSocket` is returned.
+    TLS sessions are resumed from the loop's `henrio.SessionCache` unless another `session_cache` is given,
+    pass `session_cache=False` to always do a full handshake."""
     if timeout is not None:
         async with _timeout(timeout):
-            open_connection(hostpair, timeout, ssl=ssl, source_addr=source_addr, server_hostname=server_hostname,
-                            alpn_protocols=alpn_protocols)
-        return
-
-    sock = socket.socket()
-    if source_addr:
-        await threaded_bind(sock, source_addr)
-    addr, port = hostpair
-    addr = (await getaddrinfo(addr, port))[0][-1][0]
-    await async_connect(sock, (addr, port))
+            return await open_connection(hostpair, ssl=ssl, source_addr=source_addr,
+                                         server_hostname=server_hostname, alpn_protocols=alpn_protocols,
+                                         happy_eyeballs_delay=happy_eyeballs_delay, interleave=interleave,
+                                         resolver=resolver, memory_bio=memory_bio, session_cache=session_cache)
 
     if ssl and _ssl is None:
         raise RuntimeError("The SSL Module is missing! SSL connections cannot be made without it!")
 
-    if ssl:
-        if not isinstance(ssl, bool):
-            ssl_context = ssl
+    loop = await get_loop()
+    host, port = hostpair
+    if resolver is False:
+        infos = await getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    else:
+        if resolver is None:
+            resolver = get_resolver(loop)
+        infos = await resolver.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    if not infos:
+        raise OSError("getaddrinfo returned no addresses for {0}".format(host))
+
+    if happy_eyeballs_delay is not None:
+        sock = await _Staggered(loop, _interleave(infos, interleave), happy_eyeballs_delay, source_addr).run()
+    else:
+        errors = []
+        for info in infos:
+            sock = await _connect_addr(loop, info, source_addr)
+            if isinstance(sock, socket.socket):
+                break
+            errors.append(sock)
         else:
-            ssl_context = _ssl.create_default_context()
-            if not server_hostname:
-                ssl_context.check_hostname = False
+            if len(errors) == 1:
+                raise errors[0]
+            raise OSError("Multiple exceptions: {0}".format(", ".join(str(err) for err in errors)))
 
-            if alpn_protocols:
-                ssl_context.set_alpn_protocols(alpn_protocols)
+    if not ssl:
+        return await wrap_socket(sock)
 
-        sock = ssl_context.wrap_socket(sock, server_hostname=server_hostname, do_handshake_on_connect=False)
+    if not isinstance(ssl, bool):
+        ssl_context = ssl
+    else:
+        ssl_context = _default_context(server_hostname, alpn_protocols)
 
-    if ssl:
+    cache = key = session = None
+    if session_cache is not False:
+        cache = session_cache if session_cache is not None else get_session_cache(loop)
+        key = (server_hostname or host, port, ssl_context)
+        session = cache.get(key)
+
+    if memory_bio:
+        tls = TLSSocket(await wrap_socket(sock), ssl_context, server_hostname=server_hostname, session=session)
+        try:
+            await tls.do_handshake()
+        except BaseException:
+            loop.unwrap_socket(sock)
+            sock.close()
+            raise
+        newsocket = tls
+    else:
+        sock = ssl_context.wrap_socket(sock, server_hostname=server_hostname, do_handshake_on_connect=False,
+                                       session=session)
         await ssl_do_handshake(sock)
+        newsocket = await wrap_socket(sock)
+
+    if cache is not None:
+        cache.save(key, newsocket.file if not memory_bio else newsocket)
+        newsocket._session_cache = (cache, key)
+    return newsocket
+
+
+async def open_unix_connection(path: typing.Union[str, bytes], timeout=None) -> "AsyncSocket":
+    """Connect to a Unix domain socket at `path` and return a new `henrio.AsyncSocket` instance.
+    Connecting never blocks, if the listener's backlog is full we back off and try again until `timeout`."""
+    if timeout is not None:
+        async with _timeout(timeout):
+            return await open_unix_connection(path)
 
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.setblocking(False)
+        delay = 0.001
+        while True:
+            try:
+                sock.connect(path)
+                break
+            except BlockingIOError:  # The backlog is full, there's no readiness event for that
+                await sleep(delay)
+                delay = min(delay * 2, 0.1)
+    except BaseException:
+        sock.close()
+        raise
     return await wrap_socket(sock)
 
 
 class AsyncSocket(BaseSocket):
+    _session_cache = None  # (cache, key) to hand the TLS session back to on close
+
     def __init__(self, file: typing.Union[socket.socket, io.BytesIO]):
         """A class for interacting asynchronously with Sockets (transport style sockets as well)"""
         self.file = file
+        self.write_high = 1 << 16
+        self.write_low = 1 << 14
+        self._write_buffer = bytearray()
+        self._write_error = None
+        self._flusher = None
+        self._drain_waiters = []
+        self._sending = 0  # sendall calls in progress, send_buffered queues behind them
+        self.read_size = 1 << 14
+        self.min_read_size = 1 << 10
+        self.max_read_size = 1 << 20
+        self.reads = 0
+        self.bytes_read = 0
+        self._short_reads = 0
+
+    @property
+    def buffered(self) -> int:
+        """Number of bytes queued by `send_buffered` that haven't been sent yet"""
+        return len(self._write_buffer)
+
+    def set_write_buffer_limits(self, high: int = None, low: int = None):
+        """`send_buffered` waits once more than `high` bytes (64KiB) are buffered, until it falls to `low` (high / 4)"""
+        if high is None:
+            high = 1 << 16
+        if low is None:
+            low = high // 4
+        if not 0 <= low <= high:
+            raise ValueError("Need 0 <= low <= high, got low={0} high={1}".format(low, high))
+        self.write_high = high
+        self.write_low = low
+
+    def set_read_size_limits(self, minimum: int = None, maximum: int = None):
+        """Bounds for the read size used by `async for chunk in sock`, 1KiB to 1MiB by default"""
+        if minimum is None:
+            minimum = 1 << 10
+        if maximum is None:
+            maximum = 1 << 20
+        if not 0 < minimum <= maximum:
+            raise ValueError("Need 0 < minimum <= maximum, got minimum={0} maximum={1}".format(minimum, maximum))
+        self.min_read_size = minimum
+        self.max_read_size = maximum
+        self.read_size = min(max(self.read_size, minimum), maximum)
+
+    @property
+    def average_read(self) -> float:
+        """Average size of the chunks read by iterating over the socket"""
+        return self.bytes_read / self.reads if self.reads else 0.0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        """Read the next chunk, stops when the peer closes the connection. The read size doubles whenever a read
+        fills it and halves after two reads in a row come back under half full, within the read size limits."""
+        data = await self.recv(self.read_size)
+        if not data:
+            raise StopAsyncIteration
+        self.reads += 1
+        self.bytes_read += len(data)
+        if len(data) >= self.read_size:
+            self._short_reads = 0
+            self.read_size = min(self.read_size * 2, self.max_read_size)
+        elif len(data) < self.read_size // 2:
+            self._short_reads += 1
+            if self._short_reads >= 2:  # A single short read is often just the tail of a burst
+                self._short_reads = 0
+                self.read_size = max(self.read_size // 2, self.min_read_size)
+        else:
+            self._short_reads = 0
+        return data
 
     @wraps(socket.socket.recv)
-    async def recv(self, nbytes: int) -> bytes:
-        await wait_readable(self.file)
-        return self.file.recv(nbytes)
+    async def recv(self, nbytes: int, timeout: float = None) -> bytes:
+        """Receive up to `nbytes` bytes. Raises TimeoutError if nothing arrives within `timeout` seconds."""
+        while True:
+            await wait_readable(self.file, timeout=timeout)
+            try:
+                return self.file.recv(nbytes)
+            except WantRead:  # i.e. only a TLS record with no data in it (like a session ticket)
+                continue
 
     @wraps(io.BytesIO.read)
     async def read(self, nbytes: int):
@@ -195,14 +503,19 @@ class AsyncSocket(BaseSocket):
 
     @wraps(socket.socket.send)
     async def send(self, data: bytes):
+        if self._flusher is not None:  # Don't jump ahead of what send_buffered queued
+            await self.flush()
         await wait_writable(self.file)
         return self.file.send(data)
 
     @wraps(socket.socket.sendall)
     async def sendall(self, data, flags=0):
         """Borrowed from curio https://github.com/dabeaz/curio/blob/master/curio/io.py"""
+        if self._flusher is not None:  # Don't jump ahead of what send_buffered queued
+            await self.flush()
         buffer = memoryview(data).cast('b')
         total_sent = 0
+        self._sending += 1
         try:
             while buffer:
                 try:
@@ -217,6 +530,10 @@ class AsyncSocket(BaseSocket):
         except Exception as e:
             e.bytes_sent = total_sent
             raise
+        finally:
+            self._sending -= 1
+            if not self._sending and self._write_buffer and self._flusher is None:
+                await self._start_flusher()  # Send what was queued while we were sending
 
     @wraps(io.BytesIO.write)
     async def write(self, data: typing.Union[bytes, str]):
@@ -228,11 +545,63 @@ class AsyncSocket(BaseSocket):
         await wait_writable(self.file)
         return self.file.sendto(data, address)
 
+    @wraps(socket.socket.recv_into)
+    async def recv_into(self, buffer, nbytes: int = 0) -> int:
+        while True:
+            await wait_readable(self.file)
+            try:
+                return self.file.recv_into(buffer, nbytes)
+            except WantRead:
+                continue
+
+    async def send_fds(self, data: bytes, fds: typing.Iterable[int]) -> int:
+        """Send data along with open file descriptors (SCM_RIGHTS) over a Unix domain socket.
+        The descriptors are duplicated into the receiving process, ours stay open. Returns the bytes sent."""
+        ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array("i", fds))]
+        while True:
+            await wait_writable(self.file)
+            try:
+                return self.file.sendmsg([data], ancillary)
+            except WantWrite:
+                continue
+
+    async def recv_fds(self, bufsize: int, maxfds: int) -> typing.Tuple[bytes, typing.List[int], int, typing.Any]:
+        """Receive up to `bufsize` bytes and `maxfds` file descriptors sent with `send_fds`.
+        Returns (data, fds, flags, address), the received descriptors are ours to close."""
+        fds = array("i")
+        while True:
+            await wait_readable(self.file)
+            try:
+                msg, ancdata, flags, addr = self.file.recvmsg(bufsize, socket.CMSG_SPACE(maxfds * fds.itemsize))
+                break
+            except WantRead:
+                continue
+        for level, kind, cmsg_data in ancdata:
+            if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                fds.frombytes(cmsg_data[:len(cmsg_data) - (len(cmsg_data) % fds.itemsize)])
+        return msg, list(fds), flags, addr
+
+    @wraps(socket.socket.recvfrom)
+    async def recvfrom(self, nbytes: int):
+        await wait_readable(self.file)
+        return self.file.recvfrom(nbytes)
+
+    @wraps(socket.socket.recvfrom_into)
+    async def recvfrom_into(self, buffer, nbytes: int = 0):
+        await wait_readable(self.file)
+        return self.file.recvfrom_into(buffer, nbytes)
+
     @wraps(socket.socket.accept)
     async def accept(self):
-        await wait_readable(self.file)
-        sock, addr = self.accept()
-        return AsyncSocket(sock), addr
+        while True:
+            await wait_readable(self.file)
+            try:
+                sock, addr = self.file.accept()
+                break
+            except WantRead:  # Somebody else got to it first
+                continue
+        sock.setblocking(False)
+        return await wrap_socket(sock), addr
 
     @wraps(socket.socket.connect)
     async def connect(self, hostpair):
@@ -254,16 +623,193 @@ class AsyncSocket(BaseSocket):
     def fileno(self):
         return self.file.fileno()
 
+    def _nonblocking(self) -> bool:
+        gettimeout = getattr(self.file, "gettimeout", None)
+        return gettimeout is not None and gettimeout() == 0.0
+
+    async def _start_flusher(self):
+        loop = await get_loop()
+        self._flusher = loop.create_task(self._flush_buffer())
+
+    async def send_buffered(self, data):
+        """Queue data to be sent by the socket's single background writer, sending what we can right away if the
+        socket is non-blocking. Data is sent in order with `send` and `sendall`. Only waits (see `drain`) once more
+        than the high watermark is buffered, so producers can't outrun a slow peer."""
+        if self._write_error is not None:
+            raise self._write_error
+        if not self._write_buffer and not self._sending and self._nonblocking():
+            try:
+                nsent = self.file.send(data)
+            except WantWrite + WantRead:
+                nsent = 0
+            if nsent == len(data):
+                return
+            data = memoryview(data)[nsent:]
+        self._write_buffer.extend(data)
+        if self._flusher is None and not self._sending:
+            await self._start_flusher()
+        if len(self._write_buffer) > self.write_high:
+            await self.drain()
+
+    async def _flush_buffer(self):
+        buffer = self._write_buffer
+        try:
+            while buffer:
+                await wait_writable(self.file)
+                try:
+                    nsent = self.file.send(buffer)
+                except WantWrite + WantRead:
+                    continue
+                del buffer[:nsent]
+                if len(buffer) <= self.write_low:
+                    self._wake_drainers()
+        except CancelledError:
+            raise
+        except Exception as err:  # Producers find out on their next write/drain
+            self._write_error = err
+            buffer.clear()
+        finally:
+            self._flusher = None
+            self._wake_drainers()
+
+    def _wake_drainers(self):
+        waiters, self._drain_waiters = self._drain_waiters, []
+        for fut in waiters:
+            if not fut.complete and fut._error is None:
+                fut.set_result(None)
+
+    async def drain(self):
+        """Wait until the write buffer is at or below the low watermark"""
+        while (self._flusher is not None or self._sending) and len(self._write_buffer) > self.write_low:
+            fut = Future()
+            self._drain_waiters.append(fut)
+            await fut
+        if self._write_error is not None:
+            raise self._write_error
+
+    async def flush(self):
+        """Wait until everything buffered has been sent"""
+        while self._flusher is not None:
+            await self._flusher.wait()
+        if self._write_error is not None:
+            raise self._write_error
+
     @wraps(socket.socket.close)
     async def close(self):
+        """Close the socket, sending anything still buffered by `send_buffered` first"""
+        if self._flusher is not None:
+            try:
+                await self.flush()
+            except OSError:
+                pass
+        if self._session_cache is not None:
+            cache, key = self._session_cache
+            self._session_cache = None
+            cache.release(key, self.file)
         await unwrap_socket(self.file)
-        await threadworker(self.file.close)
+        if getattr(self.file, "_readiness", None) is not None:
+            self.file.close()  # In-memory, must stay on the loop's thread
+        elif self._nonblocking():
+            self.file.close()  # Closing a non-blocking socket doesn't block, skip the pool hop
+        else:
+            await threadworker(self.file.close)
+
+
+if hasattr(os, "pread"):
+    def _pread(file, nbytes, offset):
+        return os.pread(file.fileno(), nbytes, offset)
+
+
+    def _pwrite(file, data, offset):
+        return os.pwrite(file.fileno(), data, offset)
+
+else:
+    _seek_lock = threading.Lock()
+
+
+    def _pread(file, nbytes, offset):
+        with _seek_lock:
+            position = file.tell()
+            try:
+                file.seek(offset)
+                return file.read(nbytes)
+            finally:
+                file.seek(position)
+
+
+    def _pwrite(file, data, offset):
+        with _seek_lock:
+            position = file.tell()
+            try:
+                file.seek(offset)
+                return file.write(data)
+            finally:
+                file.seek(position)
+
+
+def _run_batch(batch, loop):
+    """Run a batch of file operations in a pool thread, setting each future as we go"""
+    for func, args, fut in batch:
+        try:
+            fut.set_result(func(*args))
+        except Exception as err:
+            fut.set_exception(err)
+    loop.wakeup()
 
 
 class AsyncFile(BaseSocket):
-    """A wrapped file object with all methods run in a threadpool"""
-    def __init__(self, file, mode='r', *args, **kwargs):
+    """A wrapped file object with all methods run in a threadpool.
+    Pass `mmap=True` to get a read-only `MappedFile` or `buffered=True` to get a `BufferedFile` instead
+    (any other arguments are passed along)"""
+    def __new__(cls, file, mode='r', *args, mmap=False, buffered=False, **kwargs):
+        if mmap:
+            return MappedFile(file, mode, *args, **kwargs)
+        if buffered:
+            return BufferedFile(file, mode, *args, **kwargs)
+        return super().__new__(cls)
+
+    def __init__(self, file, mode='r', *args, max_batch=32, batch_threshold=1 << 16, mmap=False, buffered=False,
+                 **kwargs):
         self.file = open(file, mode=mode, *args, **kwargs)
+        self.max_batch = max_batch
+        self.batch_threshold = batch_threshold
+        self.dispatches = 0
+        self._batch = []
+        self._loop = None
+
+    @coroutine
+    def _batched(self, nbytes, func, *args):
+        """Queue an operation to be run in the pool. Everything queued before the loop gets around to the
+        dispatching task is sent to the pool together, `max_batch` operations per pool job. Operations over
+        `batch_threshold` bytes get a pool job of their own so large reads and writes still run in parallel."""
+        fut = Future()
+        if self._loop is None:
+            self._loop = yield from get_loop()
+        if nbytes > self.batch_threshold:
+            self.dispatches += 1
+            get_pool(0, self._loop).apply_async(_run_batch, ([(func, args, fut)], self._loop))
+            return (yield from fut)
+        self._batch.append((func, args, fut))
+        if len(self._batch) == 1:
+            self._loop.create_task(self._dispatch())
+        return (yield from fut)
+
+    async def _dispatch(self):
+        batch, self._batch = self._batch, []
+        pool = get_pool(0, self._loop)
+        for start in range(0, len(batch), self.max_batch):
+            self.dispatches += 1
+            pool.apply_async(_run_batch, (batch[start:start + self.max_batch], self._loop))
+
+    async def pread(self, offset: int, nbytes: int) -> bytes:
+        """Read `nbytes` bytes starting at `offset` without touching the file position.
+        Concurrent reads don't wait on each other and small ones are batched into a single pool job."""
+        return await self._batched(nbytes, _pread, self.file, nbytes, offset)
+
+    async def pwrite(self, offset: int, data: bytes) -> int:
+        """Write `data` at `offset` without touching the file position, returns the number of bytes written.
+        Bypasses the file object's buffer, don't mix with unflushed `write` calls."""
+        return await self._batched(len(data), _pwrite, self.file, data, offset)
 
     @coroutine
     @wraps(io.BytesIO.read)
@@ -273,12 +819,12 @@ class AsyncFile(BaseSocket):
     @coroutine
     @wraps(io.BytesIO.readline)
     def readline(self, *args, **kwargs):
-        return threadworker(self.file.readlines, *args, **kwargs)
+        return threadworker(self.file.readline, *args, **kwargs)
 
     @coroutine
     @wraps(io.BytesIO.write)
     def write(self, *args, **kwargs):
-        return threadworker(self.file.writelines, *args, **kwargs)
+        return threadworker(self.file.write, *args, **kwargs)
 
     @coroutine
     @wraps(io.BytesIO.writelines)
@@ -305,3 +851,272 @@ class AsyncFile(BaseSocket):
 
 
 aopen = AsyncFile
+
+
+def _page_in(fd, start, end, chunk=1 << 20):
+    """Read a range of a file into a scratch buffer so its pages are cached. Runs in a pool thread,
+    unlike faulting in a mapping this doesn't hold the GIL while it waits on the disk"""
+    if hasattr(os, "preadv"):
+        scratch = bytearray(min(chunk, end - start))
+        while start < end:
+            read = os.preadv(fd, [memoryview(scratch)[:end - start]], start)
+            if not read:
+                break
+            start += read
+    else:
+        while start < end:
+            read = len(os.pread(fd, min(chunk, end - start), start))
+            if not read:
+                break
+            start += read
+
+
+class MappedFile(BaseFile):
+    def __init__(self, file, mode='rb', advice=None, fault_threshold=1 << 20):
+        """A read-only memory mapped file. Reads return memoryview slices of the mapping, nothing is copied.
+        Reads of at least `fault_threshold` bytes that haven't been touched yet are paged in from a pool
+        thread first so a cold multi-megabyte slice doesn't stall the loop. `advice` is passed to `advise`."""
+        if mode not in ('r', 'rb'):
+            raise ValueError("Mapped files are read only, mode must be 'rb'")
+        self.file = open(file, 'rb')
+        self.fault_threshold = fault_threshold
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.position = 0
+        self._resident = set()  # Indexes of fault_threshold sized chunks we've paged in
+        if self.size:
+            self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self._map)
+        else:  # Empty files can't be mapped
+            self._map = None
+            self.view = memoryview(b'')
+        if advice is not None:
+            self.advise(advice)
+
+    def __len__(self):
+        return self.size
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def advise(self, option: int, start: int = 0, length: int = None):
+        """Pass an `mmap.MADV_*` hint (i.e. MADV_SEQUENTIAL, MADV_RANDOM, MADV_WILLNEED) for a range of the file.
+        Does nothing where madvise isn't available."""
+        if self._map is not None and hasattr(self._map, "madvise"):
+            if length is None:
+                length = self.size - start
+            aligned = start - start % mmap.PAGESIZE  # madvise wants page aligned ranges
+            self._map.madvise(option, aligned, length + start - aligned)
+
+    async def prefetch(self, start: int = 0, length: int = None):
+        """Page in a range of the file from a pool thread"""
+        end = self.size if length is None else min(self.size, start + length)
+        chunk = self.fault_threshold
+        first, last = start // chunk, (end - 1) // chunk
+        missing = [index for index in range(first, last + 1) if index not in self._resident]
+        if not missing or end <= start:
+            return
+        if hasattr(mmap, "MADV_WILLNEED"):
+            self.advise(mmap.MADV_WILLNEED, start, end - start)
+        await threadworker(_page_in, self.file.fileno(), max(start, missing[0] * chunk),
+                           min(end, (missing[-1] + 1) * chunk))
+        self._resident.update(missing)
+
+    async def pread(self, offset: int, nbytes: int) -> memoryview:
+        """Get `nbytes` bytes at `offset` as a memoryview of the mapping"""
+        end = min(self.size, offset + nbytes)
+        if end - offset >= self.fault_threshold:
+            await self.prefetch(offset, end - offset)
+        return self.view[offset:end]
+
+    async def read(self, nbytes: int = -1) -> memoryview:
+        """Read from the current position, like a normal file but returning memoryviews"""
+        if nbytes is None or nbytes < 0:
+            nbytes = self.size - self.position
+        data = await self.pread(self.position, nbytes)
+        self.position += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+    async def close(self):
+        """Close the mapping. If slices are still referenced the mapping stays alive until they're collected."""
+        self.view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+        self.file.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
+
+
+def _pool_future(loop, func, *args) -> Future:
+    """Start a function in the loop's thread pool without waiting on it, returns a future for the result"""
+    fut = Future()
+    done, failed = _settle(loop, fut)
+    get_pool(0, loop).apply_async(func, args, callback=done, error_callback=failed)
+    return fut
+
+
+def _write_all(file, data):
+    view = memoryview(data)
+    while view:
+        view = view[file.write(view):]
+
+
+class BufferedFile(BaseFile):
+    def __init__(self, file, mode='rb', chunk_size=1 << 16, readahead=2, max_buffer=None):
+        """A binary file that reads ahead and writes behind. Up to `readahead` chunks of `chunk_size` bytes are
+        read in pool threads while the caller works through the current one. Writes are gathered in memory
+        and written by a background pool job once a chunk is full. Writers wait if more than `max_buffer`
+        bytes (default 4 chunks) are waiting to be written. `flush` and `fsync` wait for everything written.
+        Don't mix reads and writes on the same file."""
+        if 'b' not in mode:
+            raise ValueError("Buffered files are binary, use a 'b' mode")
+        self.file = open(file, mode, buffering=0)  # We do our own buffering
+        self.chunk_size = chunk_size
+        self.readahead = max(1, readahead)
+        self.max_buffer = max_buffer or 4 * chunk_size
+        self._loop = None
+        self._offset = self.file.tell()  # Where the next chunk will be read from
+        self._chunks = deque()  # Futures for chunks being read ahead, in file order
+        self._buffer = b''
+        self._bufpos = 0
+        self._eof = False
+        self._wbuf = bytearray()
+        self._flushing = None  # Future for the write in flight
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def _fill(self):
+        while len(self._chunks) < self.readahead:
+            self._chunks.append(_pool_future(self._loop, _pread, self.file, self.chunk_size, self._offset))
+            self._offset += self.chunk_size
+
+    async def _next_chunk(self) -> bytes:
+        if self._loop is None:
+            self._loop = await get_loop()
+        if self._eof:
+            return b''
+        self._fill()
+        data = await self._chunks.popleft()
+        if len(data) < self.chunk_size:  # Anything read past this is empty too, let it go
+            self._eof = True
+            self._chunks.clear()
+        else:
+            self._fill()  # Keep reading ahead while the caller is busy with this one
+        return data
+
+    async def read(self, nbytes: int = -1) -> bytes:
+        """Read up to `nbytes` bytes, or until the end of the file"""
+        if nbytes is None or nbytes < 0:
+            nbytes = float("inf")
+        parts = []
+        while nbytes > 0:
+            if self._bufpos >= len(self._buffer):
+                self._buffer, self._bufpos = await self._next_chunk(), 0
+                if not self._buffer:
+                    break
+            end = min(len(self._buffer), self._bufpos + nbytes)
+            parts.append(self._buffer[self._bufpos:end])
+            nbytes -= end - self._bufpos
+            self._bufpos = end
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    async def readline(self) -> bytes:
+        """Read up to and including the next newline"""
+        parts = []
+        while True:
+            if self._bufpos >= len(self._buffer):
+                self._buffer, self._bufpos = await self._next_chunk(), 0
+                if not self._buffer:
+                    break
+            end = self._buffer.find(b'\n', self._bufpos) + 1
+            if end:
+                parts.append(self._buffer[self._bufpos:end])
+                self._bufpos = end
+                break
+            parts.append(self._buffer[self._bufpos:])
+            self._bufpos = len(self._buffer)
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
+
+    def _check_write(self):
+        if self._flushing is not None and self._flushing._error is not None:
+            fut, self._flushing = self._flushing, None
+            raise fut._error
+
+    def _start_flush(self):
+        data, self._wbuf = self._wbuf, bytearray()
+        self._flushing = _pool_future(self._loop, _write_all, self.file, data)
+
+    async def write(self, data: bytes) -> int:
+        """Buffer `data` to be written in the background, returns the number of bytes buffered"""
+        if self._loop is None:
+            self._loop = await get_loop()
+        self._check_write()
+        self._wbuf += data
+        while len(self._wbuf) >= self.chunk_size:
+            if self._flushing is None or self._flushing.complete:
+                self._start_flush()
+            elif len(self._wbuf) >= self.max_buffer:
+                await self._flushing  # Too far behind, wait on the disk
+            else:
+                break
+        return len(data)
+
+    async def flush(self):
+        """Wait until everything written so far has been handed to the OS"""
+        if self._flushing is not None:
+            await self._flushing
+        if self._wbuf:
+            if self._loop is None:
+                self._loop = await get_loop()
+            self._start_flush()
+            await self._flushing
+        self._flushing = None
+
+    async def fsync(self):
+        """Flush, then wait for the OS to put the data on disk"""
+        await self.flush()
+        await threadworker(os.fsync, self.file.fileno())
+
+    async def close(self):
+        try:
+            await self.flush()
+        finally:
+            self._chunks.clear()
+            await threadworker(self.file.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
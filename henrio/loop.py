@@ -1,8 +1,9 @@
 import time
 import typing
+from math import exp
 from collections import deque
 from concurrent.futures import CancelledError
-from heapq import heappop, heappush
+from heapq import heappop, heappush, heapify
 from inspect import iscoroutine, isawaitable
 from traceback import print_exc
 
@@ -11,6 +12,30 @@ from .futures import Task, Future
 
 __all__ = ["BaseLoop"]
 
+_DELAY_WEIGHT = 0.1  # Weight of each new sample in the loop's moving average of queueing delay
+_DELAY_DECAY = 0.5  # Seconds for the average to fall by a factor of e while no task waits
+
+
+class _Deadline:
+    """A deadline on a future something else (i.e. the selector) is waiting on, kept in the loop's timers"""
+    __slots__ = ("future", "cleanup")
+    cancelled = False
+
+    def __init__(self, future: Future, cleanup: typing.Callable[[], typing.Any] = None):
+        self.future = future
+        self.cleanup = cleanup
+
+    __lt__ = lambda *_: False
+
+    @property
+    def complete(self):
+        return self.future.complete or self.future._error is not None
+
+    def expire(self):
+        self.future.set_exception(TimeoutError("Deadline passed before the operation completed"))
+        if self.cleanup is not None:
+            self.cleanup()
+
 
 class BaseLoop(AbstractLoop):
     def __init__(self):
@@ -23,11 +48,23 @@ class BaseLoop(AbstractLoop):
         self.running = 0
         self.threadpool = None
         self.processpool = None
+        self.resolver = None
+        self._timer_limit = 1024
+        self.session_cache = None
+        self.track_delays = False
+        self._queue_delay = 0.0
+        self._delay_at = 0.0  # Loop time of the last queueing delay sample
 
     def time(self):
         """Get the current loop time, relative and monotonic. Speed up the loop by increasing increments"""
         return time.monotonic()
 
+    def wakeup(self):
+        """Wake the loop if it's blocked waiting on IO, i.e. when a worker finishes. Safe to call from any thread."""
+
+    def _enable_wakeup(self):
+        """Get ready for `wakeup` calls, the base loop doesn't block on IO so there's nothing to do"""
+
     def sleep(self, amount: float):
         """Sleep for when there is nothing to do to avoid spinning"""
         return time.sleep(amount)
@@ -75,17 +112,27 @@ class BaseLoop(AbstractLoop):
         """Check timers, IO, and run the queue once"""
         self._queue.extend(self._tasks)
         self._tasks.clear()
+        track = self.track_delays
         while self._timers:  # Check for overdue timers
-            if self._timers[0][0].cancelled or self._timers[0][0].complete:
-                task, _ = heappop(self._timers)  # Get the smallest timer
-            elif self._timers[0][1] < self.time():
-                task, _ = heappop(self._timers)  # Get the smallest timer
-                self._tasks.append(task)
+            if self._timers[0][1].cancelled or self._timers[0][1].complete:
+                _, task = heappop(self._timers)  # Get the smallest timer
+            elif self._timers[0][0] < self.time():
+                when, task = heappop(self._timers)  # Get the smallest timer
+                if isinstance(task, _Deadline):
+                    task.expire()
+                else:
+                    if track:
+                        task._ready_at = when
+                    self._tasks.append(task)
             else:
                 break
+        if len(self._timers) > self._timer_limit:
+            self._compact_timers()
 
+        now = self.time() if track else None
         for future, task in self._futures.copy():
-            if future.complete or future.cancelled:
+            if future.complete or future.cancelled or future._error is not None:
+                task._ready_at = now
                 self._tasks.append(task)
                 self._futures.remove((future, task))
 
@@ -94,6 +141,8 @@ class BaseLoop(AbstractLoop):
         while self._queue:
             task = self._queue.popleft()  # Get next task (FIFO)
             if not task.cancelled and not task.complete:  # If the task isn't done, run it
+                if track:
+                    self._started(task)
                 try:
                     if task._throw_later:
                         task._data = task.throw(task._throw_later)
@@ -110,6 +159,8 @@ class BaseLoop(AbstractLoop):
                 else:  # If everything went alright, check if we're supposed to sleep. Sleep is in the form of
                     # A generator yielding us a tuple of `("sleep", time_in_seconds)`
                     self._dispatch(task)
+                    if track:
+                        task._ready_at = self.time()  # If it went back in the queue, it's been ready since now
             else:
                 if task.cancelled:
                     task.close()
@@ -119,7 +170,7 @@ class BaseLoop(AbstractLoop):
             command, *args = task._data  # Always ('command', *args) in the form of tuples
             if command == 'sleep':
                 heappush(self._timers,
-                         (task, self.time() + task._data[1]))  # Add our time to our list of timers
+                         (self.time() + task._data[1], task))  # Add our time to our list of timers, soonest first
             else:
                 if command == "loop":  # If we want the loop, give it to em
                     task._data = self
@@ -141,11 +192,41 @@ class BaseLoop(AbstractLoop):
         else:
             raise RuntimeError("Invalid yield!")
 
+    def _started(self, task: Task):
+        """Record how long a task waited between becoming ready and running"""
+        ready_at = getattr(task, "_ready_at", None)  # Plain futures can be queued too
+        if ready_at is not None:
+            delay = max(0.0, self.time() - ready_at)
+            task._ready_at = None
+            if isinstance(task, Task):
+                task.queue_delay = delay
+                task.total_queue_delay += delay
+            self._queue_delay = self.queue_delay + (delay - self.queue_delay) * _DELAY_WEIGHT
+            self._delay_at = self.time()
+
+    @property
+    def queue_delay(self) -> float:
+        """Moving average of how long tasks wait to run once they're ready, when `track_delays` is on.
+        It decays with the time since the last sample, so it falls back to zero while the loop is idle."""
+        if not self._queue_delay:
+            return 0.0
+        return self._queue_delay * exp(-max(0.0, self.time() - self._delay_at) / _DELAY_DECAY)
+
+    def _add_deadline(self, future: Future, deadline: float, cleanup: typing.Callable[[], typing.Any] = None):
+        """Fail the future with a TimeoutError if it isn't done by `deadline` (loop time), then call `cleanup`"""
+        heappush(self._timers, (deadline, _Deadline(future, cleanup)))
+
+    def _compact_timers(self):
+        """Drop finished timers (i.e. deadlines on I/O that completed in time) instead of waiting for them to expire"""
+        self._timers = [timer for timer in self._timers if not (timer[1].cancelled or timer[1].complete)]
+        heapify(self._timers)
+        self._timer_limit = max(1024, 2 * len(self._timers))
+
     def _poll(self):
         """Poll IO once, base loop doesn't handle IO, thus nothing happens"""
-        if not self._tasks and self._timers:  # We can sleep as long as we want if theres nothing to do
-            if not self._timers[0][0].cancelled and self._timers[0][0].complete:
-                self.sleep(max(0.0, self._timers[0][1] - self.time()))  # Don't loop if we don't need to
+        if not (self._tasks or self._queue or self._futures) and self._timers:  # We can sleep if theres nothing to do
+            if not self._timers[0][1].cancelled and not self._timers[0][1].complete:
+                self.sleep(max(0.0, self._timers[0][0] - self.time()))  # Don't loop if we don't need to
                 # Make selector select with timeout instead of sleeping
 
     def create_task(self, task: typing.Union[typing.Generator, typing.Awaitable]) -> Task:
@@ -155,6 +236,8 @@ class BaseLoop(AbstractLoop):
         if not isinstance(task, Future):
             task = Task(task, None)
         if task not in self._queue:
+            if self.track_delays:
+                task._ready_at = self.time()
             self._queue.append(task)
         return task
 
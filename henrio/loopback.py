@@ -0,0 +1,147 @@
+import errno
+import itertools
+import socket
+import typing
+from collections import deque
+
+from .yields import get_loop, wrap_socket
+
+__all__ = ["LoopbackSocket", "loopback_pair"]
+
+_names = itertools.count(1)
+
+
+class LoopbackSocket:
+    def __init__(self, loop, buffer_size: int = 1 << 16, latency: float = 0.0, bandwidth: float = None):
+        """One end of an in-memory duplex connection, standing in for a non-blocking `socket.socket`.
+        Nothing touches the kernel, the loop polls it for readiness alongside its real files.
+        `buffer_size` is how many unread bytes this end will hold before the peer's sends would block.
+        `latency` (seconds) and `bandwidth` (bytes per second) apply to the data this end sends,
+        so the same timings are reproduced on every run. Make pairs with `henrio.loopback_pair`."""
+        self.loop = loop
+        self.buffer_size = buffer_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.name = "loopback-{0}".format(next(_names))
+        self.peer = None
+        self._readiness = (deque(), deque())  # Read and write waiters, like a selector key's data
+        self._incoming = deque()  # (arrival time, bytes)
+        self._buffered = 0
+        self._eof_at = None  # When the peer's shutdown reaches us
+        self._free_at = 0.0  # When the link is done transmitting what we've sent
+        self._shut_wr = False
+        self._closed = False
+
+    def __repr__(self):
+        return "<{0} name={1} buffered={2}>".format(self.__class__.__name__, self.name, self._buffered)
+
+    def fileno(self) -> int:
+        """There's no descriptor behind it, -1 once closed and -2 before so `fileno() != -1` checks still work"""
+        return -1 if self._closed else -2
+
+    def getsockname(self) -> str:
+        return self.name
+
+    def getpeername(self) -> str:
+        if self.peer is None:
+            raise OSError(errno.ENOTCONN, "Loopback socket isn't connected")
+        return self.peer.name
+
+    def setblocking(self, flag: bool):
+        if flag:
+            raise ValueError("Loopback sockets are always non-blocking")
+
+    def gettimeout(self) -> float:
+        return 0.0
+
+    def _ready_at(self, now: float, read: bool, write: bool) -> typing.Optional[float]:
+        """When this end becomes readable (or writable), `now` if it already is, None if only the peer can change it"""
+        if write and (self._shut_wr or self.peer._closed or self.peer._buffered < self.peer.buffer_size):
+            return now
+        if read:
+            if self._incoming:
+                return max(now, self._incoming[0][0])
+            if self._eof_at is not None:
+                return max(now, self._eof_at)
+        return None
+
+    def _arrival(self, size: int) -> float:
+        """Work out when `size` more bytes sent now reach the peer"""
+        now = self.loop.time()
+        if self.bandwidth:
+            self._free_at = max(now, self._free_at) + size / self.bandwidth
+            now = self._free_at
+        return now + self.latency
+
+    def send(self, data, flags: int = 0) -> int:
+        if self._closed:
+            raise OSError(errno.EBADF, "Bad file descriptor")
+        peer = self.peer
+        if self._shut_wr or peer._closed:
+            raise BrokenPipeError(errno.EPIPE, "Broken pipe")
+        space = peer.buffer_size - peer._buffered
+        if space <= 0:
+            raise BlockingIOError(errno.EAGAIN, "Resource temporarily unavailable")
+        chunk = bytes(memoryview(data).cast("B")[:space])
+        if chunk:
+            peer._incoming.append((self._arrival(len(chunk)), chunk))
+            peer._buffered += len(chunk)
+        return len(chunk)
+
+    def recv(self, nbytes: int, flags: int = 0) -> bytes:
+        if self._closed:
+            raise OSError(errno.EBADF, "Bad file descriptor")
+        now = self.loop.time()
+        incoming = self._incoming
+        if not incoming or incoming[0][0] > now:
+            if not incoming and self._eof_at is not None and self._eof_at <= now:
+                return b""
+            raise BlockingIOError(errno.EAGAIN, "Resource temporarily unavailable")
+        parts = []
+        size = 0
+        while incoming and size < nbytes and incoming[0][0] <= now:
+            arrival, chunk = incoming[0]
+            if len(chunk) > nbytes - size:
+                parts.append(chunk[:nbytes - size])
+                incoming[0] = (arrival, chunk[nbytes - size:])
+                size = nbytes
+                break
+            incoming.popleft()
+            parts.append(chunk)
+            size += len(chunk)
+        self._buffered -= size
+        return b"".join(parts) if len(parts) != 1 else parts[0]
+
+    def recv_into(self, buffer, nbytes: int = 0, flags: int = 0) -> int:
+        data = self.recv(nbytes or len(buffer))
+        memoryview(buffer).cast("B")[:len(data)] = data
+        return len(data)
+
+    def shutdown(self, how: int):
+        """Shutting down the write side delivers EOF to the peer once everything sent before it has arrived"""
+        if self._closed:
+            raise OSError(errno.EBADF, "Bad file descriptor")
+        if how in (socket.SHUT_WR, socket.SHUT_RDWR) and not self._shut_wr:
+            self._shut_wr = True
+            self.peer._eof_at = self._arrival(0)
+
+    def close(self):
+        if self._closed:
+            return
+        if not self._shut_wr and self.peer is not None:
+            self.shutdown(socket.SHUT_WR)
+        self._closed = True
+        self._incoming.clear()
+        self._buffered = 0
+
+
+async def loopback_pair(buffer_size: int = 1 << 16, latency: float = 0.0,
+                        bandwidth: float = None) -> typing.Tuple["AsyncSocket", "AsyncSocket"]:
+    """Create a connected pair of in-memory `henrio.LoopbackSocket` ends wrapped like any other socket, to
+    benchmark or test code without the kernel in the way. Both directions get the same `buffer_size`,
+    `latency` and `bandwidth`, set them on either end's `.file` to simulate an asymmetric or slow peer."""
+    loop = await get_loop()
+    left = LoopbackSocket(loop, buffer_size, latency, bandwidth)
+    right = LoopbackSocket(loop, buffer_size, latency, bandwidth)
+    left.peer, right.peer = right, left
+    return await wrap_socket(left), await wrap_socket(right)
@@ -0,0 +1,252 @@
+import select
+import typing
+from collections import defaultdict, deque
+from concurrent.futures import CancelledError
+
+from .futures import Future
+from .io import AsyncSocket, open_connection
+from .yields import get_loop, sleep
+
+__all__ = ["ConnectionPool"]
+
+# Connector arguments that change what kind of connection comes back, so they're part of the key
+_SHAPING = ("alpn_protocols", "memory_bio", "source_addr", "session_cache")
+
+
+class ConnectionPool:
+    def __init__(self, max_idle: int = 10, idle_timeout: float = 60.0, max_per_key: int = None,
+                 connector: typing.Callable[..., typing.Awaitable[AsyncSocket]] = open_connection):
+        """A pool of open connections, keyed by (host, port, ssl, server_hostname) and the connector arguments
+        that shape the connection (`alpn_protocols`, `memory_bio`, `source_addr`, `session_cache`).
+        Up to `max_idle` connections are kept per key and closed after sitting idle for `idle_timeout` seconds.
+        Pass `max_per_key` to limit how many connections to one key can be checked out at once,
+        other callers will wait for a connection to be released."""
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.max_per_key = max_per_key
+        self.connector = connector
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.closed = False
+        self._idle = defaultdict(deque)  # key -> deque of (sock, released_at), most recently used on the right
+        self._busy = defaultdict(int)  # key -> checked out (or connecting) count
+        self._waiters = defaultdict(deque)  # key -> deque of futures waiting on a free slot
+        self._keys = dict()  # sock -> key, for connections that are checked out
+        self._reaper = None
+        self._loop = None
+
+    def __repr__(self):
+        return "<{0} idle={1} busy={2} hit_rate={3:.2f}>".format(self.__class__.__name__, self.idle, self.busy,
+                                                                self.hit_rate)
+
+    @property
+    def idle(self) -> int:
+        """Number of idle connections being held"""
+        return sum(len(queue) for queue in self._idle.values())
+
+    @property
+    def busy(self) -> int:
+        """Number of connections that are checked out"""
+        return sum(self._busy.values())
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of checkouts that reused a pooled connection"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        """Get a snapshot of the pool's counters"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "idle": self.idle,
+            "busy": self.busy,
+        }
+
+    @staticmethod
+    def _key(hostpair, ssl, server_hostname, kwargs):
+        host, port = hostpair
+        shape = []
+        for name in _SHAPING:
+            value = kwargs.get(name)
+            shape.append(tuple(value) if isinstance(value, list) else value)  # i.e. ALPN protocol lists
+        return (host, port, ssl, server_hostname) + tuple(shape)
+
+    @staticmethod
+    def _alive(sock: AsyncSocket) -> bool:
+        """An idle connection should have nothing to read, if it does the peer hung up or sent us garbage"""
+        try:
+            fd = sock.file.fileno()
+            if fd == -1:
+                return False
+            if hasattr(select, "poll"):  # Unlike select(), not limited to descriptors below FD_SETSIZE
+                poller = select.poll()
+                poller.register(fd, select.POLLIN | select.POLLPRI)
+                return not poller.poll(0)  # Hangups and errors are always reported
+            return not select.select([fd], [], [], 0)[0]
+        except (OSError, ValueError):
+            return False
+
+    async def acquire(self, hostpair: tuple, *, ssl=False, server_hostname=None, **kwargs) -> AsyncSocket:
+        """Check out a connection to `hostpair`, reusing an idle one if possible.
+        Extra keyword arguments are passed to the connector when a new connection has to be made."""
+        if self.closed:
+            raise RuntimeError("Pool is closed!")
+        if self._loop is None:
+            self._loop = await get_loop()
+        key = self._key(hostpair, ssl, server_hostname, kwargs)
+        if self.max_per_key is not None and self._busy[key] >= self.max_per_key:
+            sock = await self._wait(key)
+            if sock is not None:
+                return sock
+        else:
+            self._busy[key] += 1
+
+        try:
+            idle = self._idle[key]
+            while idle:
+                sock, _ = idle.pop()
+                if self._alive(sock):
+                    self.hits += 1
+                    self._keys[sock] = key
+                    return sock
+                await self._close(sock)
+
+            self.misses += 1
+            sock = await self.connector(hostpair, ssl=ssl, server_hostname=server_hostname, **kwargs)
+        except BaseException:
+            self._free_slot(key)
+            raise
+        self._keys[sock] = key
+        return sock
+
+    async def _wait(self, key):
+        """Wait for a slot for the key. Returns a released connection or None if we are free to make our own"""
+        fut = Future()
+        self._waiters[key].append(fut)
+        start = self._loop.time()
+        self.waits += 1
+        try:
+            sock = await fut
+        except CancelledError:
+            if fut in self._waiters[key]:
+                self._waiters[key].remove(fut)
+            elif fut.complete:  # We were handed something on our way out, pass it on
+                if fut._result is not None:
+                    self._keys[fut._result] = key
+                    self._put_back(fut._result)
+                else:
+                    self._free_slot(key)
+            raise
+        finally:
+            self.wait_time += self._loop.time() - start
+        if sock is not None:
+            self.hits += 1
+            self._keys[sock] = key
+        return sock
+
+    def _free_slot(self, key):
+        """Give a checkout slot to the next waiter, or give it back to the key"""
+        waiters = self._waiters[key]
+        while waiters:
+            fut = waiters.popleft()
+            if not fut.complete and fut._error is None:
+                fut.set_result(None)
+                return
+        self._busy[key] -= 1
+
+    async def release(self, sock: AsyncSocket, discard: bool = False):
+        """Return a connection to the pool. Pass `discard` if it shouldn't be reused (i.e. the protocol broke)"""
+        self._put_back(sock, discard)
+
+    def _put_back(self, sock, discard=False):
+        key = self._keys.pop(sock)
+        if not discard and not self.closed and self._alive(sock):
+            waiters = self._waiters[key]
+            while waiters:  # Hand it straight to somebody waiting on the key
+                fut = waiters.popleft()
+                if not fut.complete and fut._error is None:
+                    fut.set_result(sock)
+                    return
+            self._busy[key] -= 1
+            if len(self._idle[key]) < self.max_idle:
+                self._idle[key].append((sock, self._loop.time()))
+                if self._reaper is None:
+                    self._reaper = self._loop.create_task(self._reap())
+                return
+        else:
+            self._free_slot(key)
+        self._loop.create_task(self._close(sock))
+
+    async def _reap(self):
+        """Close connections that have been idle for too long, sleeping until the next one is due"""
+        try:
+            while not self.closed:
+                now = self._loop.time()
+                soonest = None
+                for key, idle in list(self._idle.items()):
+                    while idle and now - idle[0][1] >= self.idle_timeout:  # Oldest are on the left
+                        sock, _ = idle.popleft()
+                        await self._close(sock)
+                    if idle:
+                        expires = idle[0][1] + self.idle_timeout
+                        soonest = expires if soonest is None else min(soonest, expires)
+                    else:
+                        del self._idle[key]
+                if soonest is None:
+                    break
+                await sleep(max(0.0, soonest - now))
+        finally:
+            self._reaper = None
+
+    @staticmethod
+    async def _close(sock):
+        """Close through the socket's own close, which sends anything still buffered first"""
+        if sock.file.fileno() != -1:
+            await sock.close()
+
+    def connection(self, hostpair: tuple, **kwargs):
+        """Use a pooled connection with `async with`, it will be released (or discarded on error) afterwards"""
+        return _PooledConnection(self, hostpair, kwargs)
+
+    async def close(self):
+        """Close all idle connections and stop pooling. Checked out connections are closed on release."""
+        self.closed = True
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for idle in list(self._idle.values()):
+            while idle:
+                sock, _ = idle.popleft()
+                await self._close(sock)
+        self._idle.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
+
+
+class _PooledConnection:
+    def __init__(self, pool, hostpair, kwargs):
+        self.pool = pool
+        self.hostpair = hostpair
+        self.kwargs = kwargs
+        self.sock = None
+
+    async def __aenter__(self):
+        self.sock = await self.pool.acquire(self.hostpair, **self.kwargs)
+        return self.sock
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.pool.release(self.sock, discard=exc_val is not None)
+        if exc_val:
+            raise exc_val
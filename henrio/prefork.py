@@ -0,0 +1,153 @@
+import os
+import signal
+import socket
+import time
+import typing
+from traceback import print_exc
+
+from .selector import SelectorLoop
+from .server import start_server
+from .yields import get_loop, sleep, wait_readable
+
+__all__ = ["PreforkServer", "run_prefork"]
+
+_STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+class PreforkServer:
+    def __init__(self, handler: typing.Callable[..., typing.Awaitable], host: str, port: int,
+                 workers: int = None, *,
+                 affinity: bool = False,
+                 grace: float = 10.0,
+                 restart_delay: float = 1.0,
+                 loop_factory: typing.Callable[[], typing.Any] = SelectorLoop,
+                 **server_kwargs):
+        """Forks `workers` processes (default: one per CPU), each running its own loop and its own SO_REUSEPORT
+        listener on (host, port) so the kernel balances connections between them. Crashed workers are restarted,
+        SIGTERM/SIGINT stop every worker gracefully. Pass `affinity` to pin each worker to a CPU.
+        Extra keyword arguments are passed to `henrio.start_server` in each worker."""
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Prefork servers need os.fork!")
+        if not port:
+            raise ValueError("Workers must share a fixed port!")
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.affinity = affinity
+        self.grace = grace
+        self.restart_delay = restart_delay
+        self.loop_factory = loop_factory
+        self.server_kwargs = server_kwargs
+        self.pids = dict()  # pid -> worker index
+        self.restarts = 0
+        self.stopping = False
+
+    def __repr__(self):
+        return "<{0} address={1} workers={2} running={3}>".format(self.__class__.__name__, (self.host, self.port),
+                                                                 self.workers, len(self.pids))
+
+    def run(self):
+        """Start the workers and supervise them until told to stop. Blocks the calling process."""
+        mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGCHLD, *_STOP_SIGNALS})
+        try:
+            for index in range(self.workers):
+                self._spawn(index, mask)
+            self._supervise(mask)
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+    def stop(self):
+        """Ask every worker to finish up, called when the supervisor receives SIGTERM or SIGINT"""
+        self.stopping = True
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self, mask):
+        started = {index: time.monotonic() for index in self.pids.values()}
+        deadline = None
+        signals = {signal.SIGCHLD, *_STOP_SIGNALS}
+        while self.pids:
+            if deadline is None:
+                info = signal.sigwaitinfo(signals)
+            else:
+                info = signal.sigtimedwait(signals, max(0.0, deadline - time.monotonic()))
+            if info is not None and info.si_signo in _STOP_SIGNALS and not self.stopping:
+                self.stop()
+                deadline = time.monotonic() + self.grace
+            elif info is None and deadline is not None:  # Out of patience
+                for pid in self.pids:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = None
+
+            for pid, status in self._reap():
+                index = self.pids.pop(pid)
+                if self.stopping:
+                    continue
+                # Don't spin forking a worker that dies immediately
+                if time.monotonic() - started[index] < self.restart_delay:
+                    time.sleep(self.restart_delay)
+                self.restarts += 1
+                started[index] = time.monotonic()
+                self._spawn(index, mask)
+
+    @staticmethod
+    def _reap():
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            yield pid, status
+
+    def _spawn(self, index, mask):
+        pid = os.fork()
+        if pid:
+            self.pids[pid] = index
+            return pid
+
+        code = 0
+        try:
+            # Stop signals get written to a socket the worker's loop can wait on
+            reader, writer = socket.socketpair()
+            reader.setblocking(False)
+            writer.setblocking(False)
+            signal.set_wakeup_fd(writer.fileno())
+            for signum in _STOP_SIGNALS:
+                signal.signal(signum, lambda *_: None)
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+            if self.affinity and hasattr(os, "sched_setaffinity"):
+                cpus = sorted(os.sched_getaffinity(0))
+                os.sched_setaffinity(0, {cpus[index % len(cpus)]})
+            self.loop_factory().run_until_complete(self._serve(reader))
+        except BaseException:
+            print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    async def _serve(self, wakeup):
+        """Worker main, serve until a stop signal arrives on the wakeup socket then drain the handlers"""
+        server = await start_server(self.handler, self.host, self.port, reuse_port=True, **self.server_kwargs)
+        await wait_readable(wakeup)
+        await server.close()
+
+        loop = await get_loop()
+        deadline = loop.time() + self.grace
+        while server.active and loop.time() < deadline:
+            await sleep(0.05)
+
+
+def run_prefork(handler: typing.Callable[..., typing.Awaitable], host: str, port: int, workers: int = None,
+                **kwargs):
+    """Run a `henrio.PreforkServer` with the given arguments until it is stopped"""
+    PreforkServer(handler, host, port, workers, **kwargs).run()
@@ -0,0 +1,116 @@
+import os
+import socket
+import typing
+
+from .bases import BaseSocket
+from .futures import Future
+from .io import AsyncSocket
+from .yields import get_loop, wait_readable, wait_writable
+
+__all__ = ["relay"]
+
+_SPLICE_FLAGS = getattr(os, "SPLICE_F_MOVE", 0) | getattr(os, "SPLICE_F_NONBLOCK", 0)
+_buffers = []  # Free copy buffers, shared by every relay
+
+
+def _can_splice(sock) -> bool:
+    """Only plain sockets can be spliced, a TLS socket has to be decrypted in userspace"""
+    return hasattr(os, "splice") and isinstance(sock, AsyncSocket) and type(sock.file) is socket.socket
+
+
+def _shutdown(sock):
+    """Pass the EOF on, the other direction may still be sending"""
+    try:
+        sock.file.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+async def _splice(src: BaseSocket, dst: BaseSocket, chunk_size: int) -> int:
+    """Move data from src to dst through a pipe with os.splice, it never leaves the kernel"""
+    total = 0
+    read_fd, write_fd = os.pipe()
+    try:
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
+        src_fd, dst_fd = src.file.fileno(), dst.file.fileno()
+        while True:
+            await wait_readable(src.file)
+            try:
+                pending = os.splice(src_fd, write_fd, chunk_size, flags=_SPLICE_FLAGS)
+            except (BlockingIOError, InterruptedError):
+                continue
+            if not pending:
+                break
+            while pending:
+                try:
+                    nsent = os.splice(read_fd, dst_fd, pending, flags=_SPLICE_FLAGS)
+                except (BlockingIOError, InterruptedError):
+                    await wait_writable(dst.file)
+                    continue
+                pending -= nsent
+                total += nsent
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+    _shutdown(dst)
+    return total
+
+
+async def _copy(src: BaseSocket, dst: BaseSocket, chunk_size: int) -> int:
+    """Copy data from src to dst through a pooled buffer"""
+    total = 0
+    buffer = _buffers.pop() if _buffers else bytearray(chunk_size)
+    if len(buffer) < chunk_size:
+        buffer = bytearray(chunk_size)
+    view = memoryview(buffer)[:chunk_size]
+    try:
+        while True:
+            nbytes = await src.recv_into(view)
+            if not nbytes:
+                break
+            await dst.sendall(view[:nbytes])
+            total += nbytes
+    finally:
+        view.release()
+        if len(_buffers) < 64:
+            _buffers.append(buffer)
+    _shutdown(dst)
+    return total
+
+
+async def relay(a: BaseSocket, b: BaseSocket, *, chunk_size: int = 1 << 16,
+                splice: bool = None) -> typing.Tuple[int, int]:
+    """Move data both ways between two connected sockets until both sides have sent EOF.
+    An EOF from one side is passed on as a half-close (shutdown for writing) to the other.
+    Plain sockets are spliced through a pipe with `os.splice` so the data never enters Python, otherwise
+    (i.e. TLS, or `splice=False`) it's copied through pooled buffers. Neither socket is closed.
+    Returns (bytes from a to b, bytes from b to a). If either direction fails, or relay is cancelled, both stop."""
+    if splice is None:
+        splice = _can_splice(a) and _can_splice(b)
+    move = _splice if splice else _copy
+    loop = await get_loop()
+    stop = Future()  # Set once both directions finish, or with the first one's error
+    remaining = [2]
+
+    async def direction(src, dst):
+        try:
+            total = await move(src, dst, chunk_size)
+        except BaseException as err:
+            if not stop.complete and stop._error is None:
+                stop.set_exception(err)
+            raise
+        remaining[0] -= 1
+        if not remaining[0]:
+            stop.set_result(None)
+        return total
+
+    forward = loop.create_task(direction(a, b))
+    back = loop.create_task(direction(b, a))
+    try:
+        await stop
+    finally:
+        for task in (forward, back):  # Whichever is still running, also when relay itself is cancelled
+            if not task.complete:
+                task.cancel()
+    return forward.result(), back.result()
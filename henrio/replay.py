@@ -0,0 +1,298 @@
+import errno
+import struct
+import time
+import typing
+from collections import deque, namedtuple
+
+from .io import AsyncSocket
+from .yields import get_loop, sleep
+
+__all__ = ["TraceEvent", "Trace", "Recorder", "ReplaySocket", "replay"]
+
+OPEN, RECV, SEND, CLOSE = range(4)
+_MAGIC = b"HRTRACE1"
+_EVENT = struct.Struct("!BIdI")  # Kind, connection, seconds since the recording started, size
+
+TraceEvent = namedtuple("TraceEvent", "kind conn time size data")
+TraceEvent.__doc__ = """One recorded event. `data` is the received chunk for RECV (empty at EOF), the peer's address
+for OPEN and empty for SEND and CLOSE, which only keep their `size`."""
+
+
+class Trace:
+    def __init__(self, events: typing.List[TraceEvent] = None):
+        """A recorded sequence of connections and the chunks read from them, in the order they were read"""
+        self.events = events if events is not None else []
+
+    def __repr__(self):
+        return "<{0} connections={1} events={2}>".format(self.__class__.__name__, self.connections,
+                                                         len(self.events))
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def connections(self) -> int:
+        return sum(1 for event in self.events if event.kind == OPEN)
+
+    @property
+    def duration(self) -> float:
+        """Seconds between the first and last event"""
+        return self.events[-1].time - self.events[0].time if self.events else 0.0
+
+    def dumps(self) -> bytes:
+        """Pack the trace into its compact binary form, sent data isn't kept, only its size"""
+        parts = [_MAGIC]
+        for event in self.events:
+            parts.append(_EVENT.pack(event.kind, event.conn, event.time, event.size))
+            if event.kind in (OPEN, RECV):
+                parts.append(event.data)
+        return b"".join(parts)
+
+    @classmethod
+    def loads(cls, data: bytes) -> "Trace":
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("Not a henrio trace")
+        view = memoryview(data)
+        events = []
+        offset = len(_MAGIC)
+        while offset < len(data):
+            kind, conn, when, size = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            payload = b""
+            if kind in (OPEN, RECV):
+                payload = bytes(view[offset:offset + size])
+                offset += size
+            events.append(TraceEvent(kind, conn, when, size, payload))
+        return cls(events)
+
+    def dump(self, path: str):
+        with open(path, "wb") as file:
+            file.write(self.dumps())
+
+    @classmethod
+    def load(cls, path: str) -> "Trace":
+        with open(path, "rb") as file:
+            return cls.loads(file.read())
+
+
+class _RecordingFile:
+    """Stands in for a socket, passing everything through and logging what was read and sent"""
+
+    def __init__(self, recorder, conn, file):
+        self._recorder = recorder
+        self._conn = conn
+        self._file = file
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __repr__(self):
+        return "<{0} conn={1} file={2}>".format(self.__class__.__name__, self._conn, self._file)
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def recv(self, nbytes, flags=0):
+        data = self._file.recv(nbytes, flags)
+        self._recorder._log(RECV, self._conn, data)
+        return data
+
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        nread = self._file.recv_into(buffer, nbytes, flags)
+        self._recorder._log(RECV, self._conn, bytes(memoryview(buffer)[:nread]))
+        return nread
+
+    def send(self, data, flags=0):
+        nsent = self._file.send(data, flags)
+        self._recorder._log(SEND, self._conn, size=nsent)
+        return nsent
+
+    def close(self):
+        if self._file.fileno() != -1:
+            self._recorder._log(CLOSE, self._conn)
+        self._file.close()
+
+
+class Recorder:
+    def __init__(self, clock: typing.Callable[[], float] = time.monotonic):
+        """Records the traffic on the sockets it wraps into a `henrio.Trace`: every chunk read with its boundaries
+        and timing, the sizes of sends, and the order all of it happened in across connections"""
+        self.trace = Trace()
+        self.clock = clock
+        self._start = clock()
+        self._next_conn = 0
+
+    def __repr__(self):
+        return "<{0} trace={1}>".format(self.__class__.__name__, self.trace)
+
+    def _log(self, kind, conn, data=b"", size=None):
+        self.trace.events.append(TraceEvent(kind, conn, self.clock() - self._start,
+                                            len(data) if size is None else size, data))
+
+    def wrap(self, sock: AsyncSocket, addr=None) -> AsyncSocket:
+        """Get a socket that records everything read from and sent on `sock`, use it in place of `sock`"""
+        conn = self._next_conn
+        self._next_conn += 1
+        self._log(OPEN, conn, repr(addr).encode())
+        return AsyncSocket(_RecordingFile(self, conn, sock.file))
+
+    def handler(self, handler: typing.Callable[..., typing.Awaitable]) -> typing.Callable[..., typing.Awaitable]:
+        """Wrap a `henrio.start_server` style handler so every connection it serves is recorded"""
+        async def recorded(sock, addr):
+            return await handler(self.wrap(sock, addr), addr)
+
+        return recorded
+
+    def dump(self, path: str):
+        self.trace.dump(path)
+
+
+class _Chunk:
+    __slots__ = ("due", "data", "offset", "done")
+
+    def __init__(self, due, data):
+        self.due = due
+        self.data = data
+        self.offset = 0
+        self.done = False
+
+
+class ReplaySocket:
+    def __init__(self, player, addr, chunks):
+        """Feeds one recorded connection back to the application, chunk by chunk. Made by `henrio.replay`.
+        Sends are accepted and counted but go nowhere."""
+        self.addr = addr
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._player = player
+        self._chunks = chunks
+        self._readiness = (deque(), deque())  # Polled by the loop like `henrio.LoopbackSocket`
+        self._closed = False
+
+    def __repr__(self):
+        return "<{0} addr={1} left={2}>".format(self.__class__.__name__, self.addr, len(self._chunks))
+
+    def fileno(self) -> int:
+        return -1 if self._closed else -2
+
+    def getpeername(self):
+        return self.addr
+
+    def setblocking(self, flag: bool):
+        if flag:
+            raise ValueError("Replay sockets are always non-blocking")
+
+    def gettimeout(self) -> float:
+        return 0.0
+
+    def _ready_at(self, now, read, write):
+        if write:
+            return now
+        if read and self._chunks and self._player._order[0] is self._chunks[0]:
+            return max(now, self._chunks[0].due)
+        return None  # Waiting on the application to read other connections first
+
+    def recv(self, nbytes: int, flags: int = 0) -> bytes:
+        if self._closed:
+            raise OSError(errno.EBADF, "Bad file descriptor")
+        now = self._player.loop.time()
+        if self._ready_at(now, True, False) != now:
+            raise BlockingIOError(errno.EAGAIN, "Resource temporarily unavailable")
+        chunk = self._chunks[0]
+        data = chunk.data[chunk.offset:chunk.offset + nbytes]
+        chunk.offset += len(data)
+        if chunk.offset >= len(chunk.data):  # Including the empty chunk that stands for EOF
+            chunk.done = True
+            self._chunks.popleft()
+            self._player._consumed()
+        self.bytes_received += len(data)
+        return data
+
+    def recv_into(self, buffer, nbytes: int = 0, flags: int = 0) -> int:
+        data = self.recv(nbytes or len(buffer))
+        memoryview(buffer).cast("B")[:len(data)] = data
+        return len(data)
+
+    def send(self, data, flags: int = 0) -> int:
+        if self._closed:
+            raise OSError(errno.EBADF, "Bad file descriptor")
+        self.bytes_sent += len(data)
+        return len(data)
+
+    def shutdown(self, how: int):
+        pass
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for chunk in self._chunks:  # Whatever the application didn't read is skipped
+            chunk.done = True
+        self._chunks.clear()
+        self._player._consumed()
+
+
+class _Player:
+    def __init__(self, loop, trace, speed):
+        self.loop = loop
+        self.trace = trace
+        self.speed = speed
+        self.start = loop.time()
+        self.first = trace.events[0].time if trace.events else 0.0
+        self._order = deque()  # Every chunk, in the order it was read when recording
+
+    def due(self, when):
+        """The loop time a recorded event is due, right away if replaying as fast as possible"""
+        if not self.speed:
+            return 0.0
+        return self.start + (when - self.first) / self.speed
+
+    def _consumed(self):
+        """Drop finished chunks (read, or their connection closed) off the front of the readiness order"""
+        order = self._order
+        while order and order[0].done:
+            order.popleft()
+
+
+async def replay(trace: Trace, handler: typing.Callable[..., typing.Awaitable], speed: float = None) -> dict:
+    """Replay every connection in `trace` to `handler(sock, addr)`, like `henrio.start_server` would with the
+    recorded traffic. Chunks are handed out with their recorded boundaries and in their recorded order across
+    connections, as fast as the application reads them, or at the recorded pace with `speed` (1.0 is real time,
+    2.0 twice as fast). Returns stats for the run, raises the first exception a handler raised."""
+    loop = await get_loop()
+    player = _Player(loop, trace, speed)
+    sockets = {}
+    opens = []
+    for event in trace.events:
+        if event.kind == OPEN:
+            sockets[event.conn] = ReplaySocket(player, event.data.decode(), deque())
+            opens.append(event)
+        elif event.kind == RECV and event.conn in sockets:
+            chunk = _Chunk(player.due(event.time), event.data)
+            sockets[event.conn]._chunks.append(chunk)
+            player._order.append(chunk)
+
+    tasks = []
+    for event in opens:
+        delay = player.due(event.time) - loop.time()
+        if delay > 0:
+            await sleep(delay)
+        tasks.append(loop.create_task(_serve(handler, sockets[event.conn])))
+    for task in tasks:
+        await task.wait()
+    elapsed = loop.time() - player.start
+    for task in tasks:
+        task.result()
+    return {
+        "connections": len(sockets),
+        "bytes_received": sum(sock.bytes_received for sock in sockets.values()),
+        "bytes_sent": sum(sock.bytes_sent for sock in sockets.values()),
+        "elapsed": elapsed,
+    }
+
+
+async def _serve(handler, sock):
+    try:
+        await handler(AsyncSocket(sock), sock.addr)
+    finally:
+        sock.close()
@@ -0,0 +1,109 @@
+import socket
+import typing
+from collections import OrderedDict
+
+from .futures import Future
+from .workers import threadworker
+from .yields import get_loop
+
+__all__ = ["Resolver", "get_resolver", "resolve"]
+
+
+class Resolver:
+    def __init__(self, ttl: float = 60.0, maxsize: int = 1024, stale_ttl: float = 30.0,
+                 lookup: typing.Callable[..., list] = socket.getaddrinfo):
+        """A getaddrinfo cache. Results are kept for `ttl` seconds in an LRU of up to `maxsize` entries.
+        Concurrent lookups of the same name share a single pool dispatch. Expired entries are still served
+        for up to `stale_ttl` seconds while they are refreshed in the background."""
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_ttl = stale_ttl
+        self.lookup = lookup
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self._cache = OrderedDict()  # key -> (expires, result), least recently used first
+        self._inflight = dict()  # key -> Future shared by everybody waiting on the lookup
+
+    def __repr__(self):
+        return "<{0} entries={1} hits={2} misses={3}>".format(self.__class__.__name__, len(self._cache),
+                                                             self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self) -> dict:
+        """Get a snapshot of the cache counters"""
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+        }
+
+    def clear(self):
+        """Forget every cached result"""
+        self._cache.clear()
+
+    async def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0) -> list:
+        """Same as `socket.getaddrinfo`, answered from the cache when possible"""
+        key = (host, port, family, type, proto, flags)
+        loop = await get_loop()
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires, result = entry
+            now = loop.time()
+            if now < expires:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return result
+            if now < expires + self.stale_ttl:
+                self.stale_hits += 1
+                self._cache.move_to_end(key)
+                self._start(loop, key)  # Refresh in the background
+                return result
+            del self._cache[key]
+
+        if key in self._inflight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        return await self._start(loop, key)
+
+    def _start(self, loop, key) -> Future:
+        """Get the future for the running lookup of the key, starting one if needed.
+        Lookups run in their own task so a cancelled caller doesn't strand the others."""
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = self._inflight[key] = Future()
+            loop.create_task(self._lookup(loop, key, fut))
+        return fut
+
+    async def _lookup(self, loop, key, fut):
+        try:
+            result = await threadworker(self.lookup, *key)
+        except Exception as err:
+            fut.set_exception(err)
+        else:
+            self._cache[key] = (loop.time() + self.ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+            fut.set_result(result)
+        finally:
+            del self._inflight[key]
+
+
+def get_resolver(loop) -> Resolver:
+    """Get the loop's resolver cache, creating it if needed"""
+    if loop.resolver is None:
+        loop.resolver = Resolver()
+    return loop.resolver
+
+
+async def resolve(host, port, family=0, type=0, proto=0, flags=0) -> list:
+    """`getaddrinfo` through the running loop's resolver cache"""
+    loop = await get_loop()
+    return await get_resolver(loop).getaddrinfo(host, port, family, type, proto, flags)
@@ -0,0 +1,263 @@
+import builtins
+import json
+import pickle
+import struct
+import typing
+from concurrent.futures import CancelledError
+from inspect import isawaitable
+
+from .bases import BaseSocket
+from .framing import Framed, LengthPrefixed
+from .futures import Future
+from .io import open_connection
+from .server import Server, start_server
+from .yields import get_loop, sleep
+
+__all__ = ["RPCError", "JSONSerializer", "PickleSerializer", "RPCConnection", "serve_rpc", "connect_rpc"]
+
+_HEADER = struct.Struct("!BI")  # Message type, request id
+_REQUEST, _RESPONSE, _ERROR, _CANCEL = range(4)
+
+
+class RPCError(Exception):
+    """The remote call failed with an exception that couldn't be sent back as is"""
+
+
+class JSONSerializer:
+    """The default serializer, safe to use with untrusted peers. Arguments and results must be JSON types,
+    tuples come back as lists."""
+    exceptions = False  # Errors are sent as (class name, message)
+
+    @staticmethod
+    def dumps(value) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    @staticmethod
+    def loads(data) -> typing.Any:
+        return json.loads(bytes(data))
+
+
+class PickleSerializer:
+    """UNSAFE: unpickling runs arbitrary code, so a peer can do anything it likes in this process.
+    Only use it between processes that fully trust each other, on a socket nobody else can reach.
+    Any picklable value (and exception) can be sent."""
+    exceptions = True
+
+    @staticmethod
+    def dumps(value) -> bytes:
+        return pickle.dumps(value)
+
+    @staticmethod
+    def loads(data) -> typing.Any:
+        return pickle.loads(data)
+
+
+def _load_error(value) -> BaseException:
+    """Rebuild an error sent by the peer, only builtin exception types are recreated"""
+    if isinstance(value, BaseException):
+        return value
+    if isinstance(value, list) and len(value) == 2 and all(isinstance(item, str) for item in value):
+        name, message = value
+        kind = getattr(builtins, name, None)
+        if isinstance(kind, type) and issubclass(kind, Exception):
+            return kind(message)
+        return RPCError("{0}: {1}".format(name, message))
+    return RPCError(value)
+
+
+class RPCConnection:
+    def __init__(self, sock: BaseSocket, handlers: typing.Union[dict, object] = None, serializer=None,
+                 max_frame_size: int = 1 << 26):
+        """Many concurrent calls multiplexed by request id over one connection, in both directions.
+        `handlers` maps method names to (async) functions the peer may call, a dict or an object whose attributes
+        are looked up. `serializer` is anything with `dumps` (to bytes) and `loads`, `henrio.JSONSerializer` by
+        default. `henrio.PickleSerializer` is unsafe with anyone you don't trust, see its docs.
+        Calls made in the same tick are sent together in one write. Cancelling a call cancels it on the peer."""
+        self.socket = sock
+        self.handlers = handlers if handlers is not None else {}
+        self.serializer = serializer if serializer is not None else JSONSerializer()
+        self.framed = Framed(sock, LengthPrefixed(max_frame_size=max_frame_size))
+        self.calls = 0
+        self.served = 0
+        self.batches = 0
+        self.closed = False
+        self._next_id = 0
+        self._pending = dict()  # request id -> Future of our calls
+        self._running = dict()  # request id -> Task of the peer's calls
+        self._flusher = None
+        self._reader = None
+        self._loop = None
+
+    def __repr__(self):
+        return "<{0} pending={1} running={2}>".format(self.__class__.__name__, len(self._pending),
+                                                     len(self._running))
+
+    def stats(self) -> dict:
+        """Get a snapshot of the connection's counters"""
+        return {
+            "calls": self.calls,
+            "served": self.served,
+            "batches": self.batches,
+            "pending": len(self._pending),
+            "running": len(self._running),
+        }
+
+    async def start(self):
+        """Start reading messages from the peer"""
+        if self._reader is None:
+            self._loop = await get_loop()
+            self._reader = self._loop.create_task(self._read())
+        return self
+
+    def _send(self, kind, request_id, payload=b""):
+        """Queue a message, it will be sent with everything else queued this tick"""
+        self.framed.write(_HEADER.pack(kind, request_id) + payload)
+        if self._flusher is None:
+            self._flusher = self._loop.create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            await sleep(0)  # Let everybody else queue their messages first
+            while self.framed._outgoing:
+                self.batches += 1
+                await self.framed.flush()
+        except OSError as err:
+            self._fail(err)
+        finally:
+            self._flusher = None
+
+    async def call(self, method: str, *args, **kwargs):
+        """Call a method on the peer and wait for its result. Exceptions raised remotely are raised here."""
+        if self.closed:
+            raise ConnectionResetError("RPC connection is closed")
+        if self._reader is None:
+            await self.start()
+        request_id = self._next_id = (self._next_id + 1) & 0xffffffff
+        fut = self._pending[request_id] = Future()
+        self._send(_REQUEST, request_id, self.serializer.dumps((method, args, kwargs)))
+        self.calls += 1
+        try:
+            return await fut
+        except CancelledError:
+            if self._pending.pop(request_id, None) is not None and not self.closed:
+                self._send(_CANCEL, request_id)
+            raise
+
+    async def _read(self):
+        error = None
+        try:
+            async for frame in self.framed:
+                kind, request_id = _HEADER.unpack_from(frame)
+                payload = frame[_HEADER.size:]
+                if kind == _REQUEST:
+                    self._running[request_id] = self._loop.create_task(self._serve(request_id, payload))
+                elif kind == _CANCEL:
+                    task = self._running.pop(request_id, None)
+                    if task is not None:
+                        task.cancel()
+                else:
+                    fut = self._pending.pop(request_id, None)
+                    if fut is None or fut.complete or fut._error is not None:
+                        continue  # Cancelled on our side
+                    try:
+                        value = self.serializer.loads(payload)
+                    except Exception as err:
+                        fut.set_exception(RPCError("Couldn't load the reply: {0!r}".format(err)))
+                        continue
+                    if kind == _RESPONSE:
+                        fut.set_result(value)
+                    else:
+                        fut.set_exception(_load_error(value))
+        except CancelledError:
+            raise
+        except Exception as err:
+            error = err
+        self._fail(error or ConnectionResetError("RPC connection closed by the peer"))
+
+    def _find(self, method):
+        if isinstance(self.handlers, dict):
+            return self.handlers[method]
+        if method.startswith("_"):
+            raise AttributeError("Private methods can't be called remotely")
+        return getattr(self.handlers, method)
+
+    async def _serve(self, request_id, payload):
+        try:
+            method, args, kwargs = self.serializer.loads(payload)
+            result = self._find(method)(*args, **kwargs)
+            if isawaitable(result):
+                result = await result
+            payload = self.serializer.dumps(result)
+        except CancelledError:
+            return  # The caller gave up, there's nobody to answer
+        except Exception as err:
+            self._running.pop(request_id, None)
+            try:
+                if not getattr(self.serializer, "exceptions", False):
+                    raise TypeError
+                payload = self.serializer.dumps(err)
+            except Exception:
+                payload = self.serializer.dumps([err.__class__.__name__, str(err)])
+            self._reply(_ERROR, request_id, payload)
+        else:
+            self._running.pop(request_id, None)
+            self.served += 1
+            self._reply(_RESPONSE, request_id, payload)
+
+    def _reply(self, kind, request_id, payload):
+        if not self.closed:
+            self._send(kind, request_id, payload)
+
+    def _fail(self, error):
+        """Fail every call we're waiting on and stop serving the peer's"""
+        self.closed = True
+        pending, self._pending = self._pending, dict()
+        for fut in pending.values():
+            if not fut.complete and fut._error is None:
+                fut.set_exception(error)
+        running, self._running = self._running, dict()
+        for task in running.values():
+            task.cancel()
+
+    async def wait_closed(self):
+        """Wait until the peer closes the connection"""
+        if self._reader is not None:
+            await self._reader.wait()
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._flusher is not None:
+            self._flusher.cancel()
+        self._fail(ConnectionResetError("RPC connection is closed"))
+        await self.socket.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
+
+
+async def serve_rpc(handlers: typing.Union[dict, object], host: str = "127.0.0.1", port: int = 0, *,
+                    serializer=None, **kwargs) -> Server:
+    """Serve `handlers` to every connecting `henrio.RPCConnection`, only on the local machine unless another `host`
+    is given. Extra keyword arguments are passed to `henrio.start_server`."""
+    async def serve(sock, addr):
+        conn = await RPCConnection(sock, handlers, serializer).start()
+        try:
+            await conn.wait_closed()
+        finally:
+            conn._fail(ConnectionResetError("RPC connection is closed"))
+
+    return await start_server(serve, host, port, **kwargs)
+
+
+async def connect_rpc(hostpair: tuple, handlers: typing.Union[dict, object] = None, *, serializer=None,
+                      **kwargs) -> RPCConnection:
+    """Connect to an RPC server, extra keyword arguments are passed to `henrio.open_connection`.
+    `handlers` are served to the server, calls work both ways."""
+    sock = await open_connection(hostpair, **kwargs)
+    return await RPCConnection(sock, handlers, serializer).start()
@@ -1,12 +1,75 @@
+import errno
 import selectors
 import socket
 from collections import deque
+from functools import partial
 
 from . import BaseLoop
+from .bases import IOBase
+from .futures import Future
 from .io import AsyncSocket
 
 __all__ = ["SelectorLoop"]
 
+_EVENTS = (selectors.EVENT_READ, selectors.EVENT_WRITE)
+
+
+class _AnyEntry:
+    """One file's registration in a `_AnyWaiter`, queued like any other waiter"""
+    __slots__ = ("group", "key", "file", "index")
+
+    def __init__(self, group, key, file, index):
+        self.group = group
+        self.key = key
+        self.file = file
+        self.index = index
+
+    @property
+    def complete(self):
+        return self.group.closed
+
+    @property
+    def _error(self):
+        return self.group.future._error
+
+    def set_result(self, _):
+        self.group.ready[self.key] = self.group.ready.get(self.key, 0) | _EVENTS[self.index]
+        if not self.group.future.complete:
+            self.group.future.set_result(self.group.ready)
+
+    def set_exception(self, exc):
+        if not self.group.future.complete and self.group.future._error is None:
+            self.group.future.set_exception(exc)
+
+    def cancel(self):
+        return self.group.future.cancel()
+
+
+class _AnyWaiter:
+    def __init__(self, loop):
+        """A single Future waiting on many files at once. Every file ready by the time the task resumes is
+        reported, closing drops all the other registrations at once."""
+        self.loop = loop
+        self.future = Future()
+        self.ready = dict()  # What the caller passed -> selector events
+        self.closed = False
+        self._entries = []
+
+    def add(self, key, file, index):
+        entry = _AnyEntry(self, key, file, index)
+        self._entries.append(entry)
+        self.loop._add_waiter(file, index, entry)
+
+    def close(self):
+        """Flag every registration dead, then take them out of their queues. Each is usually the only waiter
+        on its file so that's a constant amount of work per file."""
+        if self.closed:
+            return
+        self.closed = True
+        for entry in self._entries:
+            self.loop._remove_waiter(entry.file, entry.index, entry)
+        self._entries.clear()
+
 
 class SelectorLoop(BaseLoop):
     """An event loop using the the OS's builtin Selector."""
@@ -14,25 +77,55 @@ class SelectorLoop(BaseLoop):
     def __init__(self, selector=None):
         super().__init__()
         self.selector = selector if selector else selectors.DefaultSelector()
+        self._memory_files = set()  # In-memory files (i.e. `henrio.LoopbackSocket`) with waiters
+        self._wakeup_pair = None  # (reader, writer) socket pair that `wakeup` writes to, made on first use
+
+    def _enable_wakeup(self):
+        """Register the socket pair `wakeup` writes to, so futures settled by worker threads wake the selector"""
+        if self._wakeup_pair is None:
+            reader, writer = socket.socketpair()
+            reader.setblocking(False)
+            writer.setblocking(False)
+            self._wakeup_pair = reader, writer
+            self.selector.register(reader, selectors.EVENT_READ, data=None)  # No waiters, see `_poll`
+
+    def wakeup(self):
+        """Wake the selector if it's blocked, safe to call from any thread"""
+        pair = self._wakeup_pair
+        if pair is not None:
+            try:
+                pair[1].send(b"\0")
+            except OSError:  # Full, so the loop is going to wake anyway
+                pass
+
+    def _drain_wakeup(self):
+        reader = self._wakeup_pair[0]
+        try:
+            while reader.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
 
     def _poll(self):
         """Poll IO using the selector"""
         map = self.selector.get_map()  # Pray it doesn't block
-        l = []
-        for key in map.values():
-            if key.fileobj.fileno() == -1:
-                l.append(key)
+        l = [key for key in map.values() if key.data is not None and key.fileobj.fileno() == -1]
 
         for item in l:
             self.selector.unregister(item.fileobj)
+            for queue in item.data:
+                while queue:
+                    fut = queue.popleft()
+                    if not fut.complete and fut._error is None:
+                        fut.set_exception(OSError(errno.EBADF, "File was closed while waiting on it"))
 
-        if map:
+        if map or self._memory_files:
             # We can block as long as we want if theres no tasks to process till we're done
-            # We want our currently ready files
+            # We want our currently ready files. Workers finishing wake us through the wakeup socket
             if not (self._tasks or self._queue):
                 if self._timers:
-                    if not self._timers[0][0].cancelled and not self._timers[0][0].complete:
-                        wait = max(0.0, self._timers[0][1] - self.time())
+                    if not self._timers[0][1].cancelled and not self._timers[0][1].complete:
+                        wait = max(0.0, self._timers[0][0] - self.time())
                     else:
                         wait = 0.0
                 else:
@@ -40,32 +133,103 @@ class SelectorLoop(BaseLoop):
             else:
                 wait = 0
 
-            files = self.selector.select(wait)
-            for file, events in files:
-                if events & selectors.EVENT_READ == selectors.EVENT_READ:
-                    queue = map[file.fileobj].data[0]
-                    if queue:
-                        queue.popleft().set_result(None)
-                if events & selectors.EVENT_WRITE == selectors.EVENT_WRITE:
-                    queue = map[file.fileobj].data[1]
-                    if queue:
-                        queue.popleft().set_result(None)
+            if self._memory_files and wait != 0:
+                ready = self._memory_ready_at()
+                if ready is not None:
+                    ready = max(0.0, ready - self.time())
+                    wait = ready if wait is None else min(wait, ready)
+
+            if map:
+                files = self.selector.select(wait)
+                for file, events in files:
+                    if file.data is None:
+                        self._drain_wakeup()
+                        continue
+                    if events & selectors.EVENT_READ == selectors.EVENT_READ:
+                        self._wake(file.data[0])
+                    if events & selectors.EVENT_WRITE == selectors.EVENT_WRITE:
+                        self._wake(file.data[1])
+                    self._update_interest(file.fileobj)
+            elif wait:
+                self.sleep(wait)
+            if self._memory_files:
+                self._poll_memory()
 
         else:
-            if not self._tasks and self._timers:  # We can sleep as long as we want if theres nothing to do
-                if not self._timers[0][0].cancelled and self._timers[0][0].complete:
-                    self.sleep(max(0.0, self._timers[0][1] - self.time()))  # Don't loop if we don't need to
+            super()._poll()
 
         return map
 
+    def _memory_ready_at(self):
+        """The soonest loop time an in-memory file becomes ready for somebody waiting on it"""
+        now = self.time()
+        soonest = None
+        for file in self._memory_files:
+            when = file._ready_at(now, bool(file._readiness[0]), bool(file._readiness[1]))
+            if when is not None and (soonest is None or when < soonest):
+                soonest = when
+        return soonest
+
+    def _poll_memory(self):
+        """Wake waiters on in-memory files the same way as the selector does for real ones, level triggered"""
+        now = self.time()
+        for file in list(self._memory_files):
+            readers, writers = file._readiness
+            if file._closed:
+                for queue in file._readiness:
+                    while queue:
+                        fut = queue.popleft()
+                        if not fut.complete and fut._error is None:
+                            fut.set_exception(OSError(errno.EBADF, "File was closed while waiting on it"))
+            else:
+                if readers and file._ready_at(now, True, False) == now:
+                    self._wake(readers)
+                if writers and file._ready_at(now, False, True) == now:
+                    self._wake(writers)
+            if not (readers or writers):
+                self._memory_files.discard(file)
+
+    @staticmethod
+    def _wake(queue):
+        """Wake the first waiter in the queue that is still waiting"""
+        while queue:
+            fut = queue.popleft()
+            if not fut.complete and fut._error is None:
+                fut.set_result(None)
+                break
+
+    def _update_interest(self, fileobj):
+        """Only select on the events somebody is waiting on, unregister the file if nobody is waiting.
+        Otherwise an always-writable socket would wake the selector on every poll."""
+        try:
+            key = self.selector.get_key(fileobj)
+        except (KeyError, ValueError):
+            return
+        events = 0
+        for event, queue in zip(_EVENTS, key.data):
+            if queue:
+                events |= event
+        if not events:
+            self.selector.unregister(fileobj)
+        elif events != key.events:
+            self.selector.modify(fileobj, events, key.data)
+
     def wrap_socket(self, socket: socket.socket) -> AsyncSocket:
-        """Wrap a file in an async socket API."""
+        """Wrap a file in an async socket API. The file is registered with the selector lazily, when waited on."""
         wrapped = AsyncSocket(socket)
+        if getattr(socket, "_readiness", None) is not None:
+            return wrapped  # In-memory, nothing to register
+        try:
+            self.selector.get_key(socket)
+        except KeyError:
+            pass
+        else:
+            return wrapped  # Already being waited on, it must be valid
+
         key = None
         try:
             key = self.selector.register(socket, selectors.EVENT_READ | selectors.EVENT_WRITE,
-                                   data=(deque(), deque()))  # Get our R/W
-            self.selector.select(0)
+                                         data=(deque(), deque()))  # Check that we can select on it
         except ValueError as err:
             raise ValueError("File/socket must have a valid fileno() method") from err
         except OSError as err:
@@ -78,7 +242,18 @@ class SelectorLoop(BaseLoop):
     wrap_file = wrap_socket
 
     def unwrap_socket(self, file) -> None:
-        key = self.selector.get_key(file)
+        if getattr(file, "_readiness", None) is not None:
+            self._memory_files.discard(file)
+            for queue in file._readiness:
+                for fut in queue:
+                    fut.cancel()
+                queue.clear()
+            return
+        try:
+            key = self.selector.get_key(file)
+        except KeyError:
+            return  # Nobody is waiting on it
+
         for fut in key.data[0]:
             fut.cancel()
 
@@ -89,8 +264,67 @@ class SelectorLoop(BaseLoop):
 
     unwrap_file = unwrap_socket
 
-    def _wait_read(self, file, fut):
-        self.selector.get_key(file.fileno()).data[0].append(fut)
+    def _add_waiter(self, file, index, fut, deadline=None, timeout=None):
+        """Queue a future to be woken when the file is ready for the event at `index` (0 for read, 1 for write).
+        With a `deadline` (loop time) or `timeout` the future fails with a TimeoutError if it isn't woken in time."""
+        if timeout is not None:
+            deadline = self.time() + timeout
+        queues = getattr(file, "_readiness", None)  # In-memory files keep their own waiters, polled in `_poll`
+        if queues is not None:
+            self._memory_files.add(file)
+            queues[index].append(fut)
+        else:
+            try:
+                key = self.selector.get_key(file)
+            except KeyError:
+                key = self.selector.register(file, _EVENTS[index], data=(deque(), deque()))
+            else:
+                if not key.events & _EVENTS[index]:
+                    key = self.selector.modify(file, key.events | _EVENTS[index], key.data)
+            key.data[index].append(fut)
+        if deadline is not None:
+            self._add_deadline(fut, deadline, partial(self._remove_waiter, file, index, fut))
+
+    def _remove_waiter(self, file, index, fut):
+        """Stop waiting on the file for a future that expired"""
+        queues = getattr(file, "_readiness", None)
+        if queues is not None:
+            try:
+                queues[index].remove(fut)
+            except ValueError:
+                pass
+            return
+        try:
+            key = self.selector.get_key(file)
+        except (KeyError, ValueError):
+            return
+        try:
+            key.data[index].remove(fut)
+        except ValueError:
+            return
+        self._update_interest(file)
+
+    def _wait_any(self, files, read=True, write=False, deadline=None, timeout=None) -> _AnyWaiter:
+        """Register one shared waiter on the events of every file, see `henrio.wait_any`"""
+        if timeout is not None:
+            deadline = self.time() + timeout
+        group = _AnyWaiter(self)
+        try:
+            for key in files:
+                file = key.file if isinstance(key, IOBase) else key
+                if read:
+                    group.add(key, file, 0)
+                if write:
+                    group.add(key, file, 1)
+        except BaseException:
+            group.close()
+            raise
+        if deadline is not None:
+            self._add_deadline(group.future, deadline, group.close)
+        return group
+
+    def _wait_read(self, file, fut, deadline=None, timeout=None):
+        self._add_waiter(file, 0, fut, deadline, timeout)
 
-    def _wait_write(self, file, fut):
-        self.selector.get_key(file.fileno()).data[1].append(fut)
+    def _wait_write(self, file, fut, deadline=None, timeout=None):
+        self._add_waiter(file, 1, fut, deadline, timeout)
@@ -0,0 +1,278 @@
+import errno
+import os
+import socket
+import stat
+import typing
+from concurrent.futures import CancelledError
+
+from .futures import Future
+from .io import WantRead, threaded_bind
+from .yields import get_loop, wait_readable, unwrap_socket, spawn, sleep
+
+__all__ = ["Server", "start_server", "start_unix_server"]
+
+# Errors from accept() that mean we lost a single connection (or are out of descriptors), not the listener
+_accept_errors = {getattr(errno, name) for name in ("ECONNABORTED", "EPROTO", "EPERM", "EMFILE", "ENFILE",
+                                                   "ENOBUFS", "ENOMEM") if hasattr(errno, name)}
+# Of those, the ones where the connection stays queued and the listener readable until something is freed
+_exhausted_errors = {getattr(errno, name) for name in ("EMFILE", "ENFILE", "ENOBUFS", "ENOMEM")
+                     if hasattr(errno, name)}
+_EXHAUSTED_BACKOFF = 0.1  # Seconds to stop accepting for when we're out of descriptors or memory
+
+
+class Server:
+    def __init__(self, handler: typing.Callable[..., typing.Awaitable], sock: socket.socket, max_accepts: int = 100,
+                 max_handlers: int = None, max_queue_delay: float = None, reject: bool = False):
+        """A listening socket that spawns a `handler(sock, addr)` task for every connection it accepts.
+        Every time the listener becomes readable the accept queue is drained, up to `max_accepts` connections.
+        The server is overloaded while `max_handlers` connections are being handled, or while the loop's run queue
+        delay (see `BaseLoop.queue_delay`) is over `max_queue_delay` seconds. Then it stops accepting and leaves
+        new connections in the kernel's backlog, or with `reject` accepts and closes them right away."""
+        self.handler = handler
+        self.socket = sock
+        self.max_accepts = max_accepts
+        self.max_handlers = max_handlers
+        self.max_queue_delay = max_queue_delay
+        self.reject = reject
+        self.accepted = 0
+        self.rejected = 0
+        self.paused = False
+        self.active = 0
+        self.last_batch = 0
+        self.started = None
+        self.closed = False
+        self.path = None  # Socket file to remove on close, for Unix domain servers
+        self._loop = None
+        self._task = None
+        self._capacity = None  # Woken when a handler finishes, while paused at max_handlers
+
+    def __repr__(self):
+        return "<{0} sockname={1} accepted={2} active={3}>".format(self.__class__.__name__,
+                                                                  self.sockname if not self.closed else None,
+                                                                  self.accepted, self.active)
+
+    @property
+    def sockname(self):
+        """The address the server is listening on"""
+        return self.socket.getsockname()
+
+    @property
+    def accept_rate(self) -> float:
+        """Average connections accepted per second since the server started serving"""
+        if self.started is None:
+            return 0.0
+        elapsed = self._loop.time() - self.started
+        return self.accepted / elapsed if elapsed > 0 else 0.0
+
+    def stats(self) -> dict:
+        """Get a snapshot of the server's counters"""
+        return {
+            "accepted": self.accepted,
+            "active": self.active,
+            "accept_rate": self.accept_rate,
+            "last_batch": self.last_batch,
+            "rejected": self.rejected,
+            "paused": self.paused,
+            "queue_delay": self._loop.queue_delay if self._loop is not None else 0.0,
+        }
+
+    def overloaded(self) -> bool:
+        """Whether new connections should be turned away right now"""
+        if self.max_handlers is not None and self.active >= self.max_handlers:
+            return True
+        return self.max_queue_delay is not None and self._loop.queue_delay > self.max_queue_delay
+
+    async def serve_forever(self):
+        """Accept connections until the server is closed"""
+        loop = self._loop = await get_loop()
+        self.started = loop.time()
+        if self.max_queue_delay is not None:
+            loop.track_delays = True
+        try:
+            while not self.closed:
+                if not self.reject and self.overloaded():
+                    self.paused = True
+                    await self._wait_capacity()
+                    continue
+                self.paused = False
+                await wait_readable(self.socket)
+                if self._accept_many(loop):
+                    self.paused = True  # Going straight back to the listener would spin until a descriptor frees up
+                    await sleep(_EXHAUSTED_BACKOFF)
+        except CancelledError:
+            if not self.closed:
+                raise
+
+    def _accept_many(self, loop) -> bool:
+        """Drain the accept queue without going back to the loop between connections.
+        Returns whether accepting stopped because we ran out of descriptors or memory."""
+        count = rejected = 0
+        exhausted = False
+        while count + rejected < self.max_accepts:
+            overloaded = self.overloaded()
+            if overloaded and not self.reject:
+                break  # Leave the rest in the backlog
+            try:
+                sock, addr = self.socket.accept()
+            except WantRead:
+                break
+            except OSError as err:
+                if err.errno in _accept_errors:
+                    exhausted = err.errno in _exhausted_errors
+                    break
+                raise
+            if overloaded:
+                sock.close()  # Fail fast, the client can retry elsewhere
+                rejected += 1
+                continue
+            sock.setblocking(False)
+            count += 1
+            self.active += 1
+            self._connection_made(loop, sock, addr)
+        self.accepted += count
+        self.rejected += rejected
+        self.last_batch = count
+        return exhausted
+
+    def _connection_made(self, loop, sock, addr):
+        """Start handling an accepted connection, `_release` must be called when it's done"""
+        loop.create_task(self._handle(loop.wrap_socket(sock), addr))
+
+    async def _handle(self, conn, addr):
+        try:
+            await self.handler(conn, addr)
+        finally:
+            self._release()
+            if conn.file.fileno() != -1:
+                await conn.close()  # Sends whatever the handler left buffered with send_buffered
+
+    def _release(self):
+        """A connection is done, let a paused server accept again"""
+        self.active -= 1
+        if self._capacity is not None and not self._capacity.complete:
+            self._capacity.set_result(None)
+
+    async def _wait_capacity(self):
+        if self.max_handlers is not None and self.active >= self.max_handlers:
+            self._capacity = Future()
+            try:
+                await self._capacity
+            finally:
+                self._capacity = None
+        else:
+            await sleep(self.max_queue_delay)  # The average decays as the loop catches up, check again later
+
+    async def close(self):
+        """Stop accepting connections and close the listening socket. Running handlers are left alone."""
+        if self.closed:
+            return
+        self.closed = True
+        await unwrap_socket(self.socket)  # Wakes serve_forever with a CancelledError
+        if self._task is not None and self.paused:
+            self._task.cancel()
+        self.socket.close()
+        if self.path is not None:
+            _unlink_socket(self.path)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
+
+
+async def start_server(handler: typing.Callable[..., typing.Awaitable], host: str = None, port: int = 0, *,
+                       backlog: int = 100,
+                       family: int = socket.AF_INET,
+                       reuse_address: bool = True,
+                       reuse_port: bool = False,
+                       max_accepts: int = None,
+                       max_handlers: int = None,
+                       max_queue_delay: float = None,
+                       reject: bool = False) -> Server:
+    """Listen on (host, port) and start accepting connections in a new task. Each connection is passed to
+    `handler(sock, addr)` as a non-blocking `henrio.AsyncSocket` in its own task. Returns the `henrio.Server`
+    Pass `reuse_port` to let several processes listen on the same port and have the kernel balance between them.
+    See `henrio.Server` for the admission control options (`max_handlers`, `max_queue_delay` and `reject`)."""
+    sock = await _listen(host, port, backlog, family, reuse_address, reuse_port)
+    server = Server(handler, sock, max_accepts if max_accepts is not None else backlog, max_handlers,
+                    max_queue_delay, reject)
+    server._task = await spawn(server.serve_forever())
+    return server
+
+
+async def _listen(host, port, backlog, family, reuse_address, reuse_port) -> socket.socket:
+    """Create a non-blocking listening socket"""
+    if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+        raise ValueError("SO_REUSEPORT isn't supported on this platform!")
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        if reuse_address:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        await threaded_bind(sock, (host or "", port))
+        sock.listen(backlog)
+        sock.setblocking(False)
+    except:
+        sock.close()
+        raise
+    return sock
+
+
+def _unlink_socket(path):
+    """Remove a Unix socket file, leaving anything that isn't a socket alone"""
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_stale_socket(path):
+    """Remove a socket file left behind by a server that's gone. Only replaced if nothing accepts a connection
+    on it, a path another server is still listening on raises EADDRINUSE instead of being taken over."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return  # Left for bind to fail on
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    probe.setblocking(False)  # A live server with a full backlog would block us
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    except BlockingIOError:
+        pass
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, "Another server is listening on {0!r}".format(path))
+
+
+async def start_unix_server(handler: typing.Callable[..., typing.Awaitable], path: typing.Union[str, bytes], *,
+                            backlog: int = 100,
+                            max_accepts: int = None,
+                            max_handlers: int = None,
+                            max_queue_delay: float = None,
+                            reject: bool = False) -> Server:
+    """Like `henrio.start_server`, but listening on a Unix domain socket at `path`. A stale socket file left at
+    `path` is replaced, one a running server is listening on raises OSError(EADDRINUSE). The file is removed
+    when the server is closed."""
+    _remove_stale_socket(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(path)  # Binding a path is a local filesystem operation, no need for a thread
+        sock.listen(backlog)
+        sock.setblocking(False)
+    except:
+        sock.close()
+        raise
+    server = Server(handler, sock, max_accepts if max_accepts is not None else backlog, max_handlers,
+                    max_queue_delay, reject)
+    server.path = path
+    server._task = await spawn(server.serve_forever())
+    return server
@@ -0,0 +1,267 @@
+import ssl
+import time
+import typing
+from collections import OrderedDict
+
+from .bases import BaseSocket
+from .futures import Future
+from .yields import wait_readable, unwrap_socket
+
+__all__ = ["TLSSocket", "SessionCache", "get_session_cache"]
+
+
+class SessionCache:
+    def __init__(self, maxsize: int = 256):
+        """A client side cache of TLS sessions keyed by (server_hostname, port, context), so the next connection
+        to the same server can resume instead of doing a full handshake. Up to `maxsize` sessions are kept.
+        TLS 1.3 tickets arrive after the handshake, so sessions are saved again when the connection is closed."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.connections = 0
+        self.resumed = 0
+        self._sessions = OrderedDict()  # key -> SSLSession, least recently used first
+
+    def __repr__(self):
+        return "<{0} entries={1} hit_rate={2:.2f}>".format(self.__class__.__name__, len(self._sessions),
+                                                          self.hit_rate)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of finished connections that resumed a session"""
+        return self.resumed / self.connections if self.connections else 0.0
+
+    def stats(self) -> dict:
+        """Get a snapshot of the cache counters"""
+        return {
+            "entries": len(self._sessions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "connections": self.connections,
+            "resumed": self.resumed,
+            "hit_rate": self.hit_rate,
+        }
+
+    def clear(self):
+        """Forget every cached session"""
+        self._sessions.clear()
+
+    def get(self, key) -> typing.Optional[ssl.SSLSession]:
+        """Get the session to resume for the key, if there is one that hasn't expired"""
+        session = self._sessions.get(key)
+        if session is not None and session.time + session.timeout <= time.time():
+            del self._sessions[key]
+            session = None
+        if session is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._sessions.move_to_end(key)
+        return session
+
+    def save(self, key, sock):
+        """Remember the session of a connected ssl socket (`ssl.SSLSocket`, `ssl.SSLObject` or TLSSocket)"""
+        try:
+            session = sock.session
+            version = sock.version()
+        except (AttributeError, ValueError, OSError):
+            return
+        if session is None or (version == "TLSv1.3" and not session.has_ticket):
+            return  # Nothing we could resume with yet
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+
+    def release(self, key, sock):
+        """Count a finished connection and save its latest session"""
+        try:
+            reused = sock.session_reused
+        except (AttributeError, ValueError, OSError):
+            return
+        self.connections += 1
+        if reused:
+            self.resumed += 1
+        self.save(key, sock)
+
+
+def get_session_cache(loop) -> SessionCache:
+    """Get the loop's TLS session cache, creating it if needed"""
+    if loop.session_cache is None:
+        loop.session_cache = SessionCache()
+    return loop.session_cache
+
+
+class TLSSocket(BaseSocket):
+    _session_cache = None  # (cache, key) to hand the session back to on close
+
+    def __init__(self, sock: BaseSocket, context: ssl.SSLContext, server_side: bool = False,
+                 server_hostname: str = None, session: ssl.SSLSession = None, read_size: int = 1 << 18,
+                 suppress_ragged_eofs: bool = False):
+        """TLS over a plain `henrio.AsyncSocket` using `ssl.MemoryBIO`, the ssl module never touches the socket.
+        Ciphertext is read `read_size` bytes at a time when the socket is readable, so one wakeup can hold
+        many TLS records, and everything decrypted so far is returned at once. Call `do_handshake` first.
+        The connection closing without the peer's close_notify raises `ssl.SSLEOFError`, it may have been
+        truncated, unless `suppress_ragged_eofs` is set to treat it as a normal EOF."""
+        self.socket = sock
+        self.file = sock.file
+        self.read_size = read_size
+        self.suppress_ragged_eofs = suppress_ragged_eofs
+        self._incoming = ssl.MemoryBIO()
+        self._outgoing = ssl.MemoryBIO()
+        self._ssl = context.wrap_bio(self._incoming, self._outgoing, server_side=server_side,
+                                     server_hostname=server_hostname, session=session)
+        self._flushing = False
+        self._flush_waiters = []
+
+    def __repr__(self):
+        return "<{0} file={1} version={2}>".format(self.__class__.__name__, self.file, self._ssl.version())
+
+    def fileno(self):
+        return self.file.fileno()
+
+    @property
+    def session(self) -> typing.Optional[ssl.SSLSession]:
+        return self._ssl.session
+
+    @property
+    def session_reused(self) -> bool:
+        return self._ssl.session_reused
+
+    def version(self):
+        return self._ssl.version()
+
+    def cipher(self):
+        return self._ssl.cipher()
+
+    def selected_alpn_protocol(self):
+        return self._ssl.selected_alpn_protocol()
+
+    def getpeercert(self, binary_form=False):
+        return self._ssl.getpeercert(binary_form)
+
+    async def _fill(self):
+        """Wait until the socket is readable and move as much ciphertext as we can into the incoming BIO"""
+        while True:
+            await wait_readable(self.file)
+            try:
+                data = self.file.recv(self.read_size)
+            except (BlockingIOError, InterruptedError):
+                continue
+            if data:
+                self._incoming.write(data)
+            else:
+                self._incoming.write_eof()
+            return
+
+    async def _flush(self):
+        """Send everything in the outgoing BIO. If somebody is already sending, they'll send ours too."""
+        if self._flushing:
+            fut = Future()
+            self._flush_waiters.append(fut)
+            await fut
+            return
+
+        self._flushing = True
+        error = None
+        try:
+            while self._outgoing.pending:
+                await self.socket.sendall(self._outgoing.read())
+        except BaseException as err:
+            error = err
+            raise
+        finally:
+            self._flushing = False
+            waiters, self._flush_waiters = self._flush_waiters, []
+            for fut in waiters:
+                if error is None:
+                    fut.set_result(None)
+                else:
+                    fut.set_exception(error)
+
+    async def do_handshake(self):
+        """Perform the TLS handshake, waiting on the socket only when OpenSSL needs more data"""
+        while True:
+            try:
+                self._ssl.do_handshake()
+                break
+            except ssl.SSLWantReadError:
+                await self._flush()
+                await self._fill()
+        await self._flush()
+
+    async def recv(self, nbytes: int) -> bytes:
+        """Receive up to `nbytes` bytes of plaintext, returns b'' once the peer has closed the connection"""
+        parts = []
+        received = 0
+        while received < nbytes:
+            try:
+                data = self._ssl.read(nbytes - received)
+            except ssl.SSLWantReadError:
+                if parts:  # Return what we've decrypted instead of waiting for more
+                    break
+                if self._outgoing.pending:
+                    await self._flush()
+                await self._fill()
+                continue
+            except ssl.SSLZeroReturnError:  # The peer's close_notify
+                break
+            except ssl.SSLEOFError:
+                if parts or self.suppress_ragged_eofs:  # Hand over what we have, the next recv raises again
+                    break
+                raise
+            if not data:
+                break
+            parts.append(data)
+            received += len(data)
+        return parts[0] if len(parts) == 1 else b''.join(parts)
+
+    async def recv_into(self, buffer, nbytes: int = 0) -> int:
+        """Receive plaintext into a buffer, returns the number of bytes written"""
+        data = await self.recv(nbytes or len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    async def send(self, data) -> int:
+        """Encrypt and send all of `data`, returns its length"""
+        await self.sendall(data)
+        return len(data)
+
+    async def sendall(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[self._ssl.write(view):]
+        await self._flush()
+
+    async def unwrap(self) -> BaseSocket:
+        """Shut down TLS (sending close_notify) and return the plain socket"""
+        try:
+            self._ssl.unwrap()
+        except (ssl.SSLWantReadError, ssl.SSLSyscallError):
+            pass  # We don't wait for the peer's close_notify
+        await self._flush()
+        return self.socket
+
+    async def close(self):
+        if self._session_cache is not None:
+            cache, key = self._session_cache
+            self._session_cache = None
+            cache.release(key, self)
+        try:
+            await self.unwrap()
+        except (OSError, ssl.SSLError):
+            pass
+        finally:
+            await unwrap_socket(self.file)
+            self.file.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        if exc_val:
+            raise exc_val
@@ -0,0 +1,325 @@
+import socket
+import typing
+from concurrent.futures import CancelledError
+from inspect import iscoroutine
+from traceback import print_exc
+
+from .bases import AbstractProtocol
+from .io import WantRead, WantWrite, open_connection
+from .server import Server, _listen
+from .yields import get_loop, spawn
+
+__all__ = ["Protocol", "Transport", "create_connection", "create_server"]
+
+
+class Protocol(AbstractProtocol):
+    """Base class for protocols driven by a `henrio.Transport`. The callbacks are plain functions called straight
+    from the loop when the socket is ready. `async def` callbacks work too, but each call then costs a task."""
+
+    def connection_made(self, transport):
+        pass
+
+    def data_received(self, data):
+        pass
+
+    def eof_received(self):
+        """The peer shut down its side. Return True to keep the transport open for writing."""
+        pass
+
+    def pause_writing(self):
+        """The transport's write buffer went over the high watermark, stop writing until `resume_writing`"""
+        pass
+
+    def resume_writing(self):
+        pass
+
+    def connection_lost(self, exc):
+        pass
+
+
+class _Ready:
+    """A reusable selector waiter that calls `callback(error)` instead of waking a task"""
+    __slots__ = ("callback", "complete", "_error")
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.complete = False
+        self._error = None
+
+    def set_result(self, _):
+        self.callback(None)
+
+    def set_exception(self, exc):
+        self.callback(exc)
+
+    def cancel(self):
+        self.callback(CancelledError())
+        return True
+
+
+class Transport:
+    def __init__(self, loop, sock: socket.socket, protocol: AbstractProtocol, read_size: int = 1 << 16):
+        """Drive a protocol's callbacks from the loop's readiness events on a non-blocking socket.
+        The loop reads directly from the socket and calls `protocol.data_received`, nothing is resumed per chunk.
+        `write` sends what it can right away and buffers the rest until the socket is writable."""
+        self.loop = loop
+        self.file = sock
+        self.protocol = protocol
+        self.read_size = read_size
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._buffer = bytearray()
+        self.write_high = 1 << 16
+        self.write_low = 1 << 14
+        self._writing_paused = False
+        self._reader = _Ready(self._read_ready)
+        self._writer = _Ready(self._write_ready)
+        self._read_armed = False
+        self._write_armed = False
+        self._paused = False
+        self._eof = False
+        self._closing = False
+        self._closed = False
+        self._on_lost = None
+
+    def __repr__(self):
+        return "<{0} file={1} buffered={2}>".format(self.__class__.__name__, self.file, len(self._buffer))
+
+    def _start(self):
+        self.loop._readers[self.file] = self  # Keeps run_forever going while we're open
+        self._call("connection_made", self)
+        if not self._closing:
+            self._arm_read()
+
+    def _call(self, name, *args):
+        """Call a protocol callback, the ones `henrio.AbstractProtocol` doesn't define are optional"""
+        callback = getattr(self.protocol, name, None)
+        if callback is None:
+            return None
+        result = callback(*args)
+        if iscoroutine(result):
+            self.loop.create_task(result)
+            return None
+        return result
+
+    def _arm_read(self):
+        if not self._read_armed and not self._closed:
+            self._read_armed = True
+            self.loop._wait_read(self.file, self._reader)
+
+    def _arm_write(self):
+        if not self._write_armed and not self._closed:
+            self._write_armed = True
+            self.loop._wait_write(self.file, self._writer)
+
+    def _read_ready(self, error):
+        self._read_armed = False
+        if self._closed or self._paused or self._closing or isinstance(error, CancelledError):
+            return
+        if error is not None:
+            self._force_close(error)
+            return
+        try:
+            data = self.file.recv(self.read_size)
+        except WantRead:
+            self._arm_read()
+            return
+        except OSError as exc:
+            self._force_close(exc)
+            return
+
+        try:
+            if data:
+                self.bytes_received += len(data)
+                self._call("data_received", data)
+                if not self._paused:
+                    self._arm_read()
+            elif not self._call("eof_received"):
+                self.close()
+        except Exception as exc:
+            print_exc()
+            self._force_close(exc)
+
+    def _write_ready(self, error):
+        self._write_armed = False
+        if self._closed or isinstance(error, CancelledError):
+            return
+        if error is not None:
+            self._force_close(error)
+            return
+        try:
+            nsent = self.file.send(self._buffer)
+        except WantWrite + WantRead:
+            nsent = 0
+        except OSError as exc:
+            self._force_close(exc)
+            return
+        del self._buffer[:nsent]
+        self.bytes_sent += nsent
+        if self._writing_paused and len(self._buffer) <= self.write_low:
+            self._writing_paused = False
+            self._call("resume_writing")
+        if self._buffer:
+            self._arm_write()
+        elif self._closing:
+            self._finalize(None)
+        elif self._eof:
+            self.file.shutdown(socket.SHUT_WR)
+
+    def get_write_buffer_size(self) -> int:
+        """Number of bytes waiting to be sent"""
+        return len(self._buffer)
+
+    def set_write_buffer_limits(self, high: int = None, low: int = None):
+        """`protocol.pause_writing` is called once more than `high` bytes (64KiB) are buffered,
+        `protocol.resume_writing` once it falls to `low` (high / 4)"""
+        if high is None:
+            high = 1 << 16
+        if low is None:
+            low = high // 4
+        if not 0 <= low <= high:
+            raise ValueError("Need 0 <= low <= high, got low={0} high={1}".format(low, high))
+        self.write_high = high
+        self.write_low = low
+
+    def get_extra_info(self, name: str, default=None):
+        """Get 'socket', 'sockname' or 'peername'"""
+        try:
+            if name == "socket":
+                return self.file
+            if name == "sockname":
+                return self.file.getsockname()
+            if name == "peername":
+                return self.file.getpeername()
+        except OSError:
+            pass
+        return default
+
+    def is_closing(self) -> bool:
+        return self._closing or self._closed
+
+    def write(self, data: typing.Union[bytes, bytearray, memoryview]):
+        """Send data, buffering whatever the socket won't take right now"""
+        if self._closing or self._eof:
+            raise RuntimeError("Transport is closing!")
+        if not data:
+            return
+        if not self._buffer:
+            try:
+                nsent = self.file.send(data)
+            except WantWrite + WantRead:
+                nsent = 0
+            except OSError as exc:
+                self._force_close(exc)
+                return
+            self.bytes_sent += nsent
+            if nsent == len(data):
+                return
+            data = memoryview(data)[nsent:]
+        self._buffer.extend(data)
+        self._arm_write()
+        if not self._writing_paused and len(self._buffer) > self.write_high:
+            self._writing_paused = True
+            self._call("pause_writing")
+
+    def writelines(self, lines: typing.Iterable[bytes]):
+        self.write(b"".join(lines))
+
+    def write_eof(self):
+        """Shut down the write side once the buffer has been sent"""
+        if self._eof or self._closing:
+            return
+        self._eof = True
+        if not self._buffer:
+            self.file.shutdown(socket.SHUT_WR)
+
+    def can_write_eof(self) -> bool:
+        return True
+
+    def pause_reading(self):
+        """Stop calling `data_received` until `resume_reading` is called"""
+        self._paused = True
+
+    def resume_reading(self):
+        if self._paused:
+            self._paused = False
+            if not self._closing:
+                self._arm_read()
+
+    def close(self):
+        """Stop reading and close once everything buffered has been sent"""
+        if self._closing or self._closed:
+            return
+        self._closing = True
+        if not self._buffer:
+            self._finalize(None)
+
+    def abort(self):
+        """Close right away, dropping anything still buffered"""
+        self._force_close(None)
+
+    def _force_close(self, exc):
+        if self._closed:
+            return
+        self._buffer.clear()
+        self._closing = True
+        self._finalize(exc)
+
+    def _finalize(self, exc):
+        self._closed = True
+        self.loop._readers.pop(self.file, None)
+        self.loop.unwrap_socket(self.file)
+        self.file.close()
+        try:
+            self._call("connection_lost", exc)
+        except Exception:  # Don't let it escape into the loop's poll
+            print_exc()
+        finally:
+            if self._on_lost is not None:
+                self._on_lost()
+
+
+class _TransportServer(Server):
+    def __init__(self, protocol_factory, sock, max_accepts=100, read_size=1 << 16, **kwargs):
+        """A `henrio.Server` that gives each connection a `henrio.Transport` instead of a handler task"""
+        super().__init__(protocol_factory, sock, max_accepts, **kwargs)
+        self.read_size = read_size
+
+    def _connection_made(self, loop, sock, addr):
+        transport = Transport(loop, sock, self.handler(), self.read_size)
+        transport._on_lost = self._release
+        transport._start()
+
+
+async def create_connection(protocol_factory: typing.Callable[[], AbstractProtocol], hostpair: tuple, *,
+                            read_size: int = 1 << 16, **kwargs) -> typing.Tuple[Transport, AbstractProtocol]:
+    """Connect to `hostpair` and drive a new protocol from `protocol_factory()` with a `henrio.Transport`.
+    Extra keyword arguments are passed to `henrio.open_connection`. Returns (transport, protocol).
+    TLS works with `ssl`, but not `memory_bio`: the transport reads the socket directly and would see ciphertext."""
+    if kwargs.get("memory_bio"):
+        raise ValueError("Transports can't use memory_bio TLS, pass ssl without it")
+    sock = await open_connection(hostpair, **kwargs)
+    loop = await get_loop()
+    protocol = protocol_factory()
+    transport = Transport(loop, sock.file, protocol, read_size)
+    transport._start()
+    return transport, protocol
+
+
+async def create_server(protocol_factory: typing.Callable[[], AbstractProtocol], host: str = None, port: int = 0, *,
+                        backlog: int = 100,
+                        family: int = socket.AF_INET,
+                        reuse_address: bool = True,
+                        reuse_port: bool = False,
+                        max_accepts: int = None,
+                        read_size: int = 1 << 16,
+                        max_handlers: int = None,
+                        max_queue_delay: float = None,
+                        reject: bool = False) -> Server:
+    """Like `henrio.start_server`, but every accepted connection gets a new protocol from `protocol_factory()`
+    driven by a `henrio.Transport` instead of a handler task. Returns the `henrio.Server`"""
+    sock = await _listen(host, port, backlog, family, reuse_address, reuse_port)
+    server = _TransportServer(protocol_factory, sock, max_accepts if max_accepts is not None else backlog, read_size,
+                              max_handlers=max_handlers, max_queue_delay=max_queue_delay, reject=reject)
+    server._task = await spawn(server.serve_forever())
+    return server
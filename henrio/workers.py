@@ -24,7 +24,8 @@ def async_worker(pooltype, func, *args, **kwargs):
 
     pool = get_pool(pooltype, loop)
 
-    pool.apply_async(runner, callback=fut.set_result, error_callback=fut.set_exception)
+    done, failed = _settle(loop, fut)
+    pool.apply_async(runner, callback=done, error_callback=failed)
 
     res = yield from fut
     return res
@@ -37,14 +38,29 @@ def worker(pooltype, func, *args, **kwargs):
     fut = Future()
     loop = yield from get_loop()
     pool = get_pool(pooltype, loop)
-    pool.apply_async(func, args=args, kwds=kwargs, callback=fut.set_result, error_callback=fut.set_exception)
+    done, failed = _settle(loop, fut)
+    pool.apply_async(func, args=args, kwds=kwargs, callback=done, error_callback=failed)
     res = yield from fut
 
     return res
 
 
+def _settle(loop, fut):
+    """Pool callbacks that set the future from the pool's result thread, then wake the loop to notice it"""
+    def done(result):
+        fut.set_result(result)
+        loop.wakeup()
+
+    def failed(error):
+        fut.set_exception(error)
+        loop.wakeup()
+
+    return done, failed
+
+
 def get_pool(pooltype, loop):
     """Will get the pool from a loop given the type, quick util"""
+    loop._enable_wakeup()
     if pooltype:
         if loop.processpool:
             pool = loop.processpool
@@ -6,7 +6,8 @@ from .futures import Future
 
 __all__ = ["sleep", "get_loop", "unwrap_file", "spawn", "wrap_file", "wrap_socket", "current_task",
            "unwrap_socket", "postpone", "spawn_after", "wait_readable", "wait_writable",
-           "sleepinf", "call_after", "schedule_after", "get_time"]
+           "sleepinf", "call_after", "schedule_after", "get_time", "wait_any", "wait_any_readable",
+           "wait_any_writable"]
 
 
 @coroutine
@@ -126,21 +127,53 @@ async def call_after(func, time):
 
 
 @coroutine
-def wait_readable(socket):
-    """Wait until a socket is readable"""
+def wait_readable(socket, deadline: float = None, timeout: float = None):
+    """Wait until a socket is readable. Raises TimeoutError if it isn't by `deadline` (loop time, see `get_time`)
+    or within `timeout` seconds, the deadline is kept by the loop itself so no extra task is spawned."""
     fut = Future()
-    yield ("_wait_read", socket, fut)
+    if deadline is None and timeout is None:
+        yield ("_wait_read", socket, fut)
+    else:
+        yield ("_wait_read", socket, fut, deadline, timeout)
     return (yield from fut)
 
 
 @coroutine
-def wait_writable(socket):
-    """Wait until a socket is writable"""
+def wait_writable(socket, deadline: float = None, timeout: float = None):
+    """Wait until a socket is writable. Raises TimeoutError if it isn't by `deadline` or within `timeout` seconds"""
     fut = Future()
-    yield ("_wait_write", socket, fut)
+    if deadline is None and timeout is None:
+        yield ("_wait_write", socket, fut)
+    else:
+        yield ("_wait_write", socket, fut, deadline, timeout)
     return (yield from fut)
 
 
+@coroutine
+def wait_any(files: typing.Iterable, read: bool = True, write: bool = False, deadline: float = None,
+             timeout: float = None) -> dict:
+    """Wait until any of the files (or sockets) is readable, or writable with `write`, without a task per file.
+    Returns a dict of every file ready by the time we resume to its `selectors.EVENT_READ | EVENT_WRITE` flags.
+    Raises TimeoutError if none are by `deadline` or within `timeout` seconds."""
+    group = yield ("_wait_any", files, read, write, deadline, timeout)
+    try:
+        return (yield from group.future)
+    finally:
+        group.close()
+
+
+@coroutine
+def wait_any_readable(files: typing.Iterable, deadline: float = None, timeout: float = None) -> set:
+    """Wait until any of the files is readable, returns the set of readable ones"""
+    return set((yield from wait_any(files, True, False, deadline, timeout)))
+
+
+@coroutine
+def wait_any_writable(files: typing.Iterable, deadline: float = None, timeout: float = None) -> set:
+    """Wait until any of the files is writable, returns the set of writable ones"""
+    return set((yield from wait_any(files, False, True, deadline, timeout)))
+
+
 class TaskGroup:
     def __init__(self):
         """A group of tasks. Akin to curio's TaskGroup (necessary for multio)"""
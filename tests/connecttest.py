@@ -0,0 +1,59 @@
+from henrio import *
+from henrio.io import _interleave, _Staggered
+import socket
+import unittest
+
+
+def info(family, address):
+    return family, socket.SOCK_STREAM, 6, "", address
+
+
+class ConnectTest(unittest.TestCase):
+    def test_interleave(self):
+        infos = [info(socket.AF_INET6, ("::1", 1, 0, 0)), info(socket.AF_INET6, ("::2", 1, 0, 0)),
+                 info(socket.AF_INET, ("127.0.0.1", 1)), info(socket.AF_INET, ("127.0.0.2", 1))]
+        self.assertEqual([i[-1][0] for i in _interleave(infos)], ["::1", "127.0.0.1", "::2", "127.0.0.2"])
+        self.assertEqual([i[-1][0] for i in _interleave(infos, 2)], ["::1", "::2", "127.0.0.1", "127.0.0.2"])
+
+    def test_failed_attempt_starts_next(self):
+        loop = SelectorLoop()
+
+        async def handler(sock, addr):
+            await sock.sendall(b"hi")
+
+        async def main():
+            server = await start_server(handler, "127.0.0.1", 0)
+            port = server.sockname[1]
+            with socket.socket() as unused:  # Nothing listening, refused
+                unused.bind(("127.0.0.1", 0))
+                dead = unused.getsockname()[1]
+            # A refused address first shouldn't make us wait out the delay before trying the next
+            infos = [info(socket.AF_INET, ("127.0.0.1", dead)), info(socket.AF_INET, ("127.0.0.1", port))]
+            start = loop.time()
+            sock = await _Staggered(loop, infos, 5, None).run()
+            elapsed = loop.time() - start
+            conn = await wrap_socket(sock)
+            data = await conn.recv(2)
+            await conn.close()
+            await server.close()
+            return data, elapsed
+
+        data, elapsed = loop.run_until_complete(main())
+        self.assertEqual(data, b"hi")
+        self.assertLess(elapsed, 1.0)
+
+    def test_all_fail(self):
+        loop = SelectorLoop()
+
+        async def main():
+            with socket.socket() as unused:
+                unused.bind(("127.0.0.1", 0))
+                dead = unused.getsockname()[1]
+            return await open_connection(("127.0.0.1", dead), happy_eyeballs_delay=0.05)
+
+        with self.assertRaises(ConnectionRefusedError):
+            loop.run_until_complete(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+from henrio import *
+import socket
+import unittest
+
+
+class DatagramTest(unittest.TestCase):
+    def test_batches(self):
+        async def main():
+            server = await open_datagram_endpoint(("127.0.0.1", 0))
+            client = await open_datagram_endpoint(remote_addr=server.sockname)
+            for i in range(50):
+                await client.sendto(b"metric %d" % i)
+            await client.flush()
+            received = []
+            while len(received) < 50:
+                batch = await server.recv_batch()
+                received.extend(bytes(data) for data, addr in batch)
+            stats = server.stats(), client.stats()
+            await client.close()
+            await server.close()
+            return received, stats
+
+        received, (server, client) = SelectorLoop().run_until_complete(main())
+        self.assertEqual(received, [b"metric %d" % i for i in range(50)])
+        self.assertEqual(client["sent"], 50)
+        self.assertLess(server["batches"], 50)
+
+    def test_reply(self):
+        async def main():
+            server = await open_datagram_endpoint(("127.0.0.1", 0), max_batch=4)
+            raw = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            raw.bind(("127.0.0.1", 0))
+            for i in range(6):
+                raw.sendto(b"ping", server.sockname)
+            first = await server.recv_batch()
+            second = await server.recv_batch()
+            for data, addr in first + second:
+                await server.sendto(bytes(data).replace(b"i", b"o"), addr)
+            await server.flush()
+            await server.close()
+            replies = [raw.recv(16) for _ in range(6)]
+            raw.close()
+            return len(first), len(second), replies
+
+        first, second, replies = SelectorLoop().run_until_complete(main())
+        self.assertEqual((first, second), (4, 2))
+        self.assertEqual(replies, [b"pong"] * 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
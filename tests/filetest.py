@@ -0,0 +1,120 @@
+from henrio import *
+import os
+import tempfile
+import unittest
+
+
+class FileTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as file:
+            file.write(bytes(range(256)) * 64)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_pread_batched(self):
+        async def main():
+            async with aopen(self.path, "rb") as file:
+                loop = await get_loop()
+                tasks = [loop.create_task(file.pread(i * 256 + i, 4)) for i in range(20)]
+                for task in tasks:
+                    await task.wait()
+                return [task.result() for task in tasks], file.dispatches
+
+        results, dispatches = SelectorLoop().run_until_complete(main())
+        self.assertEqual(results, [bytes(range(i, i + 4)) for i in range(20)])
+        self.assertEqual(dispatches, 1)
+
+    def test_large_reads_unbatched(self):
+        async def main():
+            async with aopen(self.path, "rb", batch_threshold=1024) as file:
+                loop = await get_loop()
+                small = [loop.create_task(file.pread(i, 4)) for i in range(8)]
+                large = [loop.create_task(file.pread(i * 4096, 4096)) for i in range(4)]
+                for task in small + large:
+                    await task.wait()
+                return [task.result() for task in large], file.dispatches
+
+        results, dispatches = SelectorLoop().run_until_complete(main())
+        self.assertEqual(results, [bytes(range(256)) * 16] * 4)
+        self.assertEqual(dispatches, 5)  # One batch of small reads, one job per large read
+
+    def test_pwrite_and_write(self):
+        async def main():
+            async with aopen(self.path, "r+b") as file:
+                self.assertEqual(await file.pwrite(10, b"abc"), 3)
+                await file.write(b"xy")
+                await file.flush()
+                return await file.pread(0, 13)
+
+        data = SelectorLoop().run_until_complete(main())
+        self.assertEqual(data, b"xy" + bytes(range(2, 10)) + b"abc")
+
+    def test_pread_error(self):
+        async def main():
+            async with aopen(self.path, "rb") as file:
+                return await file.pread(-1, 4)
+
+        with self.assertRaises(OSError):
+            SelectorLoop().run_until_complete(main())
+
+    def test_mmap(self):
+        async def main():
+            async with aopen(self.path, "rb", mmap=True, fault_threshold=4096) as file:
+                head = await file.read(4)
+                rest = await file.pread(256, 8192)
+                copied = bytes(head), bytes(rest[:4]), len(rest), len(file._resident)
+                del head, rest
+                return copied
+
+        head, rest, size, resident = SelectorLoop().run_until_complete(main())
+        self.assertEqual(head, bytes(range(4)))
+        self.assertEqual(rest, bytes(range(4)))
+        self.assertEqual(size, 8192)
+        self.assertEqual(resident, 3)
+
+    def test_aopen_is_the_class(self):
+        self.assertIs(aopen, AsyncFile)
+
+        class Tracked(aopen):
+            pass
+
+        async def main():
+            async with Tracked(self.path, "rb") as file:
+                return isinstance(file, aopen), await file.pread(0, 2)
+
+        self.assertEqual(SelectorLoop().run_until_complete(main()), (True, bytes(range(2))))
+
+    def test_readline(self):
+        with open(self.path, "wb") as file:
+            file.write(b"one\ntwo\n")
+
+        async def main():
+            async with aopen(self.path, "rb") as file:
+                return await file.readline()
+
+        self.assertEqual(SelectorLoop().run_until_complete(main()), b"one\n")
+
+    def test_buffered(self):
+        lines = [("line %d\n" % i).encode() * (i % 7 + 1) for i in range(2000)]
+
+        async def main():
+            async with aopen(self.path, "wb", buffered=True, chunk_size=1024) as file:
+                for line in lines:
+                    await file.write(line)
+                await file.fsync()
+            async with aopen(self.path, "rb", buffered=True, chunk_size=1000, readahead=3) as file:
+                first = await file.read(5)
+                rest = [first + await file.readline()]
+                async for line in file:
+                    rest.append(line)
+                return rest
+
+        read = SelectorLoop().run_until_complete(main())
+        self.assertEqual(b"".join(read), b"".join(lines))
+        self.assertEqual(len(read), sum(line.count(b"\n") for line in lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
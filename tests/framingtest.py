@@ -0,0 +1,63 @@
+from henrio import *
+import unittest
+
+MESSAGES = [b"", b"a", b"hello world", bytes(range(256)) * 40, b"x" * 300]
+
+
+def feed_in_pieces(codec, data, size):
+    frames = []
+    for i in range(0, len(data), size):
+        frames.extend(bytes(frame) for frame in codec.feed(data[i:i + size]))
+    return frames
+
+
+class FramingTest(unittest.TestCase):
+    def test_split_invariance(self):
+        for make in (LengthPrefixed, lambda: LengthPrefixed("varint"), lambda: LengthPrefixed("!H"), Netstring):
+            stream = make().encode_many(MESSAGES)
+            for size in (1, 2, 7, 100, len(stream)):
+                codec = make()
+                self.assertEqual(feed_in_pieces(codec, stream, size), MESSAGES, (codec, size))
+                self.assertEqual(codec.buffered, 0)
+
+        lines = [message.replace(b"\n", b"") for message in MESSAGES]
+        stream = Delimited(b"\r\n").encode_many(lines)
+        for size in (1, 3, 64, len(stream)):
+            self.assertEqual(feed_in_pieces(Delimited(b"\r\n", max_frame_size=1 << 16), stream, size), lines)
+
+    def test_zero_copy(self):
+        data = LengthPrefixed().encode_many([b"abc", b"defg"])
+        frames = LengthPrefixed().feed(data)
+        self.assertTrue(all(isinstance(frame, memoryview) and frame.obj is data for frame in frames))
+
+    def test_errors(self):
+        with self.assertRaises(FrameError):
+            Netstring().feed(b"3:abc;")
+        with self.assertRaises(FrameError):
+            Netstring().feed(b"x3:abc,")
+        with self.assertRaises(FrameError):
+            LengthPrefixed(max_frame_size=10).feed(LengthPrefixed().encode(b"x" * 11))
+        with self.assertRaises(FrameError):
+            Delimited(max_frame_size=10).feed(b"x" * 11)
+        with self.assertRaises(FrameError):
+            LengthPrefixed("!i").feed(b"\xff\xff\xff\xfeabc")  # -2
+
+    def test_framed_socket(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await create_socketpair()
+            writer, reader = framed(left, Netstring()), framed(right, Netstring())
+            for i in range(1000):
+                writer.write(str(i).encode())
+            await writer.flush()  # One send for every frame
+            await left.close()
+            return [bytes(frame) async for frame in reader], writer.frames_sent
+
+        frames, sent = loop.run_until_complete(main())
+        self.assertEqual(frames, [str(i).encode() for i in range(1000)])
+        self.assertEqual(sent, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+from henrio import *
+import socket
+import unittest
+
+
+async def handler(request):
+    if request.path == "/chunked":
+        return HTTPResponse(200, [b"one,", b"two,", b"three"], {"Content-Type": "text/plain"})
+    if request.path == "/fail":
+        raise RuntimeError("Handler failed")
+    if request.path == "/none":
+        return None
+    if request.path == "/inject":
+        return HTTPResponse(200, b"", {"X-Name": request.query + "\r\nSet-Cookie: session=stolen"})
+    return HTTPResponse(200, request.method.encode() + b" " + request.target.encode() + b" " + request.body,
+                        [("X-Agent", request.headers.get("user-agent", "none"))])
+
+
+class HTTPTest(unittest.TestCase):
+    def run_client(self, client):
+        loop = SelectorLoop()
+
+        async def main():
+            server = await start_http_server(handler, "127.0.0.1", 0)
+            try:
+                conn = await open_http_connection(("127.0.0.1", server.sockname[1]))
+                try:
+                    return await client(conn)
+                finally:
+                    await conn.close()
+            finally:
+                await server.close()
+
+        return loop.run_until_complete(main())
+
+    def test_keep_alive(self):
+        async def client(conn):
+            first = await conn.request("GET", "/a?x=1", {"User-Agent": "henrio"})
+            second = await conn.request("POST", "/b", body=b"payload" * 100000)
+            return first, second, conn.closed
+
+        first, second, closed = self.run_client(client)
+        self.assertEqual((first.status, first.body), (200, b"GET /a?x=1 "))
+        self.assertEqual(first.headers["x-agent"], "henrio")
+        self.assertEqual(bytes(first.headers.view("X-Agent")), b"henrio")
+        self.assertEqual(second.body, b"POST /b " + b"payload" * 100000)
+        self.assertFalse(closed)
+
+    def test_pipelining(self):
+        async def client(conn):
+            return await conn.pipeline([("GET", "/{0}".format(i)) for i in range(50)])
+
+        responses = self.run_client(client)
+        self.assertEqual([response.body for response in responses],
+                         ["GET /{0} ".format(i).encode() for i in range(50)])
+
+    def test_chunked(self):
+        async def client(conn):
+            response = await conn.request("GET", "/chunked")
+            echoed = await conn.request("PUT", "/up", body=iter([b"ab", b"", b"cd"]))
+            return response, echoed
+
+        response, echoed = self.run_client(client)
+        self.assertEqual(response.headers.get("transfer-encoding"), "chunked")
+        self.assertEqual(response.body, b"one,two,three")
+        self.assertEqual(echoed.body, b"PUT /up abcd")
+
+    def test_no_body(self):
+        async def client(conn):
+            empty = await conn.request("GET", "/none")
+            after = await conn.request("GET", "/after")  # Still usable, the empty response was framed
+            return empty, after, conn.closed
+
+        empty, after, closed = self.run_client(client)
+        self.assertEqual((empty.status, empty.body, empty.headers.get("content-length")), (200, b"", "0"))
+        self.assertEqual(after.body, b"GET /after ")
+        self.assertFalse(closed)
+
+    def test_header_injection(self):
+        async def client(conn):
+            response = await conn.request("GET", "/inject?x")
+            return response, conn.closed
+
+        response, closed = self.run_client(client)
+        self.assertEqual(response.status, 500)
+        self.assertNotIn("set-cookie", response.headers)
+        self.assertTrue(closed)
+
+    def test_errors(self):
+        async def client(conn):
+            failed = await conn.request("GET", "/fail")
+            return failed, conn.closed
+
+        failed, closed = self.run_client(client)
+        self.assertEqual(failed.status, 500)
+        self.assertTrue(closed)
+
+        loop = SelectorLoop()
+
+        async def raw():
+            server = await start_http_server(handler, "127.0.0.1", 0)
+            sock = await open_connection(("127.0.0.1", server.sockname[1]))
+            await sock.sendall(b"GET / HTTP/1.1\r\nBad Header\r\n\r\n")
+            data = await sock.recv(1024)
+            await sock.close()
+            await server.close()
+            return data
+
+        self.assertTrue(loop.run_until_complete(raw()).startswith(b"HTTP/1.1 400 Bad Request\r\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
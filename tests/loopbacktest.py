@@ -0,0 +1,104 @@
+from henrio import *
+import unittest
+
+
+class Collector(Protocol):
+    def __init__(self):
+        self.chunks = []
+        self.lost = Future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.chunks.append(data)
+        self.transport.close()
+
+    def connection_lost(self, exc):
+        self.lost.set_result(exc)
+
+
+class LoopbackTest(unittest.TestCase):
+    def test_stream(self):
+        loop = SelectorLoop()
+        payload = bytes(range(256)) * 4096  # 1MB through a 64KiB buffer
+
+        async def main():
+            left, right = await loopback_pair(buffer_size=1 << 16)
+            sender = await spawn(left.sendall(payload))
+            data = bytearray()
+            while len(data) < len(payload):
+                data += await right.recv(1 << 15)
+            await sender.wait()
+            await left.close()
+            rest = [chunk async for chunk in right]
+            await right.close()
+            return bytes(data), rest, left.file.fileno()
+
+        data, rest, fileno = loop.run_until_complete(main())
+        self.assertEqual(data, payload)
+        self.assertEqual(rest, [])
+        self.assertEqual(fileno, -1)
+
+    def test_backpressure(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await loopback_pair(buffer_size=1000)
+            first = left.file.send(b"x" * 1500)
+            with self.assertRaises(BlockingIOError):
+                left.file.send(b"x")
+            await right.recv(400)
+            second = left.file.send(b"x" * 1500)
+            await left.close()
+            with self.assertRaises(BrokenPipeError):
+                right.file.send(b"x")
+            await right.close()
+            return first, second
+
+        self.assertEqual(loop.run_until_complete(main()), (1000, 400))
+
+    def test_latency_and_bandwidth(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await loopback_pair(buffer_size=1 << 20, latency=0.05)
+            start = loop.time()
+            await left.sendall(b"ping")
+            with self.assertRaises(BlockingIOError):
+                right.file.recv(4)  # Still in flight
+            await right.recv(4)
+            delayed = loop.time() - start
+
+            left.file.latency = 0.0
+            left.file.bandwidth = 1 << 20  # 1MiB/s
+            start = loop.time()
+            await left.sendall(b"x" * (1 << 17))
+            received = 0
+            while received < 1 << 17:
+                received += len(await right.recv(1 << 20))
+            throttled = loop.time() - start
+            await left.close()
+            await right.close()
+            return delayed, throttled
+
+        delayed, throttled = loop.run_until_complete(main())
+        self.assertGreaterEqual(delayed, 0.05)
+        self.assertLess(delayed, 0.5)
+        self.assertGreaterEqual(throttled, 0.12)
+        self.assertLess(throttled, 1)
+
+    def test_transport(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await loopback_pair()
+            protocol = Collector()
+            Transport(loop, right.file, protocol)._start()
+            await left.sendall(b"hello")
+            exc = await protocol.lost
+            reply = await left.recv(16)
+            await left.close()
+            return exc, protocol.chunks, reply
+
+        self.assertEqual(loop.run_until_complete(main()), (None, [b"hello"], b""))
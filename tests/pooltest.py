@@ -0,0 +1,182 @@
+from henrio import *
+import unittest
+
+
+async def echo(sock, addr):
+    while True:
+        data = await sock.recv(1024)
+        if not data:
+            break
+        await sock.sendall(data)
+
+
+class PoolTest(unittest.TestCase):
+    def test_reuse(self):
+        loop = SelectorLoop()
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            pool = ConnectionPool()
+            for i in range(5):
+                async with pool.connection(server.sockname) as sock:
+                    await sock.sendall(b"ping")
+                    self.assertEqual(await sock.recv(4), b"ping")
+            await pool.close()
+            await server.close()
+            return pool.stats()
+
+        stats = loop.run_until_complete(main())
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 4)
+
+    def test_high_descriptors(self):
+        import os
+        import resource
+        if resource.getrlimit(resource.RLIMIT_NOFILE)[0] < 1200:
+            self.skipTest("Needs more than 1100 file descriptors")
+        import gc
+        loop = SelectorLoop()
+        gc.collect()  # So no leaked socket frees a low descriptor under us
+        filler = [os.dup(0) for _ in range(1100)]  # Push the pool's sockets past FD_SETSIZE
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            pool = ConnectionPool()
+            for i in range(5):
+                async with pool.connection(server.sockname) as sock:
+                    self.assertGreater(sock.fileno, 1024)
+                    await sock.sendall(b"ping")
+                    self.assertEqual(await sock.recv(4), b"ping")
+            await pool.close()
+            await server.close()
+            return pool.stats()
+
+        try:
+            stats = loop.run_until_complete(main())
+        finally:
+            for fd in filler:
+                os.close(fd)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 4)
+
+    def test_dead_connection_discarded(self):
+        loop = SelectorLoop()
+
+        async def hangup(sock, addr):
+            pass
+
+        async def main():
+            server = await start_server(hangup, "127.0.0.1", 0)
+            pool = ConnectionPool()
+            sock = await pool.acquire(server.sockname)
+            await pool.release(sock)
+            await sleep(0.1)  # The server closes its end
+            second = await pool.acquire(server.sockname)
+            await pool.release(second, discard=True)
+            await server.close()
+            return sock, second, pool
+
+        first, second, pool = loop.run_until_complete(main())
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.misses, 2)
+        self.assertEqual(pool.idle, 0)
+
+    def test_idle_eviction(self):
+        loop = SelectorLoop()
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            pool = ConnectionPool(idle_timeout=0.1)
+            sock = await pool.acquire(server.sockname)
+            await pool.release(sock)
+            idle = pool.idle
+            await sleep(0.3)
+            await server.close()
+            return idle, pool.idle, sock
+
+        before, after, sock = loop.run_until_complete(main())
+        self.assertEqual((before, after), (1, 0))
+        self.assertEqual(sock.file.fileno(), -1)
+
+    def test_per_key_limit(self):
+        loop = SelectorLoop()
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            pool = ConnectionPool(max_per_key=1)
+            order = []
+
+            async def user(i):
+                async with pool.connection(server.sockname) as sock:
+                    order.append(i)
+                    await sleep(0.05)
+                    await sock.sendall(b"x")
+                    await sock.recv(1)
+
+            tasks = [await spawn(user(i)) for i in range(3)]
+            for task in tasks:
+                await task.wait()
+            await pool.close()
+            await server.close()
+            return order, pool.stats()
+
+        order, stats = loop.run_until_complete(main())
+        self.assertEqual(order, [0, 1, 2])
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["waits"], 2)
+        self.assertGreater(stats["wait_time"], 0)
+
+    def test_discard_flushes(self):
+        import socket
+        loop = SelectorLoop()
+        payload = b"x" * 60000
+
+        async def main():
+            received = Future()
+
+            async def drain(sock, addr):
+                data = bytearray()
+                while True:
+                    chunk = await sock.recv(1 << 16)
+                    if not chunk:
+                        break
+                    data += chunk
+                received.set_result(len(data))
+
+            server = await start_server(drain, "127.0.0.1", 0)
+            pool = ConnectionPool()
+            sock = await pool.acquire(server.sockname)
+            sock.file.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+            await sock.send_buffered(payload)
+            await pool.release(sock, discard=True)  # Closed through sock.close(), which flushes
+            size = await received
+            await pool.close()
+            await server.close()
+            return size
+
+        self.assertEqual(loop.run_until_complete(main()), len(payload))
+
+    def test_key_includes_connection_shape(self):
+        loop = SelectorLoop()
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            pool = ConnectionPool()
+            first = await pool.acquire(server.sockname)
+            await pool.release(first)
+            bound = await pool.acquire(server.sockname, source_addr=("127.0.0.1", 0))
+            await pool.release(bound)
+            again = await pool.acquire(server.sockname, source_addr=("127.0.0.1", 0))
+            await pool.release(again)
+            await pool.close()
+            await server.close()
+            return first, bound, again, pool.stats()
+
+        first, bound, again, stats = loop.run_until_complete(main())
+        self.assertIsNot(bound, first)  # Asked for a different source address, not handed the idle one
+        self.assertIs(again, bound)
+        self.assertEqual((stats["misses"], stats["hits"]), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
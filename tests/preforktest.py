@@ -0,0 +1,62 @@
+from henrio import *
+import os
+import signal
+import socket
+import time
+import unittest
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(port, data):
+    for _ in range(50):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=2) as sock:
+                sock.sendall(data)
+                return sock.recv(64)
+        except (ConnectionError, socket.timeout):
+            time.sleep(0.1)
+    raise TimeoutError
+
+
+class PreforkTest(unittest.TestCase):
+    @unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "Needs SO_REUSEPORT")
+    def test_workers_restart_and_stop(self):
+        port = free_port()
+
+        async def handler(sock, addr):
+            data = await sock.recv(64)
+            await sock.sendall(str(os.getpid()).encode())
+            if data == b"crash":
+                os._exit(3)
+
+        runner = os.fork()
+        if not runner:
+            try:
+                PreforkServer(handler, "127.0.0.1", port, 2, restart_delay=0.1, grace=2).run()
+            finally:
+                os._exit(0)
+
+        try:
+            pid = int(request(port, b"pid"))
+            self.assertNotEqual(pid, runner)
+            crashed = int(request(port, b"crash"))
+            serving = set()
+            deadline = time.monotonic() + 10
+            while len(serving) < 2 and time.monotonic() < deadline:  # The kernel spreads connections over both
+                serving.add(int(request(port, b"pid")))
+                time.sleep(0.01)
+            self.assertNotIn(crashed, serving)
+            self.assertEqual(len(serving), 2)  # The survivor and the replacement the supervisor started
+        finally:
+            os.kill(runner, signal.SIGTERM)
+            _, status = os.waitpid(runner, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
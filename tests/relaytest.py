@@ -0,0 +1,117 @@
+from henrio import *
+import os
+import socket
+import ssl
+import unittest
+
+CERT = os.path.join(os.path.dirname(__file__), "keycert.pem")
+
+
+async def pair():
+    left, right = await create_socketpair()
+    left.file.setblocking(False)
+    right.file.setblocking(False)
+    return left, right
+
+
+class RelayTest(unittest.TestCase):
+    def proxy(self, splice):
+        loop = SelectorLoop()
+        payload = os.urandom(1 << 20)
+
+        async def server(sock):
+            data = bytearray()
+            while True:
+                chunk = await sock.recv(1 << 16)
+                if not chunk:
+                    break
+                data += chunk
+            await sock.sendall(bytes(reversed(data)))  # Still writable after the client's half-close
+            await sock.close()
+
+        async def main():
+            client, proxy_in = await pair()
+            proxy_out, upstream = await pair()
+            handler = await spawn(server(upstream))
+            relayer = await spawn(relay(proxy_in, proxy_out, splice=splice))
+            await client.sendall(payload)
+            client.file.shutdown(socket.SHUT_WR)
+            data = bytearray()
+            while True:
+                chunk = await client.recv(1 << 16)
+                if not chunk:
+                    break
+                data += chunk
+            await handler.wait()
+            await relayer.wait()
+            for sock in (client, proxy_in, proxy_out):
+                await sock.close()
+            return bytes(data), relayer.result()
+
+        data, counts = loop.run_until_complete(main())
+        self.assertEqual(data, bytes(reversed(payload)))
+        self.assertEqual(counts, (len(payload), len(payload)))
+
+    def test_splice(self):
+        self.proxy(None)
+
+    def test_copy(self):
+        self.proxy(False)
+
+    def cancel_midway(self, splice):
+        loop = SelectorLoop()
+
+        async def main():
+            client, proxy_in = await pair()
+            proxy_out, upstream = await pair()
+            relayer = await spawn(relay(proxy_in, proxy_out, splice=splice))
+            await client.sendall(b"first")
+            client.file.shutdown(socket.SHUT_WR)
+            self.assertEqual(await upstream.recv(16), b"first")
+            self.assertEqual(await upstream.recv(16), b"")  # a to b is done, b to a is still going
+            relayer.cancel()
+            await upstream.sendall(b"back")
+            await sleep(0.05)
+            with self.assertRaises(BlockingIOError):
+                client.file.recv(16)  # Didn't outlive the relay
+            for sock in (client, proxy_in, proxy_out, upstream):
+                await sock.close()
+            return relayer.cancelled
+
+        self.assertTrue(loop.run_until_complete(main()))
+
+    def test_cancel_splice(self):
+        self.cancel_midway(None)
+
+    def test_cancel_copy(self):
+        self.cancel_midway(False)
+
+    def test_tls_falls_back(self):
+        loop = SelectorLoop()
+        server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_ctx.load_cert_chain(CERT)
+        client_ctx = ssl.create_default_context(cafile=CERT)
+
+        async def main():
+            client, proxy_in = await pair()
+            proxy_out, upstream = await pair()
+            tls_client = TLSSocket(client, client_ctx, server_hostname="localhost")
+            tls_proxy = TLSSocket(proxy_in, server_ctx, server_side=True)
+            handshake = await spawn(tls_client.do_handshake())
+            await tls_proxy.do_handshake()
+            await handshake.wait()
+            relayer = await spawn(relay(tls_proxy, proxy_out))
+            await tls_client.sendall(b"hello")
+            self.assertEqual(await upstream.recv(5), b"hello")
+            await upstream.sendall(b"world")
+            self.assertEqual(await tls_client.recv(5), b"world")
+            upstream.file.shutdown(socket.SHUT_WR)
+            await tls_client.unwrap()
+            await relayer.wait()
+            return relayer.result()
+
+        self.assertEqual(loop.run_until_complete(main()), (5, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
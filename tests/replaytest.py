@@ -0,0 +1,77 @@
+from henrio import *
+from henrio.replay import RECV
+import os
+import tempfile
+import unittest
+
+
+async def upper(sock, addr):
+    chunks = []
+    while True:
+        data = await sock.recv(1024)
+        if not data:
+            break
+        chunks.append(data)
+        await sock.sendall(data.upper())
+    return chunks
+
+
+class ReplayTest(unittest.TestCase):
+    def record(self):
+        loop = SelectorLoop()
+        recorder = Recorder()
+
+        async def client(port, messages):
+            conn = await open_connection(("127.0.0.1", port))
+            for message in messages:
+                await conn.sendall(message)
+                await conn.recv(1024)  # Keep each message its own chunk on the server
+                await sleep(0.02)
+            await conn.close()
+
+        async def main():
+            server = await start_server(recorder.handler(upper), "127.0.0.1", 0)
+            port = server.sockname[1]
+            first = await spawn(client(port, [b"a1", b"a2", b"a3"]))
+            await sleep(0.01)
+            second = await spawn(client(port, [b"b1", b"b2"]))
+            await first.wait()
+            await second.wait()
+            while server.active:
+                await sleep(0.01)
+            await server.close()
+
+        loop.run_until_complete(main())
+        return recorder.trace
+
+    def test_record_replay(self):
+        trace = self.record()
+        path = os.path.join(tempfile.mkdtemp(), "upper.trace")
+        trace.dump(path)
+        loaded = Trace.load(path)
+        self.assertEqual(loaded.events, trace.events)
+        self.assertEqual(loaded.connections, 2)
+
+        seen = []
+
+        async def handler(sock, addr):
+            while True:
+                data = await sock.recv(1024)
+                seen.append(data)
+                if not data:
+                    break
+                await sock.sendall(data.upper())
+
+        recorded = [event.data for event in trace.events if event.kind == RECV]
+        loop = SelectorLoop()
+        stats = loop.run_until_complete(replay(loaded, handler))
+        self.assertEqual(seen, recorded)  # Same chunks, in the same order across connections
+        self.assertEqual(stats["connections"], 2)
+        self.assertEqual(stats["bytes_received"], 10)
+        self.assertEqual(stats["bytes_sent"], 10)
+        self.assertLess(stats["elapsed"], trace.duration)
+
+        seen.clear()
+        stats = SelectorLoop().run_until_complete(replay(loaded, handler, speed=1.0))
+        self.assertEqual(seen, recorded)
+        self.assertGreaterEqual(stats["elapsed"], trace.duration * 0.9)
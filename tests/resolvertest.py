@@ -0,0 +1,77 @@
+from henrio import *
+import socket
+import unittest
+
+
+class CountingLookup:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        return socket.getaddrinfo(*args)
+
+
+class ResolverTest(unittest.TestCase):
+    def test_cache_and_single_flight(self):
+        lookup = CountingLookup()
+        resolver = Resolver(lookup=lookup)
+
+        async def main():
+            tasks = [await spawn(resolver.getaddrinfo("localhost", 80)) for _ in range(10)]
+            for task in tasks:
+                await task.wait()
+            again = await resolver.getaddrinfo("localhost", 80)
+            return [task.result() for task in tasks], again
+
+        results, again = SelectorLoop().run_until_complete(main())
+        self.assertEqual(lookup.calls, 1)
+        self.assertTrue(all(result == again for result in results))
+        self.assertEqual(resolver.stats()["coalesced"], 9)
+        self.assertEqual(resolver.hits, 1)
+
+    def test_serves_stale_while_refreshing(self):
+        lookup = CountingLookup()
+        resolver = Resolver(ttl=0.05, stale_ttl=10, lookup=lookup)
+
+        async def main():
+            first = await resolver.getaddrinfo("127.0.0.1", 80)
+            await sleep(0.1)
+            stale = await resolver.getaddrinfo("127.0.0.1", 80)
+            calls = lookup.calls
+            while lookup.calls < 2:
+                await sleep(0.01)
+            return first, stale, calls
+
+        first, stale, calls = SelectorLoop().run_until_complete(main())
+        self.assertIs(first, stale)
+        self.assertEqual(calls, 1)
+        self.assertEqual(resolver.stale_hits, 1)
+
+    def test_lru_bound(self):
+        resolver = Resolver(maxsize=2)
+
+        async def main():
+            for port in (1, 2, 3):
+                await resolver.getaddrinfo("127.0.0.1", port)
+
+        SelectorLoop().run_until_complete(main())
+        self.assertEqual(len(resolver), 2)
+        self.assertNotIn(("127.0.0.1", 1, 0, 0, 0, 0), resolver._cache)
+
+    def test_errors_not_cached(self):
+        def fail(*args):
+            raise socket.gaierror(socket.EAI_NONAME, "nope")
+
+        resolver = Resolver(lookup=fail)
+
+        async def main():
+            with self.assertRaises(socket.gaierror):
+                await resolver.getaddrinfo("nowhere.invalid", 80)
+
+        SelectorLoop().run_until_complete(main())
+        self.assertEqual(len(resolver), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+from henrio import *
+import unittest
+
+
+class Handlers:
+    def __init__(self):
+        self.cancelled = False
+
+    def add(self, a, b):
+        return a + b
+
+    async def divide(self, a, b):
+        await sleep(0)
+        return a / b
+
+    async def slow(self):
+        try:
+            await sleep(10)
+        except CancelledError:
+            self.cancelled = True
+            raise
+
+
+class RPCTest(unittest.TestCase):
+    def test_calls(self):
+        loop = SelectorLoop()
+        handlers = Handlers()
+
+        async def main():
+            server = await serve_rpc(handlers, "127.0.0.1", 0)
+            conn = await connect_rpc(("127.0.0.1", server.sockname[1]))
+            tasks = [loop.create_task(conn.call("add", i, i)) for i in range(100)]  # All in the same tick
+            for task in tasks:
+                await task.wait()
+            results = [task.result() for task in tasks]
+            with self.assertRaises(ZeroDivisionError):
+                await conn.call("divide", 1, 0)
+            with self.assertRaises(AttributeError):
+                await conn.call("missing")
+            stats = conn.stats()
+            await conn.close()
+            await server.close()
+            return results, stats
+
+        results, stats = loop.run_until_complete(main())
+        self.assertEqual(results, [i * 2 for i in range(100)])
+        self.assertEqual(stats["calls"], 102)
+        self.assertLessEqual(stats["batches"], 3)  # Calls made in the same tick share a write
+        self.assertEqual(stats["pending"], 0)
+
+    def test_cancellation(self):
+        loop = SelectorLoop()
+        handlers = Handlers()
+
+        async def main():
+            server = await serve_rpc(handlers, "127.0.0.1", 0)
+            conn = await connect_rpc(("127.0.0.1", server.sockname[1]))
+            call = await spawn(conn.call("slow"))
+            await sleep(0.05)
+            call.cancel()
+            for _ in range(10):
+                if handlers.cancelled:
+                    break
+                await sleep(0.01)
+            await conn.close()
+            await server.close()
+
+        loop.run_until_complete(main())
+        self.assertTrue(handlers.cancelled)
+
+    def test_both_ways(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await create_socketpair()
+            a = await RPCConnection(left, {"name": lambda: "a"}).start()
+            b = await RPCConnection(right, {"name": lambda: "b"}).start()
+            names = await a.call("name"), await b.call("name")
+            await a.close()
+            with self.assertRaises(ConnectionResetError):
+                await b.call("name")
+            await b.close()
+            return names
+
+        self.assertEqual(loop.run_until_complete(main()), ("b", "a"))
+
+    def test_untrusted_payloads(self):
+        loop = SelectorLoop()
+        ran = []
+
+        class Evil:
+            def __reduce__(self):
+                return ran.append, ("pwned",)
+
+        async def main():
+            server = await serve_rpc(Handlers())
+            host, port = server.sockname
+            unsafe = await connect_rpc((host, port), serializer=PickleSerializer())
+            with self.assertRaises(RPCError):  # The server doesn't unpickle, the request is just invalid
+                await unsafe.call("add", Evil(), 1)
+            await unsafe.close()
+            await server.close()
+            return host
+
+        self.assertEqual(loop.run_until_complete(main()), "127.0.0.1")
+        self.assertEqual(ran, [])
+
+    def test_pickle_opt_in(self):
+        loop = SelectorLoop()
+
+        async def main():
+            server = await serve_rpc(Handlers(), serializer=PickleSerializer())
+            conn = await connect_rpc(server.sockname, serializer=PickleSerializer())
+            result = await conn.call("add", (1,), (2,))
+            await conn.close()
+            await server.close()
+            return result
+
+        self.assertEqual(loop.run_until_complete(main()), (1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
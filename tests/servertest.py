@@ -0,0 +1,239 @@
+from henrio import *
+import unittest
+
+
+class ServerTest(unittest.TestCase):
+    def test_echo_server(self):
+        loop = SelectorLoop()
+
+        async def echo(sock, addr):
+            data = await sock.recv(1024)
+            await sock.sendall(data)
+
+        async def client(port, i):
+            sock = await open_connection(("127.0.0.1", port))
+            message = "hello {}".format(i).encode()
+            await sock.sendall(message)
+            reply = await sock.recv(1024)
+            await sock.close()
+            return reply == message
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            port = server.sockname[1]
+            tasks = [await spawn(client(port, i)) for i in range(20)]
+            for task in tasks:
+                await task.wait()
+            await server.close()
+            return [task.result() for task in tasks], server.stats()
+
+        results, stats = loop.run_until_complete(main())
+        self.assertTrue(all(results))
+        self.assertEqual(stats["accepted"], 20)
+        self.assertEqual(stats["active"], 0)
+
+    def test_drains_backlog(self):
+        import socket
+        loop = SelectorLoop()
+        clients = []
+
+        async def handler(sock, addr):
+            pass
+
+        async def main():
+            server = await start_server(handler, "127.0.0.1", 0, backlog=50)
+            for _ in range(10):
+                clients.append(socket.create_connection(server.sockname))
+            while server.accepted < 10:
+                await sleep(0)
+            await server.close()
+            return server
+
+        try:
+            server = loop.run_until_complete(main())
+        finally:
+            for sock in clients:
+                sock.close()
+        self.assertEqual(server.last_batch, 10)
+
+    def test_max_handlers(self):
+        import socket
+        loop = SelectorLoop()
+        clients = []
+        peak = []
+        release = Event()
+
+        async def handler(sock, addr):
+            peak.append(server.active)
+            await release.wait()
+
+        async def main():
+            nonlocal server
+            server = await start_server(handler, "127.0.0.1", 0, max_handlers=2)
+            for _ in range(5):
+                clients.append(socket.create_connection(server.sockname))
+            await sleep(0.05)
+            paused, accepted = server.paused, server.accepted
+            release.set()
+            while server.accepted < 5:
+                await sleep(0.01)
+                release.set()
+            await server.close()
+            return paused, accepted
+
+        server = None
+        try:
+            paused, accepted = loop.run_until_complete(main())
+        finally:
+            for sock in clients:
+                sock.close()
+        self.assertTrue(paused)
+        self.assertEqual(accepted, 2)  # The rest waited in the backlog
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(server.rejected, 0)
+
+    def test_shed_on_queue_delay(self):
+        import time
+        loop = SelectorLoop()
+
+        async def handler(sock, addr):
+            await sock.sendall(b"served")
+
+        async def hog(rounds):
+            for _ in range(rounds):
+                time.sleep(0.005)  # Hold the loop like a slow, CPU bound request would
+                await sleep(0)
+
+        async def main():
+            server = await start_server(handler, "127.0.0.1", 0, max_queue_delay=0.01, reject=True)
+            hogs = [await spawn(hog(40)) for _ in range(4)]
+            await sleep(0.05)
+            conn = await open_connection(("127.0.0.1", server.sockname[1]))
+            try:
+                reply = await conn.recv(1024)
+            except ConnectionResetError:
+                reply = b""
+            await conn.close()
+            delay = max(task.total_queue_delay for task in hogs)
+            for task in hogs:
+                await task.wait()
+            await server.close()
+            return reply, delay, server.stats()
+
+        reply, delay, stats = loop.run_until_complete(main())
+        self.assertEqual(reply, b"")
+        self.assertGreater(delay, 0.01)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["accepted"], 0)
+
+    def test_recovers_when_idle(self):
+        import time
+        loop = SelectorLoop()
+
+        async def handler(sock, addr):
+            await sock.sendall(b"served")
+
+        async def hog(server, rounds):
+            overloaded = False
+            for _ in range(rounds):
+                time.sleep(0.005)
+                await sleep(0)
+                overloaded = overloaded or server.overloaded()
+            return overloaded
+
+        async def main():
+            server = await start_server(handler, "127.0.0.1", 0, max_queue_delay=0.01, reject=True)
+            hogs = [await spawn(hog(server, 20)) for _ in range(8)]
+            for task in hogs:
+                await task.wait()
+            overloaded = any(task.result() for task in hogs)
+            await sleep(1.0)  # Nothing runs, the loop blocks in select the whole time
+            conn = await open_connection(("127.0.0.1", server.sockname[1]))
+            reply = await conn.recv(1024)
+            await conn.close()
+            await server.close()
+            return overloaded, reply, server.stats()
+
+        overloaded, reply, stats = loop.run_until_complete(main())
+        self.assertTrue(overloaded)
+        self.assertEqual(reply, b"served")
+        self.assertEqual(stats["rejected"], 0)
+        self.assertEqual(stats["accepted"], 1)
+
+    def test_backs_off_when_out_of_descriptors(self):
+        import errno
+        import socket
+        loop = SelectorLoop()
+
+        class Exhausted:
+            """A listener that fails with EMFILE while `failures` lasts"""
+            def __init__(self, sock, failures):
+                self.sock = sock
+                self.failures = failures
+                self.calls = 0
+
+            def __getattr__(self, name):
+                return getattr(self.sock, name)
+
+            def fileno(self):
+                return self.sock.fileno()
+
+            def accept(self):
+                self.calls += 1
+                if self.failures:
+                    self.failures -= 1
+                    raise OSError(errno.EMFILE, "Too many open files")
+                return self.sock.accept()
+
+        async def handler(sock, addr):
+            await sock.sendall(b"served")
+
+        async def main():
+            listener = socket.socket()
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(8)
+            listener.setblocking(False)
+            fake = Exhausted(listener, 1 << 20)
+            server = Server(handler, fake)
+            server._task = await spawn(server.serve_forever())
+            conn = await open_connection(listener.getsockname())
+            await sleep(0.35)
+            calls, paused = fake.calls, server.paused
+            fake.failures = 0  # A descriptor frees up
+            reply = await conn.recv(16)
+            await conn.close()
+            await server.close()
+            return calls, paused, reply
+
+        calls, paused, reply = loop.run_until_complete(main())
+        self.assertLessEqual(calls, 5)  # One attempt per backoff, not a spin on the still readable listener
+        self.assertTrue(paused)
+        self.assertEqual(reply, b"served")
+
+    def test_flushes_buffered_on_return(self):
+        import socket
+        loop = SelectorLoop()
+        payload = b"x" * 60000
+
+        async def handler(sock, addr):
+            sock.file.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+            await sock.send_buffered(payload)  # Mostly left in the buffer when we return
+
+        async def main():
+            server = await start_server(handler, "127.0.0.1", 0)
+            conn = await open_connection(server.sockname)
+            data = bytearray()
+            while True:
+                chunk = await conn.recv(1 << 16)
+                if not chunk:
+                    break
+                data += chunk
+            await conn.close()
+            await server.close()
+            return len(data)
+
+        self.assertEqual(loop.run_until_complete(main()), len(payload))
+
+
+if __name__ == "__main__":
+    unittest.main()
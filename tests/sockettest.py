@@ -0,0 +1,201 @@
+from henrio import *
+import socket
+import unittest
+
+
+class SocketTest(unittest.TestCase):
+    def test_backpressure(self):
+        loop = SelectorLoop()
+        chunk = b"x" * 8192
+        count = 128  # 1MB
+
+        async def produce(sock):
+            for _ in range(count):
+                await sock.send_buffered(chunk)
+            await sock.flush()
+
+        async def main():
+            left, right = await create_socketpair()
+            left.file.setblocking(False)
+            left.file.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 16)
+            left.set_write_buffer_limits(high=1 << 16)
+            producer = await spawn(produce(left))
+            await sleep(0.05)  # Nobody is reading, the producer should be waiting on drain()
+            blocked = not producer.complete
+            buffered = left.buffered
+            received = 0
+            while received < len(chunk) * count:
+                data = await right.recv(1 << 16)
+                received += len(data)
+            await producer.wait()
+            left_over = left.buffered
+            await left.close()
+            await right.close()
+            return blocked, buffered, received, left_over
+
+        blocked, buffered, received, left_over = loop.run_until_complete(main())
+        self.assertTrue(blocked)
+        self.assertGreater(buffered, 1 << 14)
+        self.assertLessEqual(buffered, (1 << 16) + 8192)
+        self.assertEqual(received, 8192 * 128)
+        self.assertEqual(left_over, 0)
+
+    def test_buffered_order(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await create_socketpair()
+            await left.send_buffered(b"a")  # Blocking socket, queued for the writer instead of sent inline
+            queued = left.buffered
+            await left.flush()
+            left.file.setblocking(False)
+            left.file.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 16)
+            left.set_write_buffer_limits(high=1 << 20)
+            chunk = b"b" * (1 << 18)
+            await left.send_buffered(chunk)  # More than the socket takes, the rest is buffered
+            sender = await spawn(left.sendall(b"c"))
+            data = bytearray()
+            while len(data) < 2 + len(chunk):
+                data += await right.recv(1 << 16)
+            await sender.wait()
+            await left.close()
+            await right.close()
+            return queued, bytes(data)
+
+        queued, data = loop.run_until_complete(main())
+        self.assertEqual(queued, 1)
+        self.assertEqual(data, b"a" + b"b" * (1 << 18) + b"c")
+
+    def test_write_buffer_limits(self):
+        sock = AsyncSocket(None)
+        with self.assertRaises(ValueError):
+            sock.set_write_buffer_limits(high=10, low=20)
+        sock.set_write_buffer_limits(high=1000)
+        self.assertEqual((sock.write_high, sock.write_low), (1000, 250))
+
+    def test_recv_timeout(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await create_socketpair()
+            start = loop.time()
+            with self.assertRaises(TimeoutError):
+                await left.recv(10, timeout=0.05)
+            elapsed = loop.time() - start
+            key = loop.selector.get_map().get(left.file.fileno())  # The expired waiter was dropped
+            await right.sendall(b"late")
+            data = await left.recv(10, timeout=1.0)
+            with self.assertRaises(TimeoutError):
+                await wait_writable(right.file, deadline=loop.time() - 1)
+            await left.close()
+            await right.close()
+            return elapsed, key, data, len(loop._timers)
+
+        elapsed, key, data, timers = loop.run_until_complete(main())
+        self.assertGreaterEqual(elapsed, 0.05)
+        self.assertLess(elapsed, 0.5)
+        self.assertIsNone(key)
+        self.assertEqual(data, b"late")
+        self.assertLessEqual(timers, 1)  # The one that was met is dropped once it's due or compacted
+
+    def test_deadline_compaction(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await create_socketpair()
+            for _ in range(3000):  # Every wait is met, their deadlines shouldn't pile up
+                await right.sendall(b"x")
+                await left.recv(1, timeout=60)
+            await left.close()
+            await right.close()
+            return len(loop._timers)
+
+        self.assertLessEqual(loop.run_until_complete(main()), 2048)
+
+    def test_adaptive_reads(self):
+        loop = SelectorLoop()
+        payload = b"x" * (1 << 22)
+
+        async def main():
+            left, right = await create_socketpair()
+            left.file.setblocking(False)
+            right.file.setblocking(False)
+            right.set_read_size_limits(minimum=512)
+            sender = await spawn(left.sendall(payload))
+            received = 0
+            async for chunk in right:
+                received += len(chunk)
+                if received == len(payload):
+                    break
+            await sender.wait()
+            grown, bulk_reads = right.read_size, right.reads
+            for _ in range(40):  # Chatty traffic, the read size should back off
+                await left.sendall(b"ping")
+                async for chunk in right:
+                    break
+            await left.close()
+            rest = [chunk async for chunk in right]
+            await right.close()
+            return grown, bulk_reads, right.read_size, right.average_read, rest
+
+        grown, bulk_reads, shrunk, average, rest = loop.run_until_complete(main())
+        self.assertGreater(grown, 1 << 14)
+        self.assertLess(bulk_reads, (1 << 22) // (1 << 14))
+        self.assertEqual(shrunk, 512)
+        self.assertGreater(average, 4)
+        self.assertEqual(rest, [])
+
+    def test_wait_any(self):
+        loop = SelectorLoop()
+
+        async def main():
+            pairs = [await create_socketpair() for _ in range(4)]
+            readers = [right for left, right in pairs]
+            await pairs[2][0].sendall(b"x")
+            await pairs[3][0].sendall(b"y")
+            await sleep(0)
+            ready = await wait_any_readable(readers)
+            keys = [key for key in loop.selector.get_map().values() if key.data is not None]  # Not the wakeup socket
+            waiting = sum(len(key.data[0]) + len(key.data[1]) for key in keys)
+            with self.assertRaises(TimeoutError):
+                await wait_any_readable(readers[:2], timeout=0.02)
+            writable = await wait_any([pairs[0][0]], read=False, write=True)
+            for left, right in pairs:
+                await left.close()
+                await right.close()
+            registered = [key for key in loop.selector.get_map().values() if key.data is not None]
+            return ready == {readers[2], readers[3]}, waiting, writable, len(registered)
+
+        ready, waiting, writable, registered = loop.run_until_complete(main())
+        self.assertTrue(ready)
+        self.assertEqual(waiting, 0)  # The losers are gone from the selector
+        self.assertEqual(len(writable), 1)
+        self.assertEqual(registered, 0)
+
+    def test_idle_waits_block(self):
+        import time
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await create_socketpair()
+            left.file.setblocking(False)
+            right.file.setblocking(False)
+            reader = await spawn(right.recv(16))  # Something registered with the selector
+            start = time.process_time()
+            await threadworker(time.sleep, 0.3)  # Woken by the worker finishing, not by polling
+            sleeper = await spawn(sleep(0.2))
+            await sleeper.wait()  # A plain Future, the selector blocks until the timer is due
+            cpu = time.process_time() - start
+            await left.sendall(b"done")
+            await reader.wait()
+            await left.close()
+            await right.close()
+            return cpu, reader.result()
+
+        cpu, data = loop.run_until_complete(main())
+        self.assertEqual(data, b"done")
+        self.assertLess(cpu, 0.15)
+
+
+if __name__ == "__main__":
+    unittest.main()
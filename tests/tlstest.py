@@ -0,0 +1,157 @@
+from henrio import *
+import os
+import socket
+import ssl
+import unittest
+
+CERT = os.path.join(os.path.dirname(__file__), "keycert.pem")
+
+
+def contexts():
+    server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server_ctx.load_cert_chain(CERT)
+    client_ctx = ssl.create_default_context(cafile=CERT)
+    return server_ctx, client_ctx
+
+
+class TLSTest(unittest.TestCase):
+    def test_memory_bio_echo(self):
+        loop = SelectorLoop()
+        server_ctx, client_ctx = contexts()
+        payload = os.urandom(1 << 20)  # Many TLS records
+
+        async def echo(sock, addr):
+            tls = TLSSocket(sock, server_ctx, server_side=True)
+            await tls.do_handshake()
+            received = 0
+            while received < len(payload):
+                data = await tls.recv(1 << 16)
+                if not data:
+                    break
+                received += len(data)
+                await tls.sendall(data)
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            sock = await open_connection(("127.0.0.1", server.sockname[1]), ssl=client_ctx,
+                                         server_hostname="localhost", memory_bio=True)
+            version = sock.version()
+            sender = await spawn(sock.sendall(payload))
+            chunks = []
+            received = 0
+            while received < len(payload):
+                data = await sock.recv(1 << 20)
+                self.assertTrue(data)
+                chunks.append(data)
+                received += len(data)
+            await sender.wait()
+            await sock.close()
+            await server.close()
+            return version, b''.join(chunks)
+
+        version, data = loop.run_until_complete(main())
+        self.assertIsNotNone(version)
+        self.assertEqual(data, payload)
+
+    def test_bad_hostname(self):
+        loop = SelectorLoop()
+        server_ctx, client_ctx = contexts()
+
+        async def handler(sock, addr):
+            tls = TLSSocket(sock, server_ctx, server_side=True)
+            try:
+                await tls.do_handshake()
+            except (ssl.SSLError, OSError):
+                pass
+
+        async def main():
+            server = await start_server(handler, "127.0.0.1", 0)
+            try:
+                await open_connection(("127.0.0.1", server.sockname[1]), ssl=client_ctx,
+                                      server_hostname="example.com", memory_bio=True)
+            finally:
+                await server.close()
+
+        with self.assertRaises(ssl.SSLCertVerificationError):
+            loop.run_until_complete(main())
+
+    def test_session_resumption(self):
+        loop = SelectorLoop()
+        server_ctx, client_ctx = contexts()
+
+        async def echo(sock, addr):
+            tls = TLSSocket(sock, server_ctx, server_side=True)
+            await tls.do_handshake()
+            await tls.sendall(await tls.recv(1024))
+            await tls.close()
+
+        async def connect(port, cache, memory_bio):
+            sock = await open_connection(("127.0.0.1", port), ssl=client_ctx, server_hostname="localhost",
+                                         memory_bio=memory_bio, session_cache=cache)
+            await sock.sendall(b"ping")
+            self.assertEqual(await sock.recv(1024), b"ping")
+            await sock.close()
+
+        async def main():
+            cache = SessionCache()
+            server = await start_server(echo, "127.0.0.1", 0)
+            port = server.sockname[1]
+            for memory_bio in (False, True, False, True):
+                await connect(port, cache, memory_bio)
+            await server.close()
+            return cache.stats()
+
+        stats = loop.run_until_complete(main())
+        self.assertEqual(stats["connections"], 4)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["resumed"], 3)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_truncation(self):
+        loop = SelectorLoop()
+        server_ctx, client_ctx = contexts()
+
+        async def connected(suppress):
+            left, right = await create_socketpair()
+            left.file.setblocking(False)
+            right.file.setblocking(False)
+            server = await ssl_wrap_socket(right.file, server_ctx, server_side=True, memory_bio=True,
+                                           suppress_ragged_eofs=suppress)
+            client = TLSSocket(left, client_ctx, server_hostname="localhost")
+            handshake = await spawn(client.do_handshake())
+            await server.do_handshake()
+            await handshake.wait()
+            return client, server
+
+        async def main():
+            client, server = await connected(False)
+            await client.sendall(b"partial")
+            client.file.shutdown(socket.SHUT_WR)  # EOF without a close_notify
+            data = await server.recv(1024)
+            with self.assertRaises(ssl.SSLEOFError):
+                await server.recv(1024)
+            await client.close()
+            await server.close()
+
+            client, server = await connected(True)
+            await client.sendall(b"partial")
+            client.file.shutdown(socket.SHUT_WR)
+            suppressed = await server.recv(1024), await server.recv(1024)
+            await client.close()
+            await server.close()
+
+            client, server = await connected(False)
+            await client.unwrap()  # A clean close is still a normal EOF
+            clean = await server.recv(1024)
+            await client.close()
+            await server.close()
+            return data, suppressed, clean
+
+        data, suppressed, clean = loop.run_until_complete(main())
+        self.assertEqual(data, b"partial")
+        self.assertEqual(suppressed, (b"partial", b""))
+        self.assertEqual(clean, b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+from henrio import *
+import socket
+import unittest
+
+
+class Echo(Protocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+    def eof_received(self):
+        pass  # Close once the echo has been flushed
+
+
+class Collector(Protocol):
+    def __init__(self):
+        self.chunks = []
+        self.lost = Future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.chunks.append(data)
+
+    def connection_lost(self, exc):
+        self.lost.set_result(exc)
+
+
+class TransportTest(unittest.TestCase):
+    def test_echo(self):
+        loop = SelectorLoop()
+        payload = bytes(range(256)) * 8192  # 2MB, more than the socket buffers hold
+
+        async def main():
+            server = await create_server(Echo, "127.0.0.1", 0)
+            transport, protocol = await create_connection(Collector, ("127.0.0.1", server.sockname[1]))
+            transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 16)
+            transport.write(payload)
+            buffered = transport.get_write_buffer_size()
+            transport.write_eof()
+            exc = await protocol.lost
+            await sleep(0)
+            await server.close()
+            return buffered, exc, b"".join(protocol.chunks), transport, server.stats()
+
+        buffered, exc, data, transport, stats = loop.run_until_complete(main())
+        self.assertGreater(buffered, 0)
+        self.assertIsNone(exc)
+        self.assertEqual(data, payload)
+        self.assertEqual(transport.bytes_sent, len(payload))
+        self.assertEqual(transport.bytes_received, len(payload))
+        self.assertEqual(stats["accepted"], 1)
+        self.assertEqual(stats["active"], 0)
+
+    def test_async_protocol(self):
+        loop = SelectorLoop()
+        lost = []
+
+        class AsyncEcho(AbstractProtocol):  # Only the abstract callbacks, plus connection_made
+            def connection_made(self, transport):
+                self.transport = transport
+
+            async def data_received(self, data):
+                self.transport.write(data.upper())
+
+            async def connection_lost(self, exc):
+                lost.append(exc)
+
+        async def main():
+            server = await create_server(AsyncEcho, "127.0.0.1", 0)
+            transport, protocol = await create_connection(Collector, ("127.0.0.1", server.sockname[1]))
+            transport.write(b"hello")
+            while not protocol.chunks:
+                await sleep(0.01)
+            transport.close()
+            await protocol.lost
+            while not lost:
+                await sleep(0.01)
+            await server.close()
+            return b"".join(protocol.chunks)
+
+        self.assertEqual(loop.run_until_complete(main()), b"HELLO")
+        self.assertEqual(lost, [None])  # The server side closed cleanly, no callback blew up
+
+    def test_pause_writing(self):
+        loop = SelectorLoop()
+        events = []
+
+        class Sink(Protocol):
+            pass
+
+        class Writer(Collector):
+            def pause_writing(self):
+                events.append("pause")
+
+            def resume_writing(self):
+                events.append("resume")
+
+        async def main():
+            server = await create_server(Sink, "127.0.0.1", 0)
+            transport, protocol = await create_connection(Writer, ("127.0.0.1", server.sockname[1]))
+            transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 16)
+            transport.set_write_buffer_limits(high=1 << 16)
+            transport.write(b"x" * (1 << 21))
+            paused = list(events)
+            while transport.get_write_buffer_size():
+                await sleep(0.01)
+            transport.close()
+            await protocol.lost
+            await server.close()
+            return paused
+
+        self.assertEqual(loop.run_until_complete(main()), ["pause"])
+        self.assertEqual(events, ["pause", "resume"])
+
+    def test_connection_lost_error(self):
+        loop = SelectorLoop()
+
+        class Broken(Collector):
+            def connection_lost(self, exc):
+                super().connection_lost(exc)
+                raise RuntimeError("Handler bug")
+
+        async def main():
+            left, right = await create_socketpair()
+            right.file.setblocking(False)
+            protocol = Broken()
+            transport = Transport(loop, right.file, protocol)
+            transport._start()
+            await left.close()  # The transport sees EOF and closes, connection_lost raises
+            exc = await protocol.lost
+            await sleep(0.01)  # The loop keeps running
+            return exc, transport.is_closing()
+
+        self.assertEqual(loop.run_until_complete(main()), (None, True))
+
+    def test_tls(self):
+        import os
+        import ssl
+        loop = SelectorLoop()
+        cert = os.path.join(os.path.dirname(__file__), "keycert.pem")
+        server_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_ctx.load_cert_chain(cert)
+        client_ctx = ssl.create_default_context(cafile=cert)
+        payload = os.urandom(500)
+
+        async def echo(sock, addr):
+            tls = TLSSocket(sock, server_ctx, server_side=True)
+            await tls.do_handshake()
+            await tls.sendall(await tls.recv(1024))
+            await tls.close()
+
+        async def main():
+            server = await start_server(echo, "127.0.0.1", 0)
+            address = ("127.0.0.1", server.sockname[1])
+            with self.assertRaises(ValueError):
+                await create_connection(Collector, address, ssl=client_ctx, server_hostname="localhost",
+                                        memory_bio=True)
+            transport, protocol = await create_connection(Collector, address, ssl=client_ctx,
+                                                          server_hostname="localhost")
+            transport.write(payload)
+            while sum(map(len, protocol.chunks)) < len(payload):
+                await sleep(0.01)
+            transport.close()
+            await protocol.lost
+            await server.close()
+            return b"".join(protocol.chunks)
+
+        self.assertEqual(loop.run_until_complete(main()), payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+from henrio import *
+import errno
+import os
+import socket
+import tempfile
+import unittest
+
+
+class UnixTest(unittest.TestCase):
+    def test_echo(self):
+        loop = SelectorLoop()
+        path = os.path.join(tempfile.mkdtemp(), "echo.sock")
+        with socket.socket(socket.AF_UNIX) as stale:
+            stale.bind(path)  # Left behind by a server that died
+
+        async def echo(sock, addr):
+            while True:
+                data = await sock.recv(1024)
+                if not data:
+                    break
+                await sock.sendall(data)
+
+        async def main():
+            server = await start_unix_server(echo, path)
+            replies = []
+            for message in (b"hello", b"world"):
+                conn = await open_unix_connection(path, timeout=5)
+                await conn.sendall(message)
+                replies.append(await conn.recv(1024))
+                await conn.close()
+            await server.close()
+            return replies
+
+        self.assertEqual(loop.run_until_complete(main()), [b"hello", b"world"])
+        self.assertFalse(os.path.exists(path))
+
+    def test_path_in_use(self):
+        loop = SelectorLoop()
+        path = os.path.join(tempfile.mkdtemp(), "busy.sock")
+
+        async def idle(sock, addr):
+            pass
+
+        async def main():
+            server = await start_unix_server(idle, path)
+            try:
+                with self.assertRaises(OSError) as caught:
+                    await start_unix_server(idle, path)
+                self.assertEqual(caught.exception.errno, errno.EADDRINUSE)
+                conn = await open_unix_connection(path, timeout=5)  # Still the first server's
+                await conn.close()
+            finally:
+                await server.close()
+
+        loop.run_until_complete(main())
+        self.assertFalse(os.path.exists(path))
+
+    def test_fd_passing(self):
+        loop = SelectorLoop()
+
+        async def main():
+            left, right = await create_socketpair()
+            left.file.setblocking(False)
+            right.file.setblocking(False)
+            r, w = os.pipe()
+            try:
+                sent = await left.send_fds(b"fd", [w])
+                msg, fds, flags, addr = await right.recv_fds(16, 4)
+                self.assertEqual((sent, msg, len(fds)), (2, b"fd", 1))
+                self.assertNotEqual(fds[0], w)
+                os.write(fds[0], b"through the socket")
+                os.close(fds[0])
+                return os.read(r, 64)
+            finally:
+                os.close(r)
+                os.close(w)
+                await left.close()
+                await right.close()
+
+        self.assertEqual(loop.run_until_complete(main()), b"through the socket")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+from henrio import *
+from henrio.inotify import IN_CREATE, IN_MODIFY, IN_CLOSE_WRITE, IN_DELETE_SELF
+import os
+import sys
+import tempfile
+import unittest
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "Needs inotify")
+class WatchTest(unittest.TestCase):
+    def test_batch(self):
+        loop = SelectorLoop()
+        directory = tempfile.mkdtemp()
+
+        async def main():
+            async with watch(directory) as watcher:
+                path = os.path.join(directory, "config.ini")
+                for i in range(10):  # All before the loop gets to read, one event for the path
+                    with open(path, "w") as file:
+                        file.write(str(i))
+                with open(os.path.join(directory, "model.bin"), "wb") as file:
+                    file.write(b"\0")
+                return path, await watcher.read()
+
+        path, events = loop.run_until_complete(main())
+        self.assertEqual([event.path for event in events], [path, os.path.join(directory, "model.bin")])
+        self.assertTrue(events[0].mask & IN_CREATE)
+        self.assertTrue(events[0].mask & IN_MODIFY)
+        self.assertTrue(events[0].mask & IN_CLOSE_WRITE)
+
+    def test_iterate(self):
+        loop = SelectorLoop()
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "settings.json")
+        with open(path, "w") as file:
+            file.write("{}")
+
+        async def change():
+            await sleep(0.05)
+            with open(path, "w") as file:
+                file.write("[]")
+            await sleep(0.05)
+            os.unlink(path)
+
+        async def main():
+            changer = await spawn(change())
+            masks = 0
+            async for event in watch(path, IN_CLOSE_WRITE | IN_DELETE_SELF):  # Ends once the file is gone
+                self.assertEqual(event.path, path)
+                masks |= event.mask
+            await changer.wait()
+            return masks
+
+        self.assertEqual(loop.run_until_complete(main()), IN_CLOSE_WRITE | IN_DELETE_SELF)